@@ -0,0 +1,7 @@
+"""
+Benchmarks of django-sane-testing's own overhead.
+
+Run them with ``paver bench``; they use testproject's settings. Results
+are written as JSON by ``paver bench --output results.json``, see
+benchmarks.results for other options.
+"""
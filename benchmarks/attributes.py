@@ -0,0 +1,81 @@
+"""
+Measure how much does it cost plugins to resolve attributes of a test,
+walking test method and test case for every lookup ("uncached") and using
+test profile resolved once per test ("profile").
+"""
+from time import time
+
+ROUNDS = 2000
+
+# lookups done by plugins for one database test, in their order
+LOOKUPS = [
+    ("getattr", "start_live_server", False),
+    ("getattr", "no_database_interaction", False),
+    ("getattr", "multi_db", False),
+    ("getattr", "database_single_transaction", False),
+    ("hasattr", "fixtures", None),
+    ("getattr", "database_flush", True),
+    ("getattr", "make_translations", None),
+    ("getattr", "selenium_start", False),
+    ("getattr", "test_type", "unit"),
+    ("getattr", "flush_django_cache", False),
+    ("hasattr", "flush_django_cache", None),
+    ("getattr", "no_database_interaction", False),
+    ("getattr", "database_single_transaction", False),
+    ("getattr", "database_flush", True),
+    ("getattr", "multi_db", False),
+]
+
+def lookup_uncached(nose_test):
+    from djangosanetesting.noseplugins import get_test_case_method, get_test_case_instance
+
+    for kind, attr_name, default in LOOKUPS:
+        method = get_test_case_method(nose_test)
+        instance = get_test_case_instance(nose_test)
+        if kind == "hasattr":
+            hasattr(method, attr_name) or hasattr(instance, attr_name)
+        else:
+            value = getattr(method, attr_name, None)
+            if value is None:
+                getattr(instance, attr_name, default)
+
+def lookup_profile(nose_test):
+    from djangosanetesting.noseplugins import getattr_test, hasattr_test
+
+    for kind, attr_name, default in LOOKUPS:
+        if kind == "hasattr":
+            hasattr_test(nose_test, attr_name)
+        else:
+            getattr_test(nose_test, attr_name, default)
+
+def run(rounds=ROUNDS):
+    from nose.case import Test, MethodTestCase
+    from djangosanetesting.cases import DatabaseTestCase
+
+    class BenchDatabaseTestCase(DatabaseTestCase):
+        fixtures = ["random_model_for_testing"]
+
+        def test_nothing(self):
+            pass
+
+    results = {}
+    for name, lookup in (("uncached", lookup_uncached), ("profile", lookup_profile)):
+        timings = []
+        for repeat in range(3):
+            # fresh tests, so profile has to be resolved for every one of them
+            tests = [Test(MethodTestCase(BenchDatabaseTestCase.test_nothing)) for i in range(rounds)]
+            started = time()
+            for test in tests:
+                lookup(test)
+            timings.append(time() - started)
+        results[name] = min(timings) / rounds
+    return results
+
+def main():
+    results = run()
+    for name in ("uncached", "profile"):
+        print "%s: %.2f us per test" % (name, results[name] * 10**6)
+    return results
+
+if __name__ == "__main__":
+    main()
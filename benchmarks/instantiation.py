@@ -0,0 +1,34 @@
+"""
+Measure how much does it cost to instantiate a test case.
+"""
+from timeit import Timer
+
+ROUNDS = 10000
+
+def run(rounds=ROUNDS):
+    from djangosanetesting.cases import UnitTestCase, DatabaseTestCase
+
+    class BenchUnitTestCase(UnitTestCase):
+        def test_nothing(self):
+            pass
+
+    class BenchDatabaseTestCase(DatabaseTestCase):
+        def test_nothing(self):
+            pass
+
+    results = {}
+    for case in (BenchUnitTestCase, BenchDatabaseTestCase):
+        # first instantiation scrapes assertion methods, do not count it
+        case()
+        timer = Timer(lambda: case())
+        results[case.__name__] = min(timer.repeat(repeat=3, number=rounds)) / rounds
+    return results
+
+def main():
+    results = run()
+    for name, per_test in sorted(results.items()):
+        print "%s: %.2f us per instance" % (name, per_test * 10**6)
+    return results
+
+if __name__ == "__main__":
+    main()
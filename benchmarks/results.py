@@ -0,0 +1,67 @@
+"""
+Run all benchmarks and write their results as JSON, so that results of
+different releases (or branches) can be compared by diffing them.
+"""
+import platform
+from optparse import OptionParser
+
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+def get_environment():
+    import django
+    import nose
+    from django.conf import settings
+
+    import djangosanetesting
+    from djangosanetesting.classification import get_database_aliases
+    from djangosanetesting.utils import get_databases
+
+    return {
+        "djangosanetesting" : djangosanetesting.__versionstr__,
+        "django" : django.get_version(),
+        "nose" : nose.__version__,
+        "python" : platform.python_version(),
+        "platform" : platform.platform(),
+        "databases" : dict([(alias, get_databases()[alias].settings_dict.get('ENGINE', getattr(settings, 'DATABASE_ENGINE', None)))
+            for alias in get_database_aliases()]),
+    }
+
+def dump_results(path, results):
+    f = open(path, 'w')
+    try:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+    finally:
+        f.close()
+
+def get_parser():
+    parser = OptionParser(usage="paver bench [options]")
+    parser.add_option("-o", "--output", dest="output", default=None,
+        help="Write results as JSON into given file")
+    parser.add_option("-t", "--tests", dest="tests", type="int", default=None,
+        help="Number of tests in synthetic suites (slow suites get fraction of it)")
+    parser.add_option("-s", "--suite", dest="suites", action="append", default=None,
+        help="Run only given synthetic suite (may be repeated)")
+    parser.add_option("", "--no-suites", dest="no_suites", action="store_true", default=False,
+        help="Run only micro-benchmarks")
+    return parser
+
+def main(argv=None):
+    from benchmarks import instantiation, attributes, suites
+
+    options, args = get_parser().parse_args(argv or [])
+
+    results = {
+        "environment" : get_environment(),
+        "instantiation" : instantiation.main(),
+        "attributes" : attributes.main(),
+    }
+    if not options.no_suites:
+        results["suites"] = suites.main(options.tests or suites.TESTS, options.suites)
+
+    if options.output:
+        dump_results(options.output, results)
+    return results
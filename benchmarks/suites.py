@@ -0,0 +1,233 @@
+"""
+Measure cost of running synthetic suites of library test cases.
+
+Suite of every test type (unit, database, database with fixtures,
+destructive and http) is generated as module of test case classes with
+trivial test methods and run by nose with sane-testing plugins.
+SaneTimingPlugin splits time of every test into phases (see timing),
+so framework overhead, database setup and reset and fixture loading are
+reported separately. Time per test is compared to suite of plain
+unittest.TestCase tests run by nose without plugins ("baseline").
+Tests of http suite fetch page from live server and measure latency of
+the round trip; tests of in_process suite fetch it by in-process transport
+(see djangosanetesting.transport), without live server.
+"""
+import os
+import sys
+import tempfile
+import unittest
+import urllib2
+from new import module as new_module
+from StringIO import StringIO
+from time import time
+
+import benchmarks
+
+TESTS = 1000
+
+TESTS_PER_CLASS = 20
+
+# suites whose tests are slow are run with fraction of tests
+SUITES = (
+    ("unit", 1.0),
+    ("database", 1.0),
+    ("fixtures", 1.0),
+    ("destructive", 0.1),
+    ("http", 0.1),
+    ("in_process", 0.1),
+)
+
+FIXTURES = ["random_model_for_testing"]
+
+def get_test_case_base(suite):
+    from djangosanetesting.cases import UnitTestCase, DatabaseTestCase, DestructiveDatabaseTestCase, HttpTestCase
+
+    return {
+        "baseline" : unittest.TestCase,
+        "unit" : UnitTestCase,
+        "database" : DatabaseTestCase,
+        "fixtures" : DatabaseTestCase,
+        "destructive" : DestructiveDatabaseTestCase,
+        "http" : HttpTestCase,
+        "in_process" : HttpTestCase,
+    }[suite]
+
+def make_suite_module(suite, tests):
+    """ Return module named benchmarks.generated_<suite>, containing given number of tests """
+    from djangosanetesting.utils import get_live_server_path
+
+    module = new_module("benchmarks.generated_%s" % suite)
+    module.latencies = []
+    module.executed = []
+
+    def do_nothing(self):
+        pass
+
+    def fetch_page(self):
+        started = time()
+        urllib2.urlopen("%stesttwohundred/" % get_live_server_path()).read()
+        module.latencies.append(time() - started)
+
+    def fetch_page_in_process(self):
+        started = time()
+        self.urlopen("/testtwohundred/").read()
+        module.latencies.append(time() - started)
+
+    def make_method(name, body):
+        # loaders look test methods up by their name
+        def method(self):
+            body(self)
+            module.executed.append(name)
+        method.__name__ = name
+        return method
+
+    base = get_test_case_base(suite)
+    for start in range(0, tests, TESTS_PER_CLASS):
+        attrs = {"__module__" : module.__name__}
+        if suite == "fixtures":
+            attrs["fixtures"] = FIXTURES
+        elif suite == "in_process":
+            attrs["in_process_http"] = True
+            attrs["start_live_server"] = False
+        for index in range(start, min(start + TESTS_PER_CLASS, tests)):
+            name = "test_%05d" % index
+            if suite == "http":
+                attrs[name] = make_method(name, fetch_page)
+            elif suite == "in_process":
+                attrs[name] = make_method(name, fetch_page_in_process)
+            else:
+                attrs[name] = make_method(name, do_nothing)
+        name = "TestBench%s%05d" % (suite.title().replace("_", ""), start)
+        setattr(module, name, type(name, (base,), attrs))
+    return module
+
+def run_suite(suite, tests):
+    """
+    Run generated suite by nose and return tuple (seconds, timings,
+    latencies, executed), where timings are phases of every test as
+    measured by SaneTimingPlugin (None for baseline) and executed is
+    number of tests not skipped.
+    """
+    from nose.config import Config
+    from nose.core import TestProgram
+    from nose.loader import TestLoader
+    from nose.plugins.manager import PluginManager
+    from nose.plugins.skip import Skip
+
+    from djangosanetesting.noseplugins import DjangoPlugin, DjangoLiveServerPlugin, SaneTimingPlugin
+
+    # nose resolves ancestors of test cases by their module name
+    module = make_suite_module(suite, tests)
+    sys.modules[module.__name__] = module
+    setattr(benchmarks, "generated_%s" % suite, module)
+
+    timing_plugin = SaneTimingPlugin()
+    if suite == "baseline":
+        plugins = [Skip()]
+        argv = ["nosetests"]
+    else:
+        plugins = [Skip(), DjangoPlugin(), DjangoLiveServerPlugin(), timing_plugin]
+        fd, history_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.remove(history_path)
+        argv = ["nosetests", "--with-django", "--with-djangoliveserver", "--dst-timing=%s" % history_path, "--dst-slowest=0"]
+
+    stream = StringIO()
+    config = Config(stream=stream, plugins=PluginManager(plugins=plugins))
+    loader = TestLoader(config=config)
+    try:
+        started = time()
+        program = TestProgram(argv=argv, config=config, testLoader=loader, exit=False,
+            suite=[loader.loadTestsFromModule(module)])
+        seconds = time() - started
+    finally:
+        del sys.modules[module.__name__]
+        delattr(benchmarks, "generated_%s" % suite)
+        if suite != "baseline" and os.path.exists(history_path):
+            os.remove(history_path)
+
+    if not program.success:
+        raise RuntimeError("Benchmark suite %s failed:\n%s" % (suite, stream.getvalue()))
+
+    if suite == "baseline":
+        return seconds, None, module.latencies, len(module.executed)
+    return seconds, timing_plugin.timings, module.latencies, len(module.executed)
+
+def summarize_phases(timings):
+    from djangosanetesting.timing import PHASES
+
+    totals = dict([(phase, 0.0) for phase in PHASES])
+    for phases in timings.values():
+        for phase, seconds in phases.items():
+            totals[phase] += seconds
+    return totals
+
+def summarize_latencies(latencies):
+    from djangosanetesting.utils import get_percentile
+
+    if not latencies:
+        return None
+    return {
+        "mean" : sum(latencies) / len(latencies),
+        "median" : get_percentile(latencies, 50),
+        "p90" : get_percentile(latencies, 90),
+        "max" : max(latencies),
+    }
+
+def run(tests=TESTS, suites=None):
+    """
+    Return dict of suite name: results, times are in seconds. Overhead
+    is time per test spent in plugins, not accounted to other phases;
+    run overhead is time of the run not spent in tests (collection,
+    plugins' begin and finalize, live server shutdown).
+    """
+    suites = suites or [name for name, fraction in SUITES]
+
+    baseline_seconds = run_suite("baseline", tests)[0]
+    baseline = baseline_seconds / tests
+    results = {"baseline" : {"tests" : tests, "seconds" : baseline_seconds, "per_test" : baseline}}
+
+    for name, fraction in SUITES:
+        if name not in suites:
+            continue
+        count = max(1, int(tests * fraction))
+        seconds, timings, latencies, executed = run_suite(name, count)
+        totals = summarize_phases(timings)
+        results[name] = {
+            "tests" : count,
+            "skipped" : count - executed,
+            "seconds" : seconds,
+            "per_test" : seconds / count,
+            "overhead" : totals["plugins"] / count,
+            "run_overhead" : seconds - sum(totals.values()),
+            "phases" : totals,
+            "phases_per_test" : dict([(phase, total / count) for phase, total in totals.items()]),
+            "latency" : summarize_latencies(latencies),
+        }
+    return results
+
+def format_results(results):
+    lines = ["baseline: %.2f us per test" % (results["baseline"]["per_test"] * 10**6)]
+    for name, fraction in SUITES:
+        if name not in results:
+            continue
+        result = results[name]
+        phases = result["phases_per_test"]
+        line = "%s: %d tests, %.2f us per test, overhead %.2f us, fixtures %.2f us, reset %.2f us per test; databases %.2fs, run overhead %.2fs" % (
+            name, result["tests"], result["per_test"] * 10**6, result["overhead"] * 10**6,
+            phases["fixtures"] * 10**6, phases["reset"] * 10**6, result["phases"]["databases"], result["run_overhead"])
+        if result["skipped"]:
+            line += " (%d skipped)" % result["skipped"]
+        lines.append(line)
+        if result["latency"]:
+            lines.append("  live server round trip: mean %(mean).4fs, median %(median).4fs, 90%% %(p90).4fs, max %(max).4fs" % result["latency"])
+    return lines
+
+def main(tests=TESTS, suites=None):
+    results = run(tests, suites)
+    for line in format_results(results):
+        print line
+    return results
+
+if __name__ == "__main__":
+    main()
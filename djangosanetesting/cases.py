@@ -13,7 +13,7 @@ from nose.tools import (
 )
 from nose import SkipTest
 
-from djangosanetesting.utils import twill_patched_go, twill_xpath_go, extract_django_traceback, get_live_server_path
+from djangosanetesting.utils import twill_patched_go, twill_xpath_go, extract_django_traceback, get_live_server_path, get_live_server_url
 
 try:
     from django.db import DEFAULT_DB_ALIAS
@@ -25,6 +25,58 @@ except ImportError:
 __all__ = ("UnitTestCase", "DatabaseTestCase", "DestructiveDatabaseTestCase",
            "HttpTestCase", "SeleniumTestCase", "TemplateTagTestCase")
 
+_assertion_methods = None
+
+def get_assertion_methods():
+    """
+    Return dictionary of assert* methods from unittest(2), both camelCase
+    and pep8-ify style. It's computed only once per process.
+    """
+    global _assertion_methods
+
+    if _assertion_methods is not None:
+        return _assertion_methods
+
+    methods = {}
+    caps = re.compile('([A-Z])')
+
+    from django.test import TestCase
+
+    ##########
+    ### Scraping heavily inspired by nose testing framework, (C) by Jason Pellerin
+    ### and respective authors.
+    ##########
+
+    class Dummy(TestCase):
+        def att():
+            pass
+    t = Dummy('att')
+
+    def pepify(name):
+        return caps.sub(lambda m: '_' + m.groups()[0].lower(), name)
+
+    def scrape(t):
+        for a in [at for at in dir(t) if at.startswith('assert') and not '_' in at]:
+            v = getattr(t, a)
+            methods[a] = v
+            methods[pepify(a)] = v
+
+    scrape(t)
+
+    try:
+        from unittest2 import TestCase
+    except ImportError:
+        pass
+    else:
+        class Dummy(TestCase):
+            def att():
+                pass
+        t = Dummy('att')
+        scrape(t)
+
+    _assertion_methods = methods
+    return _assertion_methods
+
 class SaneTestCase(object):
     """ Common ancestor we're using our own hierarchy """
     start_live_server = False
@@ -42,49 +94,17 @@ class SaneTestCase(object):
         """
         When constructing class, add assert* methods from unittest(2),
         both camelCase and pep8-ify style.
-        
+
+        Methods are scraped only once per process and installed on the
+        class itself, so instantiating tests stays cheap.
         """
-        obj = super(SaneTestCase, type).__new__(type, *args, **kwargs)
-
-        caps = re.compile('([A-Z])')
-        
-        from django.test import TestCase
-        
-        ##########
-        ### Scraping heavily inspired by nose testing framework, (C) by Jason Pellerin
-        ### and respective authors.
-        ##########
-        
-        class Dummy(TestCase):
-            def att():
-                pass
-        t = Dummy('att')
-        
-        def pepify(name):
-            return caps.sub(lambda m: '_' + m.groups()[0].lower(), name)
-        
-        def scrape(t):
-            for a in [at for at in dir(t) if at.startswith('assert') and not '_' in at]:
-                v = getattr(t, a)
-                setattr(obj, a, v)
-                setattr(obj, pepify(a), v)
-        
-        scrape(t)
-        
-        try:
-            from unittest2 import TestCase
-        except ImportError:
-            pass
-        else:
-            class Dummy(TestCase):
-                def att():
-                    pass
-            t = Dummy('att')
-            scrape(t)
-                
-        return obj
+        if '_sane_assertions_installed' not in type.__dict__:
+            for name, method in get_assertion_methods().items():
+                setattr(type, name, method)
+            type._sane_assertions_installed = True
+
+        return super(SaneTestCase, type).__new__(type, *args, **kwargs)
 
-    
     def _check_plugins(self):
         if getattr(self, 'required_sane_plugins', False):
             for plugin in self.required_sane_plugins:
@@ -210,6 +230,9 @@ class HttpTestCase(DestructiveDatabaseTestCase):
     start_live_server = True
     required_sane_plugins = ["django", "http"]
     http_plugin_started = False
+    # dispatch urlopen requests for live server in-process, without sockets;
+    # tests using nothing else may set start_live_server to False
+    in_process_http = False
     test_type = "http"
 
     def __init__(self, *args, **kwargs):
@@ -255,13 +278,19 @@ class HttpTestCase(DestructiveDatabaseTestCase):
     def assert_code(self, code):
         self.assert_equals(int(code), self.twill.get_code())
 
-    def urlopen(self, *args, **kwargs):
+    def urlopen(self, url, *args, **kwargs):
         """
         Wrap for the urlopen function from urllib2
         prints django's traceback if server responds with 500
+        and allows relative urls (to live server) to be used
         """
+        if isinstance(url, basestring):
+            url = get_live_server_url(url)
         try:
-            return urllib2.urlopen(*args, **kwargs)
+            if self.in_process_http:
+                from djangosanetesting.transport import get_in_process_opener
+                return get_in_process_opener().open(url, *args, **kwargs)
+            return urllib2.urlopen(url, *args, **kwargs)
         except urllib2.HTTPError, err:
             if err.code == 500:
                 raise extract_django_traceback(http_error=err)
@@ -0,0 +1,132 @@
+"""
+Static classification of tests, built while nose collects them.
+
+Test case classes, test methods and test functions are classified by
+attributes determining how they're run (test type, required plugins,
+databases and fixtures) without being instantiated. Classification is
+done by SaneTestSelectionPlugin's wantClass/wantMethod/wantFunction hooks,
+thus deselected tests are never loaded, and it's reused by test ordering.
+"""
+from inspect import isfunction, ismethod
+
+from djangosanetesting import MULTIDB_SUPPORT, DEFAULT_DB_ALIAS
+
+DEFAULT_TEST_TYPE = "unit"
+
+_missing = object()
+
+
+def get_database_aliases():
+    """ Return aliases of all configured databases, default first """
+    from django.conf import settings
+
+    if not MULTIDB_SUPPORT:
+        return (DEFAULT_DB_ALIAS,)
+    return tuple(sorted(settings.DATABASES, key=lambda alias: (alias != DEFAULT_DB_ALIAS, alias)))
+
+
+class TestClassification(object):
+    """
+    How test is run, as far as it can be told from it's attributes.
+    Attributes of test method have priority over those of it's test case,
+    the same way as in getattr_test.
+    """
+    __slots__ = ('test_type', 'required_plugins', 'databases', 'fixtures', 'multi_db', 'urls')
+
+    def __init__(self, test_type=DEFAULT_TEST_TYPE, required_plugins=(), databases=(), fixtures=(), multi_db=False, urls=None):
+        self.test_type = test_type
+        self.required_plugins = tuple(required_plugins)
+        self.databases = tuple(databases)
+        self.fixtures = tuple(fixtures)
+        self.multi_db = multi_db
+        self.urls = urls
+
+    def __repr__(self):
+        return "<TestClassification %s: plugins %s, databases %s, fixtures %s>" % (
+            self.test_type, ", ".join(self.required_plugins) or "-",
+            ", ".join(self.databases) or "-", ", ".join(self.fixtures) or "-")
+
+
+class TestIndex(object):
+    """
+    Classifications of tests, keyed by (test case class or function, method name).
+    Tests are classified on first lookup, so the index may be used also
+    for tests that has not been seen during collection.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.test_types = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def classify(self, test_object, method_name=None):
+        """
+        Return TestClassification of test case class or test function
+        (test_object) or of it's method, if method_name is given.
+        """
+        key = (test_object, method_name)
+        try:
+            return self.entries[key]
+        except KeyError:
+            pass
+
+        objects = [test_object]
+        if method_name:
+            objects.insert(0, getattr(test_object, method_name, None))
+
+        def resolve(attr_name, default):
+            for obj in objects:
+                value = getattr(obj, attr_name, _missing)
+                if value is not _missing:
+                    return value
+            return default
+
+        multi_db = bool(resolve('multi_db', False))
+        if resolve('no_database_interaction', False):
+            databases = ()
+        elif multi_db:
+            databases = get_database_aliases()
+        else:
+            databases = (DEFAULT_DB_ALIAS,)
+
+        classification = self.entries[key] = TestClassification(
+            test_type = resolve('test_type', DEFAULT_TEST_TYPE),
+            required_plugins = resolve('required_sane_plugins', None) or (),
+            databases = databases,
+            fixtures = resolve('fixtures', None) or (),
+            multi_db = multi_db,
+            urls = resolve('urls', None),
+        )
+        return classification
+
+    def get_test_types(self, test_case):
+        """
+        Return set of test types of test case class and those of it's
+        methods overriding it.
+        """
+        try:
+            return self.test_types[test_case]
+        except KeyError:
+            pass
+
+        test_types = set([self.classify(test_case).test_type])
+        for name in dir(test_case):
+            method = getattr(test_case, name, None)
+            if ismethod(method) or isfunction(method):
+                test_type = getattr(method, 'test_type', _missing)
+                if test_type is not _missing:
+                    test_types.add(test_type)
+
+        self.test_types[test_case] = frozenset(test_types)
+        return self.test_types[test_case]
+
+    def clear(self):
+        self.entries.clear()
+        self.test_types.clear()
+
+
+test_index = TestIndex()
@@ -0,0 +1,144 @@
+"""
+Tracking of tables written during tests, so that only those
+have to be flushed after destructive test.
+
+Tracking is done by wrapping cursors of all database connections (in all
+threads, so writes done by live server are recorded too) and looking for
+INSERT, UPDATE and DELETE statements.
+"""
+import re
+
+from djangosanetesting import DEFAULT_DB_ALIAS
+from djangosanetesting.fixtures import FixtureCache
+
+# table name is the last of (optionally quoted) dotted identifiers, i.e. without schema
+WRITE_STATEMENT_RE = re.compile(r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|REPLACE\s+INTO)\s+(?:[`"\[]?\w+[`"\]]?\.)*[`"\[]?(\w+)', re.IGNORECASE)
+
+
+def get_written_table(sql):
+    """ Return name of table given SQL statement writes to, if any """
+    match = WRITE_STATEMENT_RE.match(sql)
+    if match:
+        return match.group(1)
+    return None
+
+
+class DirtyTablesCursorWrapper(object):
+    def __init__(self, cursor, tracker, alias):
+        self.cursor = cursor
+        self.tracker = tracker
+        self.alias = alias
+
+    def execute(self, sql, params=()):
+        self.tracker.record(self.alias, sql)
+        return self.cursor.execute(sql, params)
+
+    def executemany(self, sql, param_list):
+        self.tracker.record(self.alias, sql)
+        return self.cursor.executemany(sql, param_list)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+
+class DirtyTablesTracker(object):
+    """
+    Records tables written through any connection, per database alias.
+    """
+    def __init__(self):
+        self.dirty_tables = {}
+        self.active = False
+        self.original_cursor = None
+        # initial data are replayed after every flush
+        self.fixture_cache = FixtureCache()
+
+    def install(self):
+        from django.db.backends import BaseDatabaseWrapper
+
+        if self.original_cursor is not None:
+            return
+
+        tracker = self
+        original_cursor = self.original_cursor = BaseDatabaseWrapper.cursor
+
+        def cursor(connection):
+            return DirtyTablesCursorWrapper(original_cursor(connection), tracker, getattr(connection, 'alias', DEFAULT_DB_ALIAS))
+
+        BaseDatabaseWrapper.cursor = cursor
+        self.active = True
+
+    def uninstall(self):
+        from django.db.backends import BaseDatabaseWrapper
+
+        if self.original_cursor is not None:
+            BaseDatabaseWrapper.cursor = self.original_cursor
+            self.original_cursor = None
+        self.active = False
+
+    def record(self, alias, sql):
+        if not self.active:
+            return
+        table = get_written_table(sql)
+        if table:
+            self.dirty_tables.setdefault(alias, set()).add(table)
+
+    def pop(self, alias):
+        return self.dirty_tables.pop(alias, set())
+
+    def flush(self, alias):
+        """
+        Flush tables written in database since last flush. Like Django's flush,
+        post_syncdb is emitted and initial_data are loaded, but only when
+        some table has actually been flushed, and only into flushed tables.
+        """
+        from django.core.management.color import no_style
+        from django.core.management.sql import emit_post_sync_signal
+        from django.db import models, transaction
+
+        from djangosanetesting.utils import get_databases
+
+        tables = self.pop(alias)
+        if not tables:
+            return
+
+        connection = get_databases()[alias]
+        existing_tables = set(connection.introspection.table_names())
+        tables = [table for table in tables if table in existing_tables]
+        sequences = [sequence for sequence in connection.introspection.sequence_list() if sequence['table'] in tables]
+
+        # writes done by flush itself must not make tables dirty again
+        self.active = False
+        try:
+            cursor = connection.cursor()
+            for sql in connection.ops.sql_flush(no_style(), tables, sequences):
+                cursor.execute(sql)
+            transaction.commit_unless_managed(using=alias)
+
+            flushed_models = [m for m in models.get_models(include_auto_created=True) if m._meta.db_table in tables]
+            emit_post_sync_signal(flushed_models, 0, False, alias)
+        finally:
+            self.active = True
+
+        self.load_initial_data(alias, tables)
+
+    def load_initial_data(self, alias, tables):
+        """
+        Load initial_data objects stored in given tables. Fixtures only loaddata
+        can load (i.e. compressed ones) are loaded whole, with tracking on, so
+        that tables they write to again are flushed next time.
+        """
+        from django.core.management import call_command
+
+        fixture_files = self.fixture_cache.get_fixture_files(['initial_data'], alias)
+        if fixture_files is None:
+            call_command('loaddata', 'initial_data', verbosity=0, database=alias)
+            return
+
+        self.active = False
+        try:
+            self.fixture_cache.load_files(fixture_files, alias, tables=tables)
+        finally:
+            self.active = True
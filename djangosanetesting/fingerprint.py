@@ -0,0 +1,155 @@
+"""
+Schema fingerprints of test databases.
+
+Fingerprint is a hash of everything that determines schema and initial
+content of test database (SQL syncdb would execute for installed models,
+including indexes, constraints and custom SQL, South migrations and
+initial_data fixtures). It's stored in the database itself,
+so that persisted test database or a copy of it can be checked for being
+up to date before it's used.
+"""
+import os
+
+from django.utils.encoding import smart_str
+from django.utils.hashcompat import md5_constructor
+
+from djangosanetesting import MULTIDB_SUPPORT, DEFAULT_DB_ALIAS
+
+FINGERPRINT_TABLE = 'djangosanetesting_fingerprint'
+
+
+def get_migration_files(app):
+    """ Return sorted list of (file name, content) of South migrations of app """
+    migrations_dir = os.path.join(os.path.dirname(app.__file__), 'migrations')
+    if not os.path.isdir(migrations_dir):
+        return []
+
+    migrations = []
+    for file_name in sorted(os.listdir(migrations_dir)):
+        if file_name.endswith('.py'):
+            f = open(os.path.join(migrations_dir, file_name), 'rb')
+            try:
+                migrations.append((file_name, f.read()))
+            finally:
+                f.close()
+    return migrations
+
+def get_initial_data_files():
+    """ Return list of (file name, content) of initial_data fixtures """
+    from djangosanetesting.fixtures import get_fixture_dirs
+
+    fixtures = []
+    for fixture_dir in get_fixture_dirs():
+        # current directory is searched too, but it's not part of project
+        if not fixture_dir or not os.path.isdir(fixture_dir):
+            continue
+        for file_name in sorted(os.listdir(fixture_dir)):
+            if file_name.startswith('initial_data.'):
+                path = os.path.join(fixture_dir, file_name)
+                f = open(path, 'rb')
+                try:
+                    fixtures.append((file_name, f.read()))
+                finally:
+                    f.close()
+    return fixtures
+
+def get_schema_sql(connection, alias=DEFAULT_DB_ALIAS):
+    """ Return list of SQL statements syncdb would execute to create models for alias """
+    from django.core.management.color import no_style
+    from django.core.management.sql import custom_sql_for_model
+    from django.db import models
+
+    style = no_style()
+    creation = connection.creation
+
+    installed_models = []
+    for model in models.get_models(include_auto_created=True):
+        if MULTIDB_SUPPORT:
+            from django.db import router
+            if not router.allow_syncdb(alias, model):
+                continue
+        installed_models.append(model)
+    installed_models.sort(key=lambda model: model._meta.db_table)
+
+    # constraints are always created after the fact, to not depend on order of models
+    statements = []
+    pending_references = {}
+    for model in installed_models:
+        output, references = creation.sql_create_model(model, style, set())
+        statements.extend(output)
+        for refto, refs in references.items():
+            pending_references.setdefault(refto, []).extend(refs)
+        statements.extend(creation.sql_indexes_for_model(model, style))
+        if MULTIDB_SUPPORT:
+            statements.extend(custom_sql_for_model(model, style, connection))
+        else:
+            # many-to-many tables are auto created models since Django 1.2
+            statements.extend(creation.sql_for_many_to_many(model, style))
+            statements.extend(custom_sql_for_model(model, style))
+
+    for model in installed_models:
+        statements.extend(creation.sql_for_pending_references(model, style, pending_references))
+
+    return statements
+
+def get_schema_fingerprint(connection, alias=DEFAULT_DB_ALIAS):
+    from django.conf import settings
+    from django.db import models
+
+    fingerprint = md5_constructor(connection.settings_dict['ENGINE'])
+    for statement in get_schema_sql(connection, alias):
+        fingerprint.update(smart_str(statement))
+
+    if 'south' in settings.INSTALLED_APPS and getattr(settings, 'DST_RUN_SOUTH_MIGRATIONS', True):
+        for app in models.get_apps():
+            for file_name, content in get_migration_files(app):
+                fingerprint.update(file_name)
+                fingerprint.update(content)
+
+    for file_name, content in get_initial_data_files():
+        fingerprint.update(file_name)
+        fingerprint.update(content)
+
+    return fingerprint.hexdigest()
+
+def write_fingerprint(connection, fingerprint):
+    qn = connection.ops.quote_name
+    cursor = connection.cursor()
+    if FINGERPRINT_TABLE in connection.introspection.table_names():
+        cursor.execute("DELETE FROM %s" % qn(FINGERPRINT_TABLE))
+    else:
+        cursor.execute("CREATE TABLE %s (%s varchar(32) NOT NULL)" % (qn(FINGERPRINT_TABLE), qn('fingerprint')))
+    cursor.execute("INSERT INTO %s (%s) VALUES (%%s)" % (qn(FINGERPRINT_TABLE), qn('fingerprint')), [fingerprint])
+    connection._commit()
+
+def read_fingerprint(connection):
+    """ Return fingerprint stored in database, or None if there is none """
+    if FINGERPRINT_TABLE not in connection.introspection.table_names():
+        return None
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT %s FROM %s" % (connection.ops.quote_name('fingerprint'), connection.ops.quote_name(FINGERPRINT_TABLE)))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    return None
+
+def read_database_fingerprint(connection, name):
+    """
+    Return fingerprint stored in database of given name (using connection
+    settings otherwise), or None if database does not exist or has no fingerprint.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.close()
+    connection.settings_dict['NAME'] = name
+    try:
+        if connection.settings_dict['ENGINE'].split(".")[-1] == 'sqlite3' and not os.path.exists(name):
+            # sqlite would create it
+            return None
+        try:
+            return read_fingerprint(connection)
+        except Exception:
+            return None
+    finally:
+        connection.close()
+        connection.settings_dict['NAME'] = old_name
@@ -0,0 +1,195 @@
+"""
+Fixture cache: fixture files are located and deserialized only once per
+process and then replayed from memory.
+
+Used by DjangoPlugin when DST_CACHE_FIXTURES is set to True.
+"""
+import os
+from time import time
+
+from django.core.management import call_command
+
+COMPRESSION_FORMATS = ('gz', 'zip', 'bz2')
+
+
+class CachedObject(object):
+    """ Deserialized object, that can be saved repeatedly """
+    def __init__(self, deserialized_object):
+        self.object = deserialized_object.object
+        self.m2m_data = deserialized_object.m2m_data
+        self.has_pk = self.object.pk is not None
+
+    def save(self, using):
+        from django.db import models
+
+        if not self.has_pk:
+            self.object.pk = None
+
+        # like DeserializedObject.save, bypass model-defined save
+        models.Model.save_base(self.object, using=using, raw=True)
+        if self.m2m_data:
+            for accessor_name, object_list in self.m2m_data.items():
+                setattr(self.object, accessor_name, object_list)
+
+
+def get_fixture_dirs():
+    """ Return directories searched for fixtures by loaddata, in it's order """
+    from django.conf import settings
+    from django.db.models import get_apps
+
+    app_module_paths = []
+    for app in get_apps():
+        if hasattr(app, '__path__'):
+            app_module_paths.extend(app.__path__)
+        else:
+            app_module_paths.append(app.__file__)
+
+    return [os.path.join(os.path.dirname(path), 'fixtures') for path in app_module_paths] \
+        + list(settings.FIXTURE_DIRS) + ['']
+
+
+class FixtureCache(object):
+    def __init__(self):
+        self.files = {}
+        self.objects = {}
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    def get_fixture_dirs(self):
+        return get_fixture_dirs()
+
+    def find_fixture_files(self, fixture_label, database):
+        """
+        Return list of (path, format) for given fixture label, searched for
+        the same way loaddata does. Return None when fixture cannot be handled
+        by cache (compressed or ambiguous fixtures), so loaddata should be used instead.
+        """
+        from django.core import serializers
+
+        parts = fixture_label.split('.')
+        if len(parts) > 1 and parts[-1] in COMPRESSION_FORMATS:
+            return None
+
+        if len(parts) == 1:
+            fixture_name = parts[0]
+            formats = serializers.get_public_serializer_formats()
+        else:
+            fixture_name, format = '.'.join(parts[:-1]), parts[-1]
+            if format not in serializers.get_public_serializer_formats():
+                return None
+            formats = [format]
+
+        if os.path.isabs(fixture_name):
+            fixture_dirs = [fixture_name]
+        else:
+            fixture_dirs = self.get_fixture_dirs()
+
+        fixture_files = []
+        for fixture_dir in fixture_dirs:
+            found_in_dir = []
+            for db in (database, None):
+                for format in formats:
+                    file_name = '.'.join([p for p in (fixture_name, db, format) if p])
+                    full_path = os.path.join(fixture_dir, file_name)
+                    if os.path.isfile(full_path):
+                        found_in_dir.append((full_path, format))
+                    for compression_format in COMPRESSION_FORMATS:
+                        if os.path.exists("%s.%s" % (full_path, compression_format)):
+                            return None
+            if len(found_in_dir) > 1:
+                return None
+            fixture_files.extend(found_in_dir)
+
+        return fixture_files
+
+    def get_objects(self, path, format, database):
+        from django.core import serializers
+
+        mtime = os.path.getmtime(path)
+        key = (path, database)
+        if key in self.objects and self.objects[key][0] == mtime:
+            self.hits += 1
+            self.seconds_saved += self.objects[key][2]
+            return self.objects[key][1]
+
+        started = time()
+        fixture = open(path, 'r')
+        try:
+            objects = [CachedObject(obj) for obj in serializers.deserialize(format, fixture, using=database)]
+        finally:
+            fixture.close()
+
+        self.misses += 1
+        self.objects[key] = (mtime, objects, time() - started)
+        return objects
+
+    def load(self, fixture_labels, database, commit=True):
+        """
+        Load fixtures into database, with the same semantics as loaddata
+        (including commit).
+        """
+        fixture_files = self.get_fixture_files(fixture_labels, database)
+        if fixture_files is None:
+            call_command('loaddata', *fixture_labels, **{'verbosity': 0, 'commit' : commit, 'database' : database})
+        else:
+            self.load_files(fixture_files, database, commit)
+
+    def get_fixture_files(self, fixture_labels, database):
+        """ Return list of (path, format) of all fixtures, None if loaddata must be used """
+        fixture_files = []
+        for fixture_label in fixture_labels:
+            if (fixture_label, database) not in self.files:
+                self.files[(fixture_label, database)] = self.find_fixture_files(fixture_label, database)
+            if self.files[(fixture_label, database)] is None:
+                return None
+            fixture_files.extend(self.files[(fixture_label, database)])
+        return fixture_files
+
+    def load_files(self, fixture_files, database, commit=True, tables=None):
+        """
+        Load objects of fixture files into database; if tables are given,
+        only objects stored in those tables are loaded.
+        """
+        from django.core.management.color import no_style
+        from django.db import router, transaction
+
+        from djangosanetesting.utils import get_databases
+
+        connection = get_databases()[database]
+        cursor = connection.cursor()
+
+        if commit:
+            transaction.commit_unless_managed(using=database)
+            transaction.enter_transaction_management(using=database)
+            transaction.managed(True, using=database)
+
+        try:
+            models = set()
+            for path, format in fixture_files:
+                for obj in self.get_objects(path, format, database):
+                    model = obj.object.__class__
+                    if tables is not None and model._meta.db_table not in tables:
+                        continue
+                    if router.allow_syncdb(database, model):
+                        models.add(model)
+                        obj.save(using=database)
+
+            if models:
+                for line in connection.ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(line)
+        except:
+            if commit:
+                transaction.rollback(using=database)
+                transaction.leave_transaction_management(using=database)
+            raise
+
+        if commit:
+            transaction.commit(using=database)
+            transaction.leave_transaction_management(using=database)
+            # workaround for Django #7572 as in loaddata
+            connection.close()
+
+    def get_report(self):
+        return "Fixture cache: %d hits, %d misses, %.2f seconds saved" % (
+            self.hits, self.misses, self.seconds_saved)
@@ -1,17 +1,21 @@
 """
 Various plugins for nose, that let us do our magic.
 """
+import errno
+import httplib
+import select
 import socket
+import sys
 import threading
 import os
 from BaseHTTPServer import HTTPServer
-from SocketServer import ThreadingMixIn
-from time import sleep
+import Queue
+from time import sleep, time
 from inspect import ismodule, isclass
 import unittest
 
 from django.core.management import call_command
-from django.core.servers.basehttp import  WSGIRequestHandler, WSGIServerException
+from django.core.servers.basehttp import  ServerHandler, WSGIRequestHandler, WSGIServerException
 from django.core.urlresolvers import clear_url_caches
 from django.test import TestCase as DjangoTestCase
 
@@ -22,17 +26,35 @@ from nose.plugins import Plugin
 import djangosanetesting
 from djangosanetesting import MULTIDB_SUPPORT, DEFAULT_DB_ALIAS
 from djangosanetesting.cache import flush_django_cache
+from djangosanetesting.classification import test_index
+from djangosanetesting.dirtytables import DirtyTablesTracker
+from djangosanetesting.fingerprint import get_schema_fingerprint, write_fingerprint, read_database_fingerprint
+from djangosanetesting.fixtures import FixtureCache
+from djangosanetesting.profiling import HookProfiler
+from djangosanetesting.queries import QueryCounter, QueryBudgetResult
+from djangosanetesting.parallel import (
+    ParallelRun, WORKER_ENV, WORKER_RESULT_ENV,
+    parse_worker, filter_suite, configure_worker, dump_result, get_worker_database_name, get_worker_file_name,
+)
+from djangosanetesting.sharding import Partition, SHARD_ENV, SHARD_DURATIONS_ENV, parse_shard, get_unit_id, get_prefix_durations
+from djangosanetesting.snapshots import get_snapshot, BACKEND_SNAPSHOT_MAP
+from djangosanetesting.timing import (
+    phase_timer, load_durations, save_history, dump_json,
+    pop_worker_timings, get_slowest, format_phases,
+)
 
 #from djagnosanetesting.cache import flush_django_cache
 from djangosanetesting.selenium.driver import selenium
 from djangosanetesting.utils import (
-    get_databases, get_live_server_path, test_databases_exist,
-    get_server_handler,
+    get_databases, get_live_server_path, set_live_server_port, test_databases_exist,
+    get_server_handler, get_test_database_name,
     DEFAULT_LIVE_SERVER_ADDRESS, DEFAULT_LIVE_SERVER_PORT,
+    DEFAULT_LIVE_SERVER_THREADS, DEFAULT_LIVE_SERVER_QUEUE_SIZE, DEFAULT_LIVE_SERVER_STARTUP_TIMEOUT,
+    get_percentile,
 )
 TEST_CASE_CLASSES = (djangosanetesting.cases.SaneTestCase, unittest.TestCase)
 
-__all__ = ("CherryPyLiveServerPlugin", "DjangoLiveServerPlugin", "DjangoPlugin", "SeleniumPlugin", "SaneTestSelectionPlugin", "ResultPlugin")
+__all__ = ("CherryPyLiveServerPlugin", "DjangoLiveServerPlugin", "DjangoPlugin", "SeleniumPlugin", "SaneTestSelectionPlugin", "SaneTestOrderingPlugin", "SaneParallelPlugin", "SaneShardingPlugin", "SaneTimingPlugin", "SaneProfilingPlugin", "ResultPlugin")
 
 
 
@@ -80,6 +102,8 @@ def hasattr_test(nose_test, attr_name):
 
     if nose_test is None:
         return False
+    elif attr_name in TEST_PROFILE_ATTRIBUTES and isinstance(nose_test, nose.case.Test):
+        return get_test_profile(nose_test).has(attr_name)
     elif ismodule(nose_test) or is_test_case_class(nose_test):
         return hasattr(nose_test, attr_name)
     elif hasattr(get_test_case_method(nose_test), attr_name) or hasattr(get_test_case_instance(nose_test), attr_name):
@@ -92,12 +116,75 @@ def getattr_test(nose_test, attr_name, default = False):
         (meaning that test method have higher priority). If not found even
         in test_case then return default.
     '''
+    if attr_name in TEST_PROFILE_ATTRIBUTES and isinstance(nose_test, nose.case.Test):
+        return get_test_profile(nose_test).get(attr_name, default)
+
     test_attr = getattr(get_test_case_method(nose_test), attr_name, None)
     if test_attr is not None:
         return test_attr
     else:
         return getattr(get_test_case_instance(nose_test), attr_name, default)
 
+# attributes configuring plugins, that do not change while test is run
+TEST_PROFILE_ATTRIBUTES = frozenset([
+    "no_database_interaction", "database_single_transaction", "database_flush",
+    "multi_db", "fixtures", "start_live_server", "test_type", "make_translations",
+    "translation_language_code", "selenium_start", "flush_django_cache",
+    "query_budget",
+])
+
+_missing = object()
+
+class TestProfile(object):
+    """
+    Test case class, instance and attributes configuring plugins
+    (TEST_PROFILE_ATTRIBUTES), resolved once per test and shared by
+    all plugins. Read-only; use get_test_profile to obtain it.
+    """
+    __slots__ = ('test_case', 'test_case_instance', '_values', '_present')
+
+    def __init__(self, nose_test):
+        method = get_test_case_method(nose_test)
+        if isinstance(nose_test.test, nose.case.FunctionTestCase):
+            instance = None
+        else:
+            instance = method.im_self
+
+        values = {}
+        present = set()
+        for attr_name in TEST_PROFILE_ATTRIBUTES:
+            # same resolution as getattr_test and hasattr_test
+            test_attr = getattr(method, attr_name, _missing)
+            instance_attr = getattr(instance, attr_name, _missing)
+            if test_attr is not _missing or instance_attr is not _missing:
+                present.add(attr_name)
+            if test_attr is not _missing and test_attr is not None:
+                values[attr_name] = test_attr
+            elif instance_attr is not _missing:
+                values[attr_name] = instance_attr
+
+        object.__setattr__(self, 'test_case', get_test_case_class(nose_test))
+        object.__setattr__(self, 'test_case_instance', instance)
+        object.__setattr__(self, '_values', values)
+        object.__setattr__(self, '_present', frozenset(present))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Test profile is read-only")
+
+    def get(self, attr_name, default=False):
+        return self._values.get(attr_name, default)
+
+    def has(self, attr_name):
+        return attr_name in self._present
+
+def get_test_profile(nose_test):
+    """ Return TestProfile of nose test, it's resolved on first call """
+    try:
+        return nose_test._dst_test_profile
+    except AttributeError:
+        profile = nose_test._dst_test_profile = TestProfile(nose_test)
+        return profile
+
 def enable_test(test_case, plugin_attribute):
     if not getattr(test_case, plugin_attribute, False):
         setattr(test_case, plugin_attribute, True)
@@ -114,30 +201,327 @@ def flush_database(test_case, database=DEFAULT_DB_ALIAS):
 ### Credits & Kudos to Django authors and Rob Hudson et al from #3357
 #####
 
-class StoppableWSGIServer(ThreadingMixIn, HTTPServer):
-    """WSGIServer with short timeout, so that server thread can stop this server."""
+# seconds idle keep-alive connection is kept open
+KEEP_ALIVE_TIMEOUT = 15
+
+class KeepAliveServerHandler(ServerHandler):
+    """
+    ServerHandler answering HTTP/1.1 requests by HTTP/1.1 and keeping
+    connection alive when client wants it. Response of unknown length is
+    buffered, so that it's length can be sent.
+    """
+    keep_alive = False
+
+    def finish_response(self):
+        if self.request_handler.can_keep_alive() and 'Content-Length' not in self.headers and not self.result_is_file():
+            result = self.result
+            try:
+                body = ''.join(result)
+            finally:
+                # closing response emits request_finished
+                if hasattr(result, 'close'):
+                    result.close()
+            self.result = [body]
+        ServerHandler.finish_response(self)
+
+    def cleanup_headers(self):
+        ServerHandler.cleanup_headers(self)
+        if self.environ['SERVER_PROTOCOL'].upper() == 'HTTP/1.1':
+            self.http_version = "1.1"
+        self.keep_alive = self.request_handler.can_keep_alive() and 'Content-Length' in self.headers
+        if self.keep_alive:
+            self.headers['Connection'] = 'keep-alive'
+        else:
+            self.headers['Connection'] = 'close'
+
+    def handle_error(self):
+        # response may be sent only partially
+        self.keep_alive = False
+        ServerHandler.handle_error(self)
+
+
+class KeepAliveWSGIRequestHandler(WSGIRequestHandler):
+    """
+    WSGIRequestHandler handling one request on connection. When client
+    keeps connection alive, it's handed back to server, together with
+    it's input file (that may contain buffered data of next request).
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def setup(self):
+        # StreamRequestHandler sets timeout since Python 2.6
+        self.request.settimeout(self.timeout)
+        WSGIRequestHandler.setup(self)
+        input_file = self.server.get_input_file()
+        if input_file is not None:
+            self.rfile = input_file
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+
+    def handle_one_request(self):
+        try:
+            self.raw_requestline = self.rfile.readline()
+        except socket.error:
+            # idle connection timed out or has been reset by client
+            self.close_connection = True
+            return
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+        if not self.parse_request(): # An error code has been sent, just exit
+            return
+        handler = KeepAliveServerHandler(self.rfile, self.wfile, self.get_stderr(), self.get_environ())
+        handler.request_handler = self      # backpointer for logging
+        handler.run(self.server.get_app())
+        if not handler.keep_alive:
+            self.close_connection = True
+
+    def can_keep_alive(self):
+        # body not read by application would be read as next request
+        return not self.close_connection and not int(self.headers.getheader('content-length') or 0)
+
+    def finish(self):
+        if self.close_connection:
+            WSGIRequestHandler.finish(self)
+        else:
+            # closing file objects does not close connection
+            self.wfile.close()
+            self.server.keep_alive(self.rfile)
+
+
+def has_buffered_input(input_file):
+    """ Return True if file object of socket has read more data than consumed """
+    buffer = getattr(input_file, '_rbuf', None)
+    return buffer is not None and buffer.tell() > 0
+
+
+class LiveServerMetrics(object):
+    """ Time requests waited in queue of live server and time they were handled """
+    def __init__(self, threads, queue_size):
+        self.threads = threads
+        self.queue_size = queue_size
+        self.waits = []
+        self.latencies = []
+
+    def record_wait(self, seconds):
+        self.waits.append(seconds)
+
+    def record_latency(self, seconds):
+        self.latencies.append(seconds)
+
+    def format_times(self, times):
+        if not times:
+            return "-"
+        return "mean %.1fms, 90%% %.1fms, max %.1fms" % (
+            sum(times) / len(times) * 1000, get_percentile(times, 90) * 1000, max(times) * 1000)
+
+    def get_report(self):
+        return "Live server: %d requests, %d threads, queue size %d; queue wait %s; latency %s" % (
+            len(self.latencies), self.threads, self.queue_size, self.format_times(self.waits), self.format_times(self.latencies))
+
+
+class StoppableWSGIServer(HTTPServer):
+    """
+    WSGIServer handling connections by fixed pool of worker threads, taking
+    them from queue of limited size. Server thread waits (by select) for
+    new connections, for next requests on idle keep-alive connections and
+    for self-pipe, written to when server is stopped or when connection
+    becomes idle, thus it's stopped immediately and never polls.
+    """
     application = None
     
-    def __init__(self, server_address, RequestHandlerClass=None):
+    def __init__(self, server_address, RequestHandlerClass=None, threads=DEFAULT_LIVE_SERVER_THREADS, queue_size=DEFAULT_LIVE_SERVER_QUEUE_SIZE):
         HTTPServer.__init__(self, server_address, RequestHandlerClass) 
+        self.stopping = False
+        self.wake_reader, self.wake_writer = os.pipe()
+        # idle keep-alive connections, socket: (client address, input file, idle since)
+        self.idle = {}
+        self.idle_lock = threading.Lock()
+        self.local = threading.local()
+        self.metrics = LiveServerMetrics(threads, queue_size)
+        self.queue = Queue.Queue(queue_size)
+        self.workers = []
+        for i in range(max(threads, 1)):
+            worker = threading.Thread(target=self.process_queue, name="LiveServerWorker-%d" % i)
+            worker.setDaemon(True)
+            worker.start()
+            self.workers.append(worker)
     
     def server_bind(self):
-        """ Bind server to socket. Overrided to store server name & set timeout"""
+        """ Bind server to socket. Overrided to store server name"""
         try:
             HTTPServer.server_bind(self)
         except Exception, e:
             raise WSGIServerException, e
         self.setup_environ()
-        self.socket.settimeout(1)
 
-    def get_request(self):
-        """Checks for timeout when getting request."""
+    def serve_forever(self):
+        """ Handle requests until stop is called """
+        while not self.stopping:
+            self.idle_lock.acquire()
+            try:
+                idle = self.idle.keys()
+            finally:
+                self.idle_lock.release()
+
+            try:
+                readable = select.select([self.socket, self.wake_reader] + idle, [], [], self.get_idle_timeout())[0]
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            if self.stopping:
+                break
+
+            for sock in readable:
+                if sock is self.socket:
+                    self.accept_request()
+                elif sock == self.wake_reader:
+                    os.read(self.wake_reader, 512)
+                else:
+                    self.resume_idle(sock)
+            self.close_expired()
+
+    def accept_request(self):
         try:
-            sock, address = self.socket.accept()
-#            sock.settimeout(None)
-            return (sock, address)
-        except socket.timeout:
-            raise
+            request, client_address = self.get_request()
+        except socket.error:
+            return
+        if self.verify_request(request, client_address):
+            try:
+                self.process_request(request, client_address)
+            except:
+                self.handle_error(request, client_address)
+                self.shutdown_request(request)
+        else:
+            self.shutdown_request(request)
+
+    def shutdown_request(self, request):
+        """ Shut down and close connection (not available before Python 2.6) """
+        try:
+            request.shutdown(socket.SHUT_WR)
+        except socket.error:
+            pass
+        self.close_request(request)
+
+    def process_request(self, request, client_address):
+        """ Queue accepted connection for workers """
+        self.enqueue(request, client_address, None)
+
+    def enqueue(self, request, client_address, input_file):
+        # blocks server thread when queue is full, until some worker takes connection
+        self.queue.put((request, client_address, input_file, time()))
+
+    def process_queue(self):
+        """ Worker thread: handle requests from queued connections """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            request, client_address, input_file, queued = item
+            self.metrics.record_wait(time() - queued)
+            self.process_connection(request, client_address, input_file)
+
+    def process_connection(self, request, client_address, input_file):
+        while True:
+            self.local.input_file = input_file
+            self.local.kept_alive = None
+            started = time()
+            try:
+                self.finish_request(request, client_address)
+            except:
+                self.handle_error(request, client_address)
+                self.shutdown_request(request)
+                return
+            self.metrics.record_latency(time() - started)
+
+            input_file = self.local.kept_alive
+            if input_file is None:
+                self.shutdown_request(request)
+                return
+            if not has_buffered_input(input_file):
+                self.add_idle(request, client_address, input_file)
+                return
+            # next request has been read already, together with this one
+
+    def get_input_file(self):
+        """ Return input file of connection resumed by current worker, if any """
+        return getattr(self.local, 'input_file', None)
+
+    def keep_alive(self, input_file):
+        """ Called by request handler when connection is kept alive """
+        self.local.kept_alive = input_file
+
+    def add_idle(self, request, client_address, input_file):
+        self.idle_lock.acquire()
+        try:
+            if self.stopping:
+                self.shutdown_request(request)
+                return
+            self.idle[request] = (client_address, input_file, time())
+        finally:
+            self.idle_lock.release()
+        self.wake()
+
+    def resume_idle(self, request):
+        self.idle_lock.acquire()
+        try:
+            client_address, input_file, since = self.idle.pop(request)
+        finally:
+            self.idle_lock.release()
+        self.enqueue(request, client_address, input_file)
+
+    def get_idle_timeout(self):
+        """ Return seconds until first idle connection expires, None if there is none """
+        self.idle_lock.acquire()
+        try:
+            if not self.idle:
+                return None
+            return max(min([since for address, input_file, since in self.idle.values()]) + KEEP_ALIVE_TIMEOUT - time(), 0)
+        finally:
+            self.idle_lock.release()
+
+    def close_expired(self):
+        self.idle_lock.acquire()
+        try:
+            expired = [request for request, (address, input_file, since) in self.idle.items() if time() - since >= KEEP_ALIVE_TIMEOUT]
+            for request in expired:
+                del self.idle[request]
+                self.shutdown_request(request)
+        finally:
+            self.idle_lock.release()
+
+    def wake(self):
+        try:
+            os.write(self.wake_writer, '.')
+        except OSError:
+            # server has been closed meanwhile
+            pass
+
+    def stop(self):
+        self.stopping = True
+        self.wake()
+
+    def server_close(self):
+        self.stopping = True
+        for worker in self.workers:
+            try:
+                self.queue.put_nowait(None)
+            except Queue.Full:
+                break
+        self.idle_lock.acquire()
+        try:
+            for request in self.idle.keys():
+                self.shutdown_request(request)
+            self.idle.clear()
+        finally:
+            self.idle_lock.release()
+        HTTPServer.server_close(self)
+        os.close(self.wake_reader)
+        os.close(self.wake_writer)
 
     #####
     ### Code from basehttp.WSGIServer follows
@@ -162,43 +546,68 @@ class StoppableWSGIServer(ThreadingMixIn, HTTPServer):
 class TestServerThread(threading.Thread):
     """Thread for running a http server while tests are running."""
 
-    def __init__(self, address, port):
+    def __init__(self, address, port, threads=DEFAULT_LIVE_SERVER_THREADS, queue_size=DEFAULT_LIVE_SERVER_QUEUE_SIZE):
         self.address = address
         self.port = port
-        self._stopevent = threading.Event()
+        self.threads = threads
+        self.queue_size = queue_size
+        self.httpd = None
         self.started = threading.Event()
         self.error = None
         super(TestServerThread, self).__init__()
 
     def run(self):
-        """Sets up test server and loops over handling http requests."""
+        """Sets up test server and handles http requests until stopped."""
         try:
             handler = get_server_handler()
             server_address = (self.address, self.port)
-            httpd = StoppableWSGIServer(server_address, WSGIRequestHandler)
+            httpd = StoppableWSGIServer(server_address, KeepAliveWSGIRequestHandler, self.threads, self.queue_size)
             #httpd = basehttp.WSGIServer(server_address, basehttp.WSGIRequestHandler)
             httpd.set_app(handler)
+            self.httpd = httpd
             self.started.set()
         except WSGIServerException, e:
             self.error = e
             self.started.set()
             return
 
-        # Loop until we get a stop event.
-        while not self._stopevent.isSet():
-            httpd.handle_request()
+        try:
+            httpd.serve_forever()
+        finally:
+            httpd.server_close()
 
     def join(self, timeout=None):
         """Stop the thread and wait for it to finish."""
-        self._stopevent.set()
+        if self.httpd:
+            self.httpd.stop()
         threading.Thread.join(self, timeout)
 
 
+class CherryPyServerThread(threading.Thread):
+    """ Thread running CherryPyWSGIServer, keeping error it has failed with """
+    def __init__(self, httpd):
+        self.httpd = httpd
+        self.error = None
+        super(CherryPyServerThread, self).__init__()
+        self.setDaemon(True)
+
+    def run(self):
+        try:
+            self.httpd.start()
+        except Exception, e:
+            self.error = e
+
+
 class AbstractLiveServerPlugin(Plugin):
+    # seconds between checks whether server is ready
+    readiness_poll_interval = 0.01
+
     def __init__(self):
         Plugin.__init__(self)
         self.server_started = False
         self.server_thread = None
+        # port server is bound to, when configured to bind any free port
+        self.bound_port = None
 
     def options(self, parser, env=os.environ):
         Plugin.options(self, parser, env)
@@ -212,28 +621,91 @@ class AbstractLiveServerPlugin(Plugin):
     def stop_server(self):
         raise NotImplementedError()
 
+    def get_server_port(self):
+        """ Return port server is actually bound to """
+        raise NotImplementedError()
+
+    def wait_for_server(self, address, port, is_ready, thread):
+        """
+        Wait until server run by thread is ready (is_ready returns True)
+        and, if LIVE_SERVER_HEALTH_URL is set, until it answers request for
+        it. Raise WSGIServerException when thread fails or server is not
+        ready in LIVE_SERVER_STARTUP_TIMEOUT seconds.
+        """
+        from django.conf import settings
+
+        timeout = float(getattr(settings, "LIVE_SERVER_STARTUP_TIMEOUT", DEFAULT_LIVE_SERVER_STARTUP_TIMEOUT))
+        deadline = time() + timeout
+        while not is_ready():
+            if thread.error or not thread.isAlive():
+                raise WSGIServerException("Live server could not be started on %s:%s: %s" % (address, port, thread.error or "server thread exited"))
+            if time() > deadline:
+                raise WSGIServerException("Live server on %s:%s not ready in %s seconds" % (address, port, timeout))
+            sleep(self.readiness_poll_interval)
+
+        health_url = getattr(settings, "LIVE_SERVER_HEALTH_URL", None)
+        if health_url:
+            if not port:
+                port = self.get_server_port()
+            self.check_server_health(address, port, health_url, deadline)
+
+    def check_server_health(self, address, port, health_url, deadline):
+        """ Wait until server answers request for health_url by other than server error """
+        if address in ('0.0.0.0', ''):
+            address = '127.0.0.1'
+        while True:
+            connection = httplib.HTTPConnection(address, port)
+            try:
+                try:
+                    connection.connect()
+                    connection.sock.settimeout(max(deadline - time(), self.readiness_poll_interval))
+                    connection.request('GET', health_url)
+                    response = connection.getresponse()
+                    response.read()
+                    status = response.status
+                    if status < 500:
+                        return
+                    error = "HTTP status %d" % status
+                except (socket.error, httplib.HTTPException), e:
+                    error = e
+            finally:
+                connection.close()
+            if time() > deadline:
+                raise WSGIServerException("Live server on %s:%s did not answer %s: %s" % (address, port, health_url, error))
+            sleep(self.readiness_poll_interval)
+
     def check_database_multithread_compilant(self):
         # When using memory database, complain as we'd use indepenent databases
         connections = get_databases()
         for alias in connections:
             database = connections[alias]
-            if database.settings_dict['NAME'] == ':memory:' and database.settings_dict['ENGINE'] in ('django.db.backends.sqlite3', 'sqlite3'):
+            if get_test_database_name(database) == ':memory:' and database.settings_dict['ENGINE'] in ('django.db.backends.sqlite3', 'sqlite3'):
                 self.skipped = True
                 return False
         return True
 
     def startTest(self, test):
         from django.conf import settings
-        test_case = get_test_case_class(test)
-        test_case_instance = get_test_case_instance(test)
+        profile = get_test_profile(test)
+        test_case = profile.test_case
+        test_case_instance = profile.test_case_instance
         if not self.server_started and getattr_test(test, "start_live_server", False):
             if not self.check_database_multithread_compilant():
                 raise SkipTest("You're running database in memory, but trying to use live server in another thread. Skipping.")
-            self.start_server(
-                address=getattr(settings, "LIVE_SERVER_ADDRESS", DEFAULT_LIVE_SERVER_ADDRESS),
-                port=int(getattr(settings, "LIVE_SERVER_PORT", DEFAULT_LIVE_SERVER_PORT))
-            )
+            port = int(getattr(settings, "LIVE_SERVER_PORT", DEFAULT_LIVE_SERVER_PORT))
+            phase_timer.start("server")
+            try:
+                self.start_server(
+                    address=getattr(settings, "LIVE_SERVER_ADDRESS", DEFAULT_LIVE_SERVER_ADDRESS),
+                    port=port
+                )
+            finally:
+                phase_timer.stop("server")
             self.server_started = True
+            # port 0 means any free port; tests must be pointed to the one bound
+            if port == 0:
+                self.bound_port = self.get_server_port()
+                set_live_server_port(self.bound_port)
             
         enable_test(test_case, 'http_plugin_started')
         
@@ -242,7 +714,7 @@ class AbstractLiveServerPlugin(Plugin):
             test_case_instance.client = None
 
     def stopTest(self, test):
-        test_case_instance = get_test_case_instance(test)
+        test_case_instance = get_test_profile(test).test_case_instance
         if getattr_test(test, "_twill", None):
             from twill.commands import reset_browser
             reset_browser()
@@ -250,6 +722,9 @@ class AbstractLiveServerPlugin(Plugin):
 
     def finalize(self, result):
         self.stop_test_server()
+        if self.bound_port is not None:
+            set_live_server_port(0)
+            self.bound_port = None
 
 
 class DjangoLiveServerPlugin(AbstractLiveServerPlugin):
@@ -263,17 +738,29 @@ class DjangoLiveServerPlugin(AbstractLiveServerPlugin):
     activation_parameter = '--with-djangoliveserver'
     
     def start_server(self, address='0.0.0.0', port=8000):
-        self.server_thread = TestServerThread(address, port)
+        from django.conf import settings
+        self.server_thread = TestServerThread(address, port,
+            threads=int(getattr(settings, "LIVE_SERVER_THREADS", DEFAULT_LIVE_SERVER_THREADS)),
+            queue_size=int(getattr(settings, "LIVE_SERVER_QUEUE_SIZE", DEFAULT_LIVE_SERVER_QUEUE_SIZE)),
+        )
         self.server_thread.start()
         self.server_thread.started.wait()
         if self.server_thread.error:
             raise self.server_thread.error
+        self.wait_for_server(address, self.server_thread.httpd.server_port, lambda: True, self.server_thread)
+
+    def get_server_port(self):
+        return self.server_thread.httpd.server_port
          
     def stop_test_server(self):
         if self.server_thread:
             self.server_thread.join()
         self.server_started = False
 
+    def report(self, stream):
+        if self.server_thread and self.server_thread.httpd and self.server_thread.httpd.metrics.latencies:
+            stream.writeln(self.server_thread.httpd.metrics.get_report())
+
 #####
 ### It was a nice try with Django server being threaded.
 ### It still sucks for some cases (did I mentioned urllib2?),
@@ -294,13 +781,18 @@ class CherryPyLiveServerPlugin(AbstractLiveServerPlugin):
             return handler(environ, start_response)
         
         from cherrypy.wsgiserver import CherryPyWSGIServer
-        from threading import Thread
         self.httpd = CherryPyWSGIServer((address, port), application, server_name='django-test-http')
-        self.httpd_thread = Thread(target=self.httpd.start)
+        self.httpd_thread = CherryPyServerThread(self.httpd)
         self.httpd_thread.start()
-        #FIXME: This could be avoided by passing self to thread class starting django
-        # and waiting for Event lock
-        sleep(.5)
+        # server is ready when it's socket is bound and it's accept loop is entered
+        try:
+            self.wait_for_server(address, port, lambda: self.httpd.ready, self.httpd_thread)
+        except WSGIServerException:
+            self.httpd.stop()
+            raise
+
+    def get_server_port(self):
+        return self.httpd.socket.getsockname()[1]
    
     def stop_test_server(self):
         if self.server_started:
@@ -316,6 +808,36 @@ class DjangoPlugin(Plugin):
     name = 'django'
     env_opt = 'DST_PERSIST_TEST_DATABASE'
 
+    def __init__(self):
+        Plugin.__init__(self)
+        self.persist_test_database = False
+        self.is_worker = False
+        self.worker_processes = 0
+        self._init_state()
+
+    def _init_state(self):
+        """ Set state of test run to defaults (nothing created, nothing installed) """
+        self.created_databases = {}
+        self.old_names = []
+        self.mirrors = []
+        self.pending_contexts = []
+        self.south_patched = False
+        self.database_creation_lock = threading.RLock()
+        self.database_creation_state = threading.local()
+        # alias: thread creating it's test database right now
+        self.creating_databases = {}
+        self.creating_databases_condition = threading.Condition()
+        self.database_signatures = {}
+        self.duplicate_names = []
+        self.database_snapshots = {}
+        self.dirty_tables_tracker = None
+        self.fixture_set = None
+        self.fixture_savepoints = {}
+        self.database_clones = []
+        self.fixture_cache = None
+        self.count_queries = False
+        self.query_counter = QueryCounter()
+
     def startContext(self, context):
         if ismodule(context) or is_test_case_class(context):
             if ismodule(context):
@@ -323,24 +845,10 @@ class DjangoPlugin(Plugin):
             else:
                 attr_suffix = '_after_all_tests'
             if getattr(context, 'database_single_transaction' + attr_suffix, False):
-                #TODO: When no test case in this module needing database is run (for example 
-                #      user selected only one unitTestCase), database should not be initialized.
-                #      So it would be best if db is initialized when first test case needing 
-                #      database is run. 
-                
-                # create test database if not already created
-                if not self.test_database_created:
-                    self._create_test_databases()
-
-                if getattr(context, 'database_single_transaction' + attr_suffix, False):
-                    from django.db import transaction
-                    transaction.enter_transaction_management()
-                    transaction.managed(True)
-
-                # when used from startTest, nose-wrapped testcase is provided -- while now,
-                # we have 'bare' test case.
-
-                self._prepare_tests_fixtures(context)
+                # When no test case needing database is run in this context (for example
+                # user selected only one UnitTestCase), database should not be initialized,
+                # thus context is set up when first test case needing database is run.
+                self.pending_contexts.append(context)
 
     def stopContext(self, context):
         if ismodule(context) or is_test_case_class(context):
@@ -352,14 +860,24 @@ class DjangoPlugin(Plugin):
             else:
                 attr_suffix = '_after_all_tests'
 
-            if self.test_database_created:
+            if context in self.pending_contexts:
+                # no test needing database was run in context, nothing to tear down
+                self.pending_contexts.remove(context)
+                return
+
+            if self.created_databases:
+                if getattr(context, 'database_single_transaction' + attr_suffix, False) \
+                    or getattr(context, "database_flush" + attr_suffix, None):
+                    self._leave_fixture_transaction()
+
                 if getattr(context, 'database_single_transaction' + attr_suffix, False):
                     transaction.rollback()
                     transaction.leave_transaction_management()
 
                 if getattr(context, "database_flush" + attr_suffix, None):
                     for db in self._get_tests_databases(getattr(context, 'multidb', False)):
-                        getattr(settings, "TEST_DATABASE_FLUSH_COMMAND", flush_database)(self, database=db)
+                        if self._get_created_alias(db) in self.created_databases:
+                            self._reset_database(db)
 
     def options(self, parser, env=os.environ):
         Plugin.options(self, parser, env)
@@ -373,33 +891,32 @@ class DjangoPlugin(Plugin):
         Plugin.configure(self, options, config)
         self.persist_test_database = options.persist_test_database
 
-    def setup_databases(self, verbosity, autoclobber, **kwargs):
+        # when running tests in parallel, parent process prepares databases for workers
+        self.is_worker = bool(getattr(options, 'dst_worker', None))
+        if self.is_worker:
+            self.worker_processes = 0
+        else:
+            self.worker_processes = getattr(options, 'dst_processes', 0) or 0
+
+    def setup_databases(self, verbosity, autoclobber, databases=None, **kwargs):
         # Taken from Django 1.2 code, (C) respective Django authors. Modified for backward compatibility by me
+        # Test mirrors are redirected when plugin begins, see _redirect_test_mirrors
         connections = get_databases()
         old_names = []
         mirrors = []
 
-        from django.conf import settings
-        if 'south' in settings.INSTALLED_APPS:
-            from south.management.commands import patch_for_test_db_setup
+        self._patch_south()
 
-            settings.SOUTH_TESTS_MIGRATE = getattr(settings, 'DST_RUN_SOUTH_MIGRATIONS', True)
-            patch_for_test_db_setup()
+        if databases is None:
+            databases = self._get_aliases()
 
-        for alias in connections:
+        for alias in databases:
             connection = connections[alias]
-            # If the database is a test mirror, redirect it's connection
-            # instead of creating a test database.
-            if 'TEST_MIRROR' in connection.settings_dict and connection.settings_dict['TEST_MIRROR']:
-                mirrors.append((alias, connection))
-                mirror_alias = connection.settings_dict['TEST_MIRROR']
-                connections._connections[alias] = connections[mirror_alias]
+            if 'NAME' in connection.settings_dict:
+                old_names.append((connection, connection.settings_dict['NAME']))
             else:
-                if 'NAME' in connection.settings_dict:
-                    old_names.append((connection, connection.settings_dict['NAME']))
-                else:
-                    old_names.append((connection, connection.settings_dict['DATABASE_NAME']))
-                connection.creation.create_test_db(verbosity=verbosity, autoclobber=autoclobber)
+                old_names.append((connection, connection.settings_dict['DATABASE_NAME']))
+            connection.creation.create_test_db(verbosity=verbosity, autoclobber=autoclobber)
         return old_names, mirrors
 
     def teardown_databases(self, old_config, verbosity, **kwargs):
@@ -412,42 +929,113 @@ class DjangoPlugin(Plugin):
         # Destroy all the non-mirror databases
         for connection, old_name in old_names:
             connection.creation.destroy_test_db(old_name, verbosity)
-        
-        self.test_database_created = False
 
     def begin(self):
+        from django.conf import settings
         from django.test.utils import setup_test_environment
         setup_test_environment()
-        self.test_database_created = False
+        self._init_state()
+
+        if getattr(settings, "DST_CACHE_FIXTURES", False):
+            self.fixture_cache = FixtureCache()
+
+        # counting all queries is opt-in, tests declaring query_budget install counter anyway
+        self.count_queries = getattr(settings, "DST_COUNT_QUERIES", False)
+        if self.count_queries:
+            self.query_counter.install()
+
+        self._redirect_test_mirrors()
+        self._install_lazy_creation()
 
     def prepareTestRunner(self, runner):
         """
         Before running tests, initialize database et al, so noone will complain
         """
-        # FIXME: this should be lazy for tests that do not need test
-        # database at all
-        
         flush_cache()
 
+        if self.worker_processes > 1 and self._can_clone_test_databases():
+            self._create_test_databases()
+
     def finalize(self, result):
         """
         At the end, tear down our testbed
         """
         from django.test.utils import teardown_test_environment
         teardown_test_environment()
-        
-        if not self.persist_test_database and getattr(self, 'test_database_created', None):
-            self.teardown_databases(self.old_config, verbosity=False)
-#            from django.db import connection
-#            connection.creation.destroy_test_db(self.old_name, verbosity=False)
-    
-    
+
+        self._leave_fixture_transaction()
+        self._drop_database_snapshots()
+        if self.dirty_tables_tracker:
+            self.dirty_tables_tracker.uninstall()
+            self.dirty_tables_tracker = None
+        # installed before dirty tables tracker, thus uninstalled after it
+        if self.query_counter:
+            self.query_counter.uninstall()
+
+        if self.persist_test_database:
+            self.old_names = []
+        else:
+            self._drop_database_clones()
+
+        self._remove_lazy_creation()
+        for connection, old_name in self.duplicate_names:
+            connection.settings_dict['NAME'] = old_name
+        self.teardown_databases((self.old_names, self.mirrors), verbosity=False)
+        self.old_names = []
+        self.mirrors = []
+        self.duplicate_names = []
+
+    def report(self, stream):
+        stream.writeln(self.get_database_report())
+        if self.fixture_cache and (self.fixture_cache.hits or self.fixture_cache.misses):
+            stream.writeln(self.fixture_cache.get_report())
+        if self.count_queries:
+            from django.conf import settings
+            for line in self.query_counter.get_report_lines(getattr(settings, "DST_QUERY_REPORT_SIZE", 10)):
+                stream.writeln(line)
+
+    def get_database_report(self):
+        created = [alias for alias in self._get_aliases() if alias in self.created_databases]
+        not_needed = [alias for alias in self._get_aliases() if alias not in self.created_databases]
+
+        parts = ["%s (%.2fs)" % (alias, self.created_databases[alias]) for alias in created]
+        if not_needed and created:
+            average = sum([self.created_databases[alias] for alias in created]) / len(created)
+            parts.append("not needed: %s (about %.2fs saved)" % (", ".join(not_needed), average * len(not_needed)))
+        elif not_needed:
+            parts.append("not needed: %s" % ", ".join(not_needed))
+
+        return "Test databases: %s" % "; ".join(parts)
+
+    def prepareTestCase(self, test):
+        """
+        Check query budget of tests declaring it. Other tests are left to
+        be run by other plugins or nose itself.
+        """
+        budget = getattr_test(test, "query_budget", None)
+        if budget is None or not self.query_counter or issubclass(get_test_profile(test).test_case, DjangoTestCase):
+            return None
+
+        counter = self.query_counter
+        counter.install()
+        def run(result):
+            test.test(QueryBudgetResult(result, counter, budget))
+        return run
+
     def startTest(self, test):
         """
         When preparing test, check whether to make our database fresh
         """
+        self._prepare_test(test)
+
+        # queries are counted after database and fixtures are prepared
+        if self.query_counter and not issubclass(get_test_profile(test).test_case, DjangoTestCase):
+            self.query_counter.start()
 
-        test_case = get_test_case_class(test)
+    def _prepare_test(self, test):
+
+        profile = get_test_profile(test)
+        test_case = profile.test_case
         if issubclass(test_case, DjangoTestCase):
             return
 
@@ -460,8 +1048,7 @@ class DjangoPlugin(Plugin):
         from django.conf import settings
         from django.db import transaction
         
-        test_case = get_test_case_class(test)
-        test_case_instance = get_test_case_instance(test)
+        test_case_instance = profile.test_case_instance
 
         mail.outbox = []
         enable_test(test_case, 'django_plugin_started')
@@ -483,13 +1070,20 @@ class DjangoPlugin(Plugin):
             # as unittests by definition do not interacts with database
             return
         
-        # create test database if not already created
-        if not self.test_database_created:
-            self._create_test_databases()
+        # create test databases test needs, if not already created
+        self._create_test_databases(self._get_tests_databases(getattr_test(test, 'multi_db')))
+        self._start_pending_contexts()
         
         # make self.transaction available
         test_case.transaction = transaction
         
+        fixture_set = self._get_fixture_set(test)
+        if fixture_set:
+            self._enter_fixture_savepoint(test, fixture_set)
+            return
+
+        self._leave_fixture_transaction()
+
         if getattr_test(test, 'database_single_transaction'):
             transaction.enter_transaction_management()
             transaction.managed(True)
@@ -501,15 +1095,18 @@ class DjangoPlugin(Plugin):
         After test is run, clear urlconf, caches and database
         """
 
-        test_case = get_test_case_class(test)
+        profile = get_test_profile(test)
+        test_case = profile.test_case
         if issubclass(test_case, DjangoTestCase):
             return
 
+        if self.query_counter:
+            self.query_counter.stop(test.id())
+
         from django.db import transaction
         from django.conf import settings
 
-        test_case = get_test_case_class(test)
-        test_case_instance = get_test_case_instance(test)
+        test_case_instance = profile.test_case_instance
 
         if hasattr(test_case_instance, 'is_skipped') and test_case_instance.is_skipped():
             return
@@ -524,13 +1121,19 @@ class DjangoPlugin(Plugin):
             # as unittests by definition do not interacts with database
             return
         
-        if getattr_test(test, 'database_single_transaction'):
-            transaction.rollback()
-            transaction.leave_transaction_management()
+        phase_timer.start("reset")
+        try:
+            if self.fixture_savepoints:
+                self._rollback_fixture_savepoints()
+            elif getattr_test(test, 'database_single_transaction'):
+                transaction.rollback()
+                transaction.leave_transaction_management()
 
-        if getattr_test(test, "database_flush", True):
-            for db in self._get_tests_databases(getattr_test(test, 'multi_db')):
-                getattr(settings, "TEST_DATABASE_FLUSH_COMMAND", flush_database)(self, database=db)
+            if getattr_test(test, "database_flush", True):
+                for db in self._get_tests_databases(getattr_test(test, 'multi_db')):
+                    self._reset_database(db)
+        finally:
+            phase_timer.stop("reset")
 
     def _get_databases(self):
         try:
@@ -566,41 +1169,503 @@ class DjangoPlugin(Plugin):
                 commit = True
             else:
                 commit = False
-            for db in self._get_tests_databases(getattr_test(test, 'multi_db')):
-                call_command('loaddata', *getattr_test(test, 'fixtures'), **{'verbosity': 0, 'commit' : commit, 'database' : db})
+            phase_timer.start("fixtures")
+            try:
+                for db in self._get_tests_databases(getattr_test(test, 'multi_db')):
+                    if self.fixture_cache:
+                        self.fixture_cache.load(getattr_test(test, 'fixtures'), database=db, commit=commit)
+                    else:
+                        call_command('loaddata', *getattr_test(test, 'fixtures'), **{'verbosity': 0, 'commit' : commit, 'database' : db})
+            finally:
+                phase_timer.stop("fixtures")
+
+    def _get_fixture_set(self, test):
+        """
+        Return key identifying fixtures test needs, if they can be shared with
+        other tests using savepoints (see DST_FIXTURE_SAVEPOINTS); None otherwise.
+        """
+        from django.conf import settings
+
+        if not getattr(settings, "DST_FIXTURE_SAVEPOINTS", False) \
+            or not hasattr_test(test, 'fixtures') \
+            or not getattr_test(test, 'database_single_transaction') \
+            or getattr_test(test, "database_flush", True):
+            return None
+
+        connections = self._get_databases()
+        databases = tuple(self._get_tests_databases(getattr_test(test, 'multi_db')))
+        for db in databases:
+            if not getattr(connections[db].features, 'uses_savepoints', False):
+                return None
+
+        return (tuple(getattr_test(test, 'fixtures')), databases)
+
+    def _enter_fixture_savepoint(self, test, fixture_set):
+        """
+        Load fixtures in transaction and take savepoint after them, unless
+        they are already loaded for previous test.
+        """
+        from django.db import transaction
+
+        if self.fixture_set == fixture_set:
+            return
+
+        self._leave_fixture_transaction()
+
+        databases = fixture_set[1]
+        for db in databases:
+            transaction.enter_transaction_management(using=db)
+            transaction.managed(True, using=db)
+
+        self._prepare_tests_fixtures(test)
+
+        self.fixture_set = fixture_set
+        for db in databases:
+            self.fixture_savepoints[db] = transaction.savepoint(using=db)
+
+    def _rollback_fixture_savepoints(self):
+        from django.db import transaction, DatabaseError
+
+        try:
+            for db, sid in self.fixture_savepoints.items():
+                transaction.savepoint_rollback(sid, using=db)
+        except DatabaseError:
+            # savepoint is gone, probably because test has commited
+            self._leave_fixture_transaction()
+
+    def _leave_fixture_transaction(self):
+        from django.db import transaction
+
+        if not self.fixture_set:
+            return
+
+        for db in self.fixture_set[1]:
+            transaction.rollback(using=db)
+            transaction.leave_transaction_management(using=db)
+
+        self.fixture_set = None
+        self.fixture_savepoints = {}
+
+    def _reset_database(self, database):
+        """
+        Return database to state it was in after creation, using
+        TEST_DATABASE_RESET_STRATEGY
+        """
+        if self._get_created_alias(database) in self.database_snapshots:
+            self.database_snapshots[self._get_created_alias(database)].restore()
+        elif self.dirty_tables_tracker:
+            self.dirty_tables_tracker.flush(database)
+        else:
+            from django.conf import settings
+            getattr(settings, "TEST_DATABASE_FLUSH_COMMAND", flush_database)(self, database=database)
+
+    def _take_database_snapshot(self, alias):
+        connection = self._get_databases()[alias]
+        name = connection.settings_dict['NAME']
+
+        # duplicate aliases share one snapshot
+        for snapshot in self.database_snapshots.values():
+            if snapshot.database_name == name:
+                self.database_snapshots[alias] = snapshot
+                return
+
+        snapshot = get_snapshot(connection)
+        if snapshot:
+            snapshot.take()
+            self.database_snapshots[alias] = snapshot
+
+    def _drop_database_snapshots(self):
+        dropped = []
+        for snapshot in self.database_snapshots.values():
+            if snapshot not in dropped:
+                snapshot.drop()
+                dropped.append(snapshot)
+        self.database_snapshots = {}
+
+    def _get_test_mirror(self, alias):
+        connections = self._get_databases()
+        return getattr(connections, 'databases', {}).get(alias, {}).get('TEST_MIRROR')
+
+    def _get_created_alias(self, alias):
+        """ Return alias of database that is created for given one, i.e. resolve test mirrors """
+        return self._get_test_mirror(alias) or alias
+
+    def _get_aliases(self):
+        """ Return aliases of databases test database is created for """
+        return [alias for alias in self._get_databases() if not self._get_test_mirror(alias)]
+
+    def _redirect_test_mirrors(self):
+        """ If the database is a test mirror, redirect it's connection instead of creating a test database """
+        connections = self._get_databases()
+        for alias in connections:
+            mirror_alias = self._get_test_mirror(alias)
+            if mirror_alias:
+                self.mirrors.append((alias, connections[alias]))
+                connections._connections[alias] = connections[mirror_alias]
 
-    def _create_test_databases(self):
+    def _install_lazy_creation(self):
+        """
+        Test database is created on first use of it's connection, even if
+        test (or live server) uses it without declaring it, so that
+        real database is never touched.
+        """
+        connections = self._get_databases()
+        for alias in self._get_aliases():
+            self._hook_connection(connections[alias], alias)
+
+    def _hook_connection(self, connection, alias):
+        plugin = self
+
+        def cursor():
+            plugin._create_test_databases([alias])
+            return type(connection).cursor(connection)
+
+        connection.cursor = cursor
+
+    def _unhook_connection(self, connection):
+        connection.__dict__.pop('cursor', None)
+
+    def _remove_lazy_creation(self):
+        connections = self._get_databases()
+        for alias in self._get_aliases():
+            self._unhook_connection(connections[alias])
+
+    def _patch_south(self):
         from django.conf import settings
+
+        if 'south' in settings.INSTALLED_APPS and not self.south_patched:
+            from south.management.commands import patch_for_test_db_setup
+
+            settings.SOUTH_TESTS_MIGRATE = getattr(settings, 'DST_RUN_SOUTH_MIGRATIONS', True)
+            patch_for_test_db_setup()
+            self.south_patched = True
+
+    def _start_pending_contexts(self):
+        """ Set up contexts deferred until first test needing database is run """
+        from django.db import transaction
+
+        while self.pending_contexts:
+            context = self.pending_contexts.pop(0)
+            self._create_test_databases(self._get_tests_databases(getattr(context, 'multi_db', False)))
+
+            self._leave_fixture_transaction()
+            transaction.enter_transaction_management()
+            transaction.managed(True)
+
+            # when used from startTest, nose-wrapped testcase is provided -- while now,
+            # we have 'bare' test case.
+            self._prepare_tests_fixtures(context)
+
+    def _can_clone_test_databases(self):
         connections = self._get_databases()
+        for alias in self._get_aliases():
+            connection = connections[alias]
+            if connection.settings_dict['ENGINE'].split(".")[-1] not in BACKEND_SNAPSHOT_MAP \
+                or get_test_database_name(connection) == ':memory:':
+                return False
+        return True
 
-        database_created = False
-        if not self.persist_test_database:
-            self.old_config = self.setup_databases(verbosity=False, autoclobber=True)
-            database_created = self.test_database_created = True
+    def _clone_test_database(self, alias, fingerprint):
+        """
+        Clone master test database for every worker process. Clones are
+        tagged with schema fingerprint; persisted clones are rebuilt only
+        when their fingerprint does not match.
+        """
+        connection = self._get_databases()[alias]
+        snapshot = get_snapshot(connection)
+        for index in range(self.worker_processes):
+            name = get_worker_database_name(snapshot.database_name, index)
+            if not self.persist_test_database or read_database_fingerprint(connection, name) != fingerprint:
+                snapshot.copy_to(name)
+                self._tag_database(connection, name, fingerprint)
+            self.database_clones.append((snapshot, name))
+
+    def _tag_database(self, connection, name, fingerprint):
+        old_name = connection.settings_dict['NAME']
+        connection.close()
+        connection.settings_dict['NAME'] = name
+        try:
+            write_fingerprint(connection, fingerprint)
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = old_name
+
+    def _drop_database_clones(self):
+        for snapshot, name in self.database_clones:
+            snapshot.drop_copy(name)
+        self.database_clones = []
+
+    def _switch_to_test_database(self, connection, name):
+        """ Use existing test database """
+        connection.close()
+        connection.settings_dict['NAME'] = name
+        if hasattr(connection.features, 'confirm'):
+            connection.features.confirm()
+
+    def _get_test_dependencies(self, alias):
+        """ Return aliases test database of alias depends on, see TEST_DEPENDENCIES """
+        settings_dict = self._get_databases()[alias].settings_dict
+        if 'TEST_DEPENDENCIES' in settings_dict:
+            return [self._get_created_alias(dependency) for dependency in settings_dict['TEST_DEPENDENCIES']]
+        elif alias != DEFAULT_DB_ALIAS:
+            return [DEFAULT_DB_ALIAS]
         else:
-            # switch to test database, find out whether it exists, if so, use it, otherwise create a new:
-            for connection in connections.all():
-                connection.close()
-                old_db_name = connection.settings_dict["NAME"]
-                connection.settings_dict["NAME"] = connection.creation._get_test_db_name()
+            return []
+
+    def _create_test_databases(self, databases=None):
+        """
+        Create test databases for given aliases (all by default), unless
+        they are already created. Databases they explicitly depend on
+        (TEST_DEPENDENCIES) are created as well.
+        """
+        if databases is None:
+            databases = self._get_aliases()
+
+        # Database may be used while another one is created in creation thread,
+        # while creating thread holds the lock and waits for it. Databases are
+        # then guarded by claims only, see _claim_test_database.
+        nested = getattr(self.database_creation_state, 'creating', False)
+        if not nested:
+            self.database_creation_lock.acquire()
+        try:
+            aliases = []
+            queue = [self._get_created_alias(alias) for alias in databases]
+            while queue:
+                alias = queue.pop(0)
+                if alias not in self.created_databases and alias not in aliases:
+                    aliases.append(alias)
+                    queue.extend(self._get_databases()[alias].settings_dict.get('TEST_DEPENDENCIES', []))
+
+            if aliases:
+                if not nested:
+                    phase_timer.start("databases")
+                    if self.query_counter:
+                        self.query_counter.suspend()
+                try:
+                    self._create_test_database_groups(aliases)
+                finally:
+                    if not nested:
+                        phase_timer.stop("databases")
+                        if self.query_counter:
+                            self.query_counter.resume()
+        finally:
+            if not nested:
+                self.database_creation_lock.release()
+
+    def _create_test_database_groups(self, aliases):
+        """
+        Create test databases for aliases: those with same test_db_signature
+        share one database and independent ones are created concurrently
+        (see DST_DATABASE_CREATION_THREADS), in order given by TEST_DEPENDENCIES.
+        """
+        from django.conf import settings
+        from djangosanetesting.runnercompat import dependency_ordered
+
+        connections = self._get_databases()
+
+        test_databases = {}
+        for alias in aliases:
+            connection = connections[alias]
+            self._unhook_connection(connection)
+            if hasattr(connection.creation, 'test_db_signature'):
+                signature = connection.creation.test_db_signature()
+            else:
+                signature = (alias,)
+            # every in-memory database is a different one
+            if get_test_database_name(connection) == ':memory:':
+                signature += (alias,)
+            if signature not in test_databases:
+                test_databases[signature] = (connection.settings_dict['NAME'], [])
+                # database may be already created for another alias
+                if signature in self.database_signatures:
+                    test_databases[signature][1].append(self.database_signatures[signature])
+            test_databases[signature][1].append(alias)
+
+        # dependencies order creation of databases created together, they're already satisfied otherwise
+        dependencies = {}
+        for alias in aliases:
+            dependencies[alias] = [dependency for dependency in self._get_test_dependencies(alias) if dependency in aliases]
+
+        groups = []
+        for signature, (db_name, group) in dependency_ordered(test_databases.items(), dict(dependencies)):
+            self.database_signatures.setdefault(signature, group[0])
+            groups.append(group)
+
+        threads = int(getattr(settings, "DST_DATABASE_CREATION_THREADS", 4))
+        # in-memory databases can be used only by thread that created them,
+        # and South keeps database it's migrating in module global
+        concurrent = threads > 1 and len(groups) > 1 and 'south' not in settings.INSTALLED_APPS \
+            and ':memory:' not in [get_test_database_name(connections[alias]) for alias in aliases]
+
+        try:
+            if concurrent:
+                self._create_test_database_groups_concurrently(groups, dependencies, threads)
+            else:
+                for group in groups:
+                    self._create_test_database_group(group)
+        except:
+            # databases that failed to be created must not be used
+            for alias in aliases:
+                if alias not in self.created_databases:
+                    self._hook_connection(connections[alias], alias)
+            raise
+
+        if self.worker_processes <= 1:
+            for alias in aliases:
+                self._prepare_database_reset(alias)
+
+    def _create_test_database_groups_concurrently(self, groups, dependencies, threads):
+        """
+        Create groups of databases in thread pool, each as soon as
+        databases it depends on are created.
+        """
+        from django.core.exceptions import ImproperlyConfigured
+
+        condition = threading.Condition()
+        pending = list(groups)
+        running = []
+        done = set()
+        errors = []
+
+        def get_missing_dependencies(group):
+            group_dependencies = set()
+            for alias in group:
+                group_dependencies.update(dependencies[alias])
+            return group_dependencies.difference(group).difference(done)
+
+        def create(group):
+            self.database_creation_state.creating = True
+            try:
                 try:
-                    connection.cursor()
-                except Exception:
-                    # test database doesn't exist, create it as normally:
-                    connection.settings_dict["NAME"] = old_db_name # return original db name
-                    connection.creation.create_test_db()
-                    database_created = True
-
-                connection.features.confirm()
-                self.test_database_created = True
-
-        if database_created:
-            for db in connections:
-                if 'south' in settings.INSTALLED_APPS and getattr(settings, 'DST_RUN_SOUTH_MIGRATIONS', True):
-                    call_command('migrate', database=db)
-                
-                if getattr(settings, "FLUSH_TEST_DATABASE_AFTER_INITIAL_SYNCDB", False):
-                    getattr(settings, "TEST_DATABASE_FLUSH_COMMAND", flush_database)(self, database=db)
+                    self._create_test_database_group(group)
+                finally:
+                    # connection must not be bound to this thread
+                    self._get_databases()[group[0]].close()
+            except Exception:
+                errors.append(sys.exc_info())
+
+            condition.acquire()
+            try:
+                running.remove(group)
+                done.update(group)
+                condition.notifyAll()
+            finally:
+                condition.release()
+
+        condition.acquire()
+        try:
+            while (pending and not errors) or running:
+                for group in pending[:]:
+                    if len(running) >= threads or errors:
+                        break
+                    if not get_missing_dependencies(group):
+                        pending.remove(group)
+                        running.append(group)
+                        threading.Thread(target=create, args=(group,)).start()
+                if not running:
+                    # nothing is being created, thus nothing pending will ever be started
+                    raise ImproperlyConfigured("Test databases can't be created, TEST_DEPENDENCIES not satisfied: %s" % "; ".join([
+                        "%s needs %s" % (", ".join(group), ", ".join(sorted(get_missing_dependencies(group)))) for group in pending]))
+                condition.wait(1)
+        finally:
+            condition.release()
+
+        if errors:
+            raise errors[0][0], errors[0][1], errors[0][2]
+
+    def _create_test_database_group(self, group):
+        """ Create test database for first alias of group, others use it as well """
+        connections = self._get_databases()
+        if self._claim_test_database(group[0]):
+            try:
+                self._create_test_database(group[0])
+            finally:
+                self._release_test_database(group[0])
+
+        self.creating_databases_condition.acquire()
+        try:
+            for alias in group[1:]:
+                if alias in self.created_databases:
+                    continue
+                connection = connections[alias]
+                self.duplicate_names.append((connection, connection.settings_dict['NAME']))
+                connection.settings_dict['NAME'] = connections[group[0]].settings_dict['NAME']
+                self.created_databases[alias] = 0.0
+        finally:
+            self.creating_databases_condition.release()
+
+    def _claim_test_database(self, alias):
+        """
+        Return True if current thread is to create test database of alias,
+        False if it's already created (or being created by current thread).
+        Waits while other thread creates it.
+        """
+        condition = self.creating_databases_condition
+        condition.acquire()
+        try:
+            while alias in self.creating_databases:
+                if self.creating_databases[alias] is threading.currentThread():
+                    return False
+                condition.wait(1)
+            if alias in self.created_databases:
+                return False
+            self.creating_databases[alias] = threading.currentThread()
+            return True
+        finally:
+            condition.release()
+
+    def _release_test_database(self, alias):
+        """ Let threads waiting for database of alias go on, whether it's been created or not """
+        condition = self.creating_databases_condition
+        condition.acquire()
+        try:
+            del self.creating_databases[alias]
+            condition.notifyAll()
+        finally:
+            condition.release()
+
+    def _create_test_database(self, alias):
+        from django.conf import settings
+        connection = self._get_databases()[alias]
+        self._unhook_connection(connection)
+
+        started = time()
+        fingerprint = get_schema_fingerprint(connection, alias)
+        name = get_test_database_name(connection)
+
+        # Worker uses clone of master test database prepared by parent process and
+        # persisted test database is used, but only if they were created for current
+        # schema. Otherwise, database is (re)created.
+        if (self.is_worker or self.persist_test_database) and name != ':memory:' \
+            and read_database_fingerprint(connection, name) == fingerprint:
+            self._switch_to_test_database(connection, name)
+        else:
+            old_names, mirrors = self.setup_databases(verbosity=False, autoclobber=True, databases=[alias])
+            self.old_names.extend(old_names)
+
+            if 'south' in settings.INSTALLED_APPS and getattr(settings, 'DST_RUN_SOUTH_MIGRATIONS', True):
+                call_command('migrate', database=alias)
+
+            if getattr(settings, "FLUSH_TEST_DATABASE_AFTER_INITIAL_SYNCDB", False):
+                getattr(settings, "TEST_DATABASE_FLUSH_COMMAND", flush_database)(self, database=alias)
+
+            write_fingerprint(connection, fingerprint)
+
+        if self.worker_processes > 1:
+            # parent process only prepares databases for workers
+            self._clone_test_database(alias, fingerprint)
+
+        self.created_databases[alias] = time() - started
+
+    def _prepare_database_reset(self, alias):
+        from django.conf import settings
+
+        reset_strategy = getattr(settings, "TEST_DATABASE_RESET_STRATEGY", "flush")
+        if reset_strategy == "snapshot":
+            self._take_database_snapshot(alias)
+        elif reset_strategy == "dirty_tables" and not self.dirty_tables_tracker:
+            self.dirty_tables_tracker = DirtyTablesTracker()
+            self.dirty_tables_tracker.install()
 
 class DjangoTranslationPlugin(Plugin):
     """
@@ -655,7 +1720,7 @@ class SeleniumPlugin(Plugin):
         from django.conf import settings
         from django.utils.importlib import import_module
 
-        test_case = get_test_case_class(test)
+        test_case = get_test_profile(test).test_case
 
         enable_test(test_case, 'selenium_plugin_started')
 
@@ -676,10 +1741,13 @@ class SeleniumPlugin(Plugin):
                       browser,
                       getattr(settings, "SELENIUM_URL_ROOT", get_live_server_path()),
                   )
+            phase_timer.start("server")
             try:
                 sel.start()
                 test_case.selenium_started = True
+                phase_timer.stop("server")
             except Exception, err:
+                phase_timer.stop("server")
                 # we must catch it all as there is untyped socket exception on Windows :-]]]
                 if getattr(settings, "FORCE_SELENIUM_TESTS", False):
                     raise
@@ -735,12 +1803,421 @@ class SaneTestSelectionPlugin(Plugin):
     def configure(self, options, config):
         Plugin.configure(self, options, config)
         self.enabled_tests = [i for i in self.RECOGNIZED_TESTS if getattr(options, "select_%stests" % i, False)]
-    
+        self.deselected = 0
+
+    def is_test(self, obj, name):
+        """ Would nose collect it? Mirrors nose's selector, which asks plugins first. """
+        declared = getattr(obj, '__test__', None)
+        if declared is not None:
+            return bool(declared)
+        if name.startswith('_'):
+            return False
+        if isclass(obj) and issubclass(obj, unittest.TestCase):
+            return True
+        return bool(self.conf.testMatch.search(name))
+
+    def want(self, test_types):
+        if set(test_types) & set(self.enabled_tests):
+            return None
+        self.deselected += 1
+        return False
+
+    def wantClass(self, cls):
+        if not self.is_test(cls, cls.__name__):
+            return None
+        # class is kept when any of it's methods is selected, others are rejected by wantMethod
+        return self.want(test_index.get_test_types(cls))
+
+    def wantMethod(self, method):
+        test_case = getattr(method, 'im_class', None)
+        if test_case is None or not self.is_test(method, method.__name__):
+            return None
+        return self.want([test_index.classify(test_case, method.__name__).test_type])
+
+    def wantFunction(self, function):
+        if not self.is_test(function, function.__name__):
+            return None
+        return self.want([test_index.classify(function).test_type])
+
+    def startTest(self, test):
+        # tests not passing through collection (i.e. loaded by name) are skipped here
+        profile = get_test_profile(test)
+        if profile.get("test_type", "unit") not in self.enabled_tests and profile.test_case_instance is not None:
+            profile.test_case_instance.skipped = True
+
+    def report(self, stream):
+        stream.writeln("Test selection: %d test cases, methods or functions deselected during collection" % self.deselected)
+
+class SaneTestOrderingPlugin(Plugin):
+    """
+    Reorder test cases, so those requiring same database state (test type,
+    multi_db, urls and fixtures) run after each other and expensive
+    transitions between them (flush, fixture loading, urlconf switching) are
+    done as rarely as possible.
+
+    Only test case classes are reordered (inside their module), and modules
+    inside their package, so module and class contexts are kept intact.
+
+    When timing history is kept (see --dst-timing), groups of the same test
+    type run from the fastest one.
+    """
+    activation_parameter = '--with-sanetestordering'
+    name = 'sanetestordering'
+    durations_path = None
+
+    def options(self, parser, env=os.environ):
+        Plugin.options(self, parser, env)
+
+    def configure(self, options, config):
+        Plugin.configure(self, options, config)
+        self.original_transitions = 0
+        self.transitions = 0
+        self.durations_path = getattr(options, 'dst_timing', None)
+
+    def get_state_key(self, test_case):
+        classification = test_index.classify(test_case)
+        if classification.test_type in SaneTestSelectionPlugin.RECOGNIZED_TESTS:
+            type_order = SaneTestSelectionPlugin.RECOGNIZED_TESTS.index(classification.test_type)
+        else:
+            type_order = len(SaneTestSelectionPlugin.RECOGNIZED_TESTS)
+
+        return (
+            type_order,
+            classification.multi_db,
+            classification.urls or '',
+            classification.fixtures,
+        )
+
+    def record_key(self, key, original_keys):
+        original_keys.append(key)
+        if key not in self.first_seen:
+            self.first_seen[key] = len(self.first_seen)
+
+    def get_sort_key(self, key):
+        """
+        Order by test type first, then groups by their duration (if known)
+        and order of their first appearance
+        """
+        return (key[0], self.key_durations.get(key, 0.0), self.first_seen[key])
+
+    def get_key_durations(self, suite, durations):
+        """ Return dict of state key: total duration of test units having it """
+        totals = get_prefix_durations(durations)
+        key_durations = {}
+        def collect(unit):
+            context = getattr(unit, 'context', None)
+            key = self.get_state_key(isclass(context) and context or None)
+            key_durations[key] = key_durations.get(key, 0.0) + totals.get(get_unit_id(unit), 0.0)
+            return True
+        filter_suite(suite, collect)
+        return key_durations
+
+    def reorder(self, suite, original_keys):
+        """
+        Reorder suite in place, return state keys of its test cases in new order.
+        """
+        context = getattr(suite, 'context', None)
+        if isclass(context):
+            key = self.get_state_key(context)
+            self.record_key(key, original_keys)
+            return [key]
+
+        if not isinstance(suite, unittest.TestSuite):
+            # function test in module
+            key = self.get_state_key(None)
+            self.record_key(key, original_keys)
+            return [key]
+
+        children = []
+        for test in suite._tests:
+            children.append((self.reorder(test, original_keys), test))
+
+        # sort is stable, thus tests requiring same state keep their order
+        children.sort(key=lambda child: child[0] and self.get_sort_key(child[0][0]) or ())
+        suite._tests = [test for keys, test in children]
+
+        keys = []
+        for child_keys, test in children:
+            keys.extend(child_keys)
+        return keys
+
+    def count_transitions(self, keys):
+        return len([i for i in range(1, len(keys)) if keys[i] != keys[i-1]])
+
+    def prepareTest(self, test):
+        self.first_seen = {}
+        self.key_durations = {}
+        durations = load_durations(self.durations_path)
+        if durations:
+            self.key_durations = self.get_key_durations(test, durations)
+        original_keys = []
+        keys = self.reorder(test, original_keys)
+        self.original_transitions = self.count_transitions(original_keys)
+        self.transitions = self.count_transitions(keys)
+
+    def report(self, stream):
+        stream.writeln("Test ordering: %d state transitions instead of %d (%d avoided)" % (
+            self.transitions, self.original_transitions, self.original_transitions - self.transitions))
+
+class SaneParallelPlugin(Plugin):
+    """
+    Run test suite in parallel worker processes, each having its own test
+    database and live server port. Enabled by --dst-processes.
+    """
+    name = 'saneparallel'
+    env_opt = 'DST_PROCESSES'
+
+    def options(self, parser, env=os.environ):
+        parser.add_option(
+            "", "--dst-processes", action="store", type="int",
+            default=int(env.get(self.env_opt) or 0), dest="dst_processes",
+            help="Run tests in given number of worker processes [%s]" % self.env_opt)
+        parser.add_option(
+            "", "--dst-worker", action="store",
+            default=env.get(WORKER_ENV), dest="dst_worker",
+            help="Run as worker index/count, used internally by --dst-processes [%s]" % WORKER_ENV)
+
+    def configure(self, options, config):
+        self.conf = config
+        self.worker = None
+        self.processes = 0
+
+        if options.dst_worker:
+            self.worker = parse_worker(options.dst_worker)
+        elif options.dst_processes > 1:
+            self.processes = options.dst_processes
+
+        self.enabled = bool(self.worker or self.processes)
+
+    def begin(self):
+        if self.worker:
+            configure_worker(self.worker[0])
+
+    def prepareTest(self, test):
+        if not self.worker:
+            return ParallelRun(self.processes, config=self.conf)
+
+        index, count = self.worker
+        position = [0]
+        def keep(unit):
+            kept = position[0] % count == index
+            position[0] += 1
+            return kept
+        filter_suite(test, keep)
+
+    def finalize(self, result):
+        if self.worker and os.environ.get(WORKER_RESULT_ENV):
+            dump_result(result, os.environ[WORKER_RESULT_ENV])
+
+class SaneShardingPlugin(Plugin):
+    """
+    Run only one shard of test suite, so it can be split between
+    machines. Enabled by --shard.
+    """
+    name = 'saneshard'
+    # shard must be selected before SaneParallelPlugin splits it between workers
+    score = 110
+
+    def options(self, parser, env=os.environ):
+        parser.add_option(
+            "", "--shard", action="store",
+            default=env.get(SHARD_ENV), dest="dst_shard",
+            help="Run only given shard of test suite, as index/count, indexes are one-based [%s]" % SHARD_ENV)
+        parser.add_option(
+            "", "--shard-durations", action="store",
+            default=env.get(SHARD_DURATIONS_ENV), dest="dst_shard_durations",
+            help="Timing history file (see --dst-timing) used to balance shards [%s]" % SHARD_DURATIONS_ENV)
+
+    def configure(self, options, config):
+        self.shard = None
+        self.durations_path = options.dst_shard_durations
+        self.is_worker = bool(getattr(options, 'dst_worker', None))
+        self.partition = None
+
+        if options.dst_shard:
+            self.shard = parse_shard(options.dst_shard)
+
+        self.enabled = bool(self.shard)
+
+    def prepareTest(self, test):
+        index, count = self.shard
+        self.partition = Partition(test, count, load_durations(self.durations_path))
+        self.partition.filter(test, index - 1)
+
+    def report(self, stream):
+        if self.partition and not self.is_worker:
+            index, count = self.shard
+            stream.writeln("Test sharding: shard %d/%d, %d of %d test units (estimated %.2f of %.2f)" % (
+                index, count, self.partition.count_units(index - 1), self.partition.units,
+                self.partition.loads[index - 1], sum(self.partition.loads)))
+
+class SaneTimingPlugin(Plugin):
+    """
+    Measure phases of every test (see timing), report slowest tests and
+    keep timing history in file given by --dst-timing.
+    """
+    name = 'sanetiming'
+    env_opt = 'DST_TIMING'
+    # startTest and stopTest must be called after those of other plugins
+    score = 1
+
+    def options(self, parser, env=os.environ):
+        parser.add_option(
+            "", "--dst-timing", action="store",
+            default=env.get(self.env_opt), dest="dst_timing",
+            help="Measure phases of tests and keep their history in given file [%s]" % self.env_opt)
+        parser.add_option(
+            "", "--dst-slowest", action="store", type="int",
+            default=int(env.get('DST_SLOWEST') or 10), dest="dst_slowest",
+            help="Number of slowest tests to report [DST_SLOWEST]")
+
+    def configure(self, options, config):
+        self.history_path = options.dst_timing
+        self.slowest = options.dst_slowest
+        self.worker = None
+        self.timings = {}
+        self.workers_collected = False
+        # errors of contexts are reported outside of any test
+        self.body_started = None
+
+        if getattr(options, 'dst_worker', None):
+            self.worker = parse_worker(options.dst_worker)
+
+        self.enabled = bool(self.history_path)
+
+    def beforeTest(self, test):
+        phase_timer.begin()
+        self.test_started = time()
+        self.body_started = None
+        self.body_ended = None
+
     def startTest(self, test):
-        test_case = get_test_case_class(test)
-        if getattr_test(test, "test_type", "unit") not in self.enabled_tests:
-            test_case.skipped = True
-            #raise SkipTest(u"Test type %s not enabled" % getattr(test_case, "test_type", "unit"))
+        self.body_started = time()
+        self.phases_before_body = phase_timer.get_total()
+
+    def end_body(self):
+        if self.body_started is not None and self.body_ended is None:
+            self.body_ended = time()
+            self.phases_in_body = phase_timer.get_total() - self.phases_before_body
+
+    def addSuccess(self, test):
+        self.end_body()
+
+    def addError(self, test, err):
+        self.end_body()
+
+    def addFailure(self, test, err):
+        self.end_body()
+
+    def afterTest(self, test):
+        self.end_body()
+        total = time() - self.test_started
+        phases = phase_timer.end() or {}
+
+        if self.body_started is not None:
+            phases["body"] = self.body_ended - self.body_started - self.phases_in_body
+        phases["plugins"] = total - sum(phases.values())
+        self.timings[test.id()] = phases
+
+    def collect_worker_timings(self):
+        if self.worker or self.workers_collected:
+            return
+        self.timings.update(pop_worker_timings(self.history_path))
+        self.workers_collected = True
+
+    def report(self, stream):
+        self.collect_worker_timings()
+        if not self.timings or self.worker:
+            return
+        stream.writeln("Slowest tests:")
+        for total, test_id, phases in get_slowest(self.timings, self.slowest):
+            stream.writeln("  %.3fs %s (%s)" % (total, test_id, format_phases(phases)))
+
+    def finalize(self, result):
+        if self.worker:
+            dump_json(get_worker_file_name(self.history_path, self.worker[0]), self.timings)
+        else:
+            self.collect_worker_timings()
+            save_history(self.history_path, self.timings)
+
+class SaneProfilingPlugin(Plugin):
+    """
+    Profile hooks of sane-testing plugins (and functions they spend time
+    in), see profiling. Enabled by --dst-profile.
+    """
+    name = 'saneprofiling'
+    env_opt = 'DST_PROFILE'
+    # report and finalize must be called after those of profiled plugins
+    score = 0
+
+    PROFILED_HOOKS = (
+        'begin', 'prepareTestRunner', 'prepareTest', 'startContext', 'stopContext',
+        'beforeTest', 'startTest', 'stopTest', 'afterTest', 'addSuccess', 'addError', 'addFailure',
+        'report', 'finalize',
+    )
+    TEST_HOOKS = ('beforeTest', 'startTest', 'stopTest', 'afterTest', 'addSuccess', 'addError', 'addFailure')
+    PROFILED_METHODS = {
+        'DjangoPlugin' : ('_create_test_databases', '_prepare_tests_fixtures', '_reset_database', '_start_pending_contexts'),
+    }
+    PROFILED_FUNCTIONS = ('flush_cache', 'clear_url_caches', 'flush_database')
+
+    def options(self, parser, env=os.environ):
+        parser.add_option(
+            "", "--dst-profile", action="store_true",
+            default=bool(env.get(self.env_opt)), dest="dst_profile",
+            help="Profile hooks of sane-testing plugins [%s]" % self.env_opt)
+        parser.add_option(
+            "", "--dst-profile-cprofile", action="store_true",
+            default=bool(env.get('DST_PROFILE_CPROFILE')), dest="dst_profile_cprofile",
+            help="Run cProfile in profiled hooks too and dump pstats [DST_PROFILE_CPROFILE]")
+        parser.add_option(
+            "", "--dst-profile-output", action="store",
+            default=env.get('DST_PROFILE_OUTPUT') or 'dst-profile', dest="dst_profile_output",
+            help="Base path of profile output files (.folded, .pstats) [DST_PROFILE_OUTPUT]")
+
+    def configure(self, options, config):
+        self.enabled = bool(options.dst_profile)
+        if not self.enabled:
+            return
+
+        self.output = options.dst_profile_output
+        if getattr(options, 'dst_worker', None):
+            self.output = get_worker_file_name(self.output, parse_worker(options.dst_worker)[0])
+
+        self.profiler = HookProfiler(use_cprofile=options.dst_profile_cprofile)
+        # hooks are collected by plugin manager on their first call, thus they can be wrapped now
+        self.install(getattr(config.plugins, 'plugins', []))
+
+    def get_test_type(self, test, *args):
+        if isinstance(test, nose.case.Test):
+            return get_test_profile(test).get("test_type", "unit")
+        return None
+
+    def install(self, plugins):
+        for plugin in plugins:
+            if plugin is self or not plugin.__class__.__module__.startswith('djangosanetesting'):
+                continue
+            plugin_name = plugin.__class__.__name__
+            for hook in self.PROFILED_HOOKS:
+                if hasattr(plugin, hook):
+                    classify = hook in self.TEST_HOOKS and self.get_test_type or None
+                    self.profiler.patch(plugin, hook, "%s.%s" % (plugin_name, hook), classify)
+            for method in self.PROFILED_METHODS.get(plugin_name, ()):
+                self.profiler.patch(plugin, method, "%s.%s" % (plugin_name, method))
+
+        module = sys.modules[__name__]
+        for function in self.PROFILED_FUNCTIONS:
+            self.profiler.patch(module, function, function)
+
+    def report(self, stream):
+        stream.writeln("Plugin hooks profile (cumulative):")
+        for line in self.profiler.get_report_lines():
+            stream.writeln(line)
+
+    def finalize(self, result):
+        self.profiler.unpatch_all()
+        self.profiler.dump_stacks("%s.folded" % self.output)
+        self.profiler.dump_stats("%s.pstats" % self.output)
 
 ##########
 ### Result plugin is used when using Django test runner
@@ -0,0 +1,199 @@
+"""
+Running test suite in parallel worker processes.
+
+Parent process spawns workers (running the very same command), each of them
+runs its share of test cases against its own test database and live server
+port and writes its result to file. Results are then merged into parent's result.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import urlparse
+from inspect import isclass
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+WORKER_ENV = 'DST_WORKER'
+WORKER_RESULT_ENV = 'DST_WORKER_RESULT'
+
+# workers are started in directory the command has been run from; it's
+# recorded on import, as runners (like paver unit) change directory later
+STARTUP_CWD = os.getcwd()
+
+
+def parse_worker(value):
+    """ Parse "index/count" worker specification, indexes are zero-based """
+    try:
+        index, count = [int(i) for i in value.split("/")]
+    except ValueError:
+        raise ValueError("Worker must be specified as index/count, got %r" % value)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError("Worker index must be between 0 and %d, got %d" % (count - 1, index))
+    return index, count
+
+def get_worker_file_name(path, index):
+    """ Return name of file of given worker, used instead of path """
+    base, extension = os.path.splitext(path)
+    return "%s_w%d%s" % (base, index, extension)
+
+def get_worker_database_name(name, index):
+    """ Return name of test database for given worker """
+    if not name or name == ':memory:':
+        return name
+    return get_worker_file_name(name, index)
+
+def is_test_unit(test):
+    """
+    Test unit is smallest part of suite that can be moved between processes,
+    i.e. test case class (to keep class context intact) or function test.
+    """
+    return isclass(getattr(test, 'context', None)) or not isinstance(test, unittest.TestSuite)
+
+def filter_suite(suite, keep):
+    """
+    Filter suite in place, leaving only test units for which keep(unit) is True.
+    Units are passed in order of the suite. Return number of units left.
+    """
+    if is_test_unit(suite):
+        return int(bool(keep(suite)))
+
+    children = []
+    kept = 0
+    for test in suite._tests:
+        kept_in_child = filter_suite(test, keep)
+        if kept_in_child:
+            children.append(test)
+            kept += kept_in_child
+    suite._tests = children
+    return kept
+
+def configure_worker(index):
+    """ Switch test databases and live server port for given worker """
+    from django.conf import settings
+    from djangosanetesting.utils import get_databases, get_test_database_name, set_live_server_port, DEFAULT_LIVE_SERVER_PORT
+
+    connections = get_databases()
+    configured = []
+    for alias in connections:
+        connection = connections[alias]
+        # test mirrors may be already redirected to connection they mirror
+        if connection in configured:
+            continue
+        connection.settings_dict['TEST_NAME'] = get_worker_database_name(
+            get_test_database_name(connection), index)
+        configured.append(connection)
+
+    # port 0 lets every worker's live server bind any free port
+    port = int(getattr(settings, "LIVE_SERVER_PORT", DEFAULT_LIVE_SERVER_PORT))
+    if port:
+        set_live_server_port(port + index)
+
+def shift_url_port(url, old_port, new_port):
+    """ Change port in URL, if it is old_port """
+    parts = urlparse.urlsplit(url)
+    if parts.port != old_port:
+        return url
+    netloc = "%s:%d" % (parts.netloc.rsplit(":", 1)[0], new_port)
+    return urlparse.urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+
+
+class RemoteTest(object):
+    """ Stands for test run in worker when reporting results in parent """
+    def __init__(self, description):
+        self.description = description
+
+    def shortDescription(self):
+        return None
+
+    def id(self):
+        return self.description
+
+    def __str__(self):
+        return self.description
+
+
+def dump_result(result, path):
+    data = {
+        'testsRun' : result.testsRun,
+        'failures' : [(str(test), text) for test, text in result.failures],
+        'errors' : [(str(test), text) for test, text in result.errors],
+        'error_classes' : {},
+    }
+    # skips et al. are stored by nose's error class plugins
+    for storage, label, isfail in getattr(result, 'errorClasses', {}).values():
+        data['error_classes'][label] = [(str(test), text) for test, text in storage]
+
+    f = open(path, 'wb')
+    try:
+        pickle.dump(data, f)
+    finally:
+        f.close()
+
+def merge_result(result, path):
+    f = open(path, 'rb')
+    try:
+        data = pickle.load(f)
+    finally:
+        f.close()
+
+    result.testsRun += data['testsRun']
+    result.failures.extend([(RemoteTest(test), text) for test, text in data['failures']])
+    result.errors.extend([(RemoteTest(test), text) for test, text in data['errors']])
+    for storage, label, isfail in getattr(result, 'errorClasses', {}).values():
+        storage.extend([(RemoteTest(test), text) for test, text in data['error_classes'].get(label, [])])
+
+
+class ParallelRun(object):
+    """
+    Callable used instead of test suite in parent process: run all workers
+    and merge their results.
+    """
+    def __init__(self, processes, config=None, argv=None, cwd=None):
+        self.processes = processes
+        self.config = config
+        self.cwd = cwd or STARTUP_CWD
+        self.argv = list(argv or sys.argv)
+        # script may be given relative to directory command has been run from
+        script = os.path.join(self.cwd, self.argv[0])
+        if os.path.exists(script):
+            self.argv[0] = os.path.abspath(script)
+
+    def start_worker(self, index):
+        fd, result_path = tempfile.mkstemp(prefix='dst_worker_%d_' % index, suffix='.result')
+        os.close(fd)
+        os.remove(result_path)
+
+        env = os.environ.copy()
+        env[WORKER_ENV] = "%d/%d" % (index, self.processes)
+        env[WORKER_RESULT_ENV] = result_path
+
+        log = tempfile.TemporaryFile()
+        process = subprocess.Popen([sys.executable] + self.argv, cwd=self.cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        return process, result_path, log
+
+    def __call__(self, result):
+        if self.config:
+            # as no test is run in parent, result is not prepared by result proxy
+            self.config.plugins.prepareTestResult(result)
+
+        workers = [self.start_worker(index) for index in range(self.processes)]
+
+        for index, (process, result_path, log) in enumerate(workers):
+            process.wait()
+            if os.path.exists(result_path):
+                merge_result(result, result_path)
+                os.remove(result_path)
+            else:
+                log.seek(0)
+                result.errors.append((
+                    RemoteTest("worker %d/%d" % (index, self.processes)),
+                    "Worker exited with status %s without result, output follows:\n%s" % (process.returncode, log.read())
+                ))
+            log.close()
+
+        return result
@@ -0,0 +1,118 @@
+"""
+Profiling of plugin hooks, used by SaneProfilingPlugin (--dst-profile).
+
+Hooks of plugins and selected functions they call are wrapped by timer,
+aggregating cumulative time per hook and per test type. Nesting of wrapped
+calls is recorded too and written as collapsed stacks (one "a;b;c count"
+line per stack, count being microseconds spent in c itself), which is the
+input of flamegraph.pl and compatible tools. Optionally, cProfile is run
+while hooks are executed and it's statistics are dumped in pstats format.
+"""
+import threading
+from time import time
+
+try:
+    import cProfile as profile
+except ImportError:
+    import profile
+
+
+class HookProfiler(object):
+    """
+    Aggregates time spent in wrapped calls. Only calls from thread that
+    created profiler are measured, others (i.e. creation of test databases
+    in threads) are passed through.
+    """
+    def __init__(self, use_cprofile=False):
+        self.hooks = {}
+        self.test_types = {}
+        self.stacks = {}
+        self.stack = []
+        self.patched = []
+        self.thread = threading.currentThread()
+        self.profile = None
+        if use_cprofile:
+            self.profile = profile.Profile()
+
+    def wrap(self, name, function, classify=None):
+        """
+        Return function wrapped by timer, recorded as name. When classify
+        is given, it's called with arguments of the call to get test type
+        the call is accounted to (or None).
+        """
+        profiler = self
+        def wrapper(*args, **kwargs):
+            if threading.currentThread() is not profiler.thread:
+                return function(*args, **kwargs)
+            test_type = None
+            if classify:
+                test_type = classify(*args)
+            profiler.enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.leave(test_type)
+        wrapper.__name__ = getattr(function, '__name__', name)
+        wrapper.__doc__ = getattr(function, '__doc__', None)
+        return wrapper
+
+    def patch(self, obj, attr, name, classify=None):
+        """ Replace obj.attr by it's wrapped version, until unpatch_all is called """
+        original = obj.__dict__.get(attr, None)
+        own = attr in obj.__dict__
+        setattr(obj, attr, self.wrap(name, getattr(obj, attr), classify))
+        self.patched.append((obj, attr, own, original))
+
+    def unpatch_all(self):
+        while self.patched:
+            obj, attr, own, original = self.patched.pop()
+            if own:
+                setattr(obj, attr, original)
+            else:
+                delattr(obj, attr)
+
+    def enter(self, name):
+        if self.profile and not self.stack:
+            self.profile.enable()
+        self.stack.append([name, time(), 0.0])
+
+    def leave(self, test_type=None):
+        name, started, children = self.stack.pop()
+        elapsed = time() - started
+
+        hook = self.hooks.setdefault(name, [0, 0.0])
+        hook[0] += 1
+        hook[1] += elapsed
+        if test_type:
+            self.test_types[(name, test_type)] = self.test_types.get((name, test_type), 0.0) + elapsed
+
+        path = ";".join([frame[0] for frame in self.stack] + [name])
+        self.stacks[path] = self.stacks.get(path, 0.0) + elapsed - children
+
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        elif self.profile:
+            self.profile.disable()
+
+    def get_report_lines(self):
+        """ Return lines of report, hooks sorted by cumulative time """
+        lines = []
+        for name, (calls, seconds) in sorted(self.hooks.items(), key=lambda item: (-item[1][1], item[0])):
+            line = "  %8.3fs %7d calls  %s" % (seconds, calls, name)
+            test_types = sorted([(test_type, spent) for (hook, test_type), spent in self.test_types.items() if hook == name])
+            if test_types:
+                line += " (%s)" % ", ".join(["%s %.3fs" % (test_type, spent) for test_type, spent in test_types])
+            lines.append(line)
+        return lines
+
+    def dump_stacks(self, path):
+        f = open(path, 'w')
+        try:
+            for stack, seconds in sorted(self.stacks.items()):
+                f.write("%s %d\n" % (stack, int(round(seconds * 1000000))))
+        finally:
+            f.close()
+
+    def dump_stats(self, path):
+        if self.profile:
+            self.profile.dump_stats(path)
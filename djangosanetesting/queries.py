@@ -0,0 +1,191 @@
+"""
+Counting of SQL queries issued by tests, per database alias.
+
+Like tracking of dirty tables, counting is done by wrapping cursors of all
+database connections (in all threads, so queries done by live server are
+counted too). Only queries issued while test is run (setUp, test itself
+and tearDown) are counted; queries of plugins preparing database and
+resetting it are not.
+
+Test may limit number of queries it issues by query_budget attribute:
+either integer (limit of all queries) or dictionary of alias: limit.
+"""
+import sys
+import threading
+from time import time
+
+from djangosanetesting import DEFAULT_DB_ALIAS
+
+TOTAL = "total"
+
+
+class QueryCountingCursorWrapper(object):
+    def __init__(self, cursor, counter, alias):
+        self.cursor = cursor
+        self.counter = counter
+        self.alias = alias
+
+    def execute(self, sql, params=()):
+        started = time()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            self.counter.record(self.alias, time() - started)
+
+    def executemany(self, sql, param_list):
+        started = time()
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            self.counter.record(self.alias, time() - started)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+
+class QueryCounter(object):
+    """
+    Counts queries and time spent in them, per database alias, between
+    start and stop. Counts of every test stopped are kept in tests.
+    """
+    def __init__(self):
+        self.counts = None
+        self.suspended = 0
+        self.tests = {}
+        self.original_cursor = None
+        self.lock = threading.Lock()
+
+    def install(self):
+        from django.db.backends import BaseDatabaseWrapper
+
+        if self.original_cursor is not None:
+            return
+
+        counter = self
+        original_cursor = self.original_cursor = BaseDatabaseWrapper.cursor
+
+        def cursor(connection):
+            return QueryCountingCursorWrapper(original_cursor(connection), counter, getattr(connection, 'alias', DEFAULT_DB_ALIAS))
+
+        BaseDatabaseWrapper.cursor = cursor
+
+    def uninstall(self):
+        from django.db.backends import BaseDatabaseWrapper
+
+        if self.original_cursor is not None:
+            BaseDatabaseWrapper.cursor = self.original_cursor
+            self.original_cursor = None
+
+    def start(self):
+        self.counts = {}
+
+    def stop(self, test_id=None):
+        """ Stop counting and return counts, as dict of alias: [queries, seconds] """
+        counts = self.counts
+        self.counts = None
+        if counts and test_id is not None:
+            self.tests[test_id] = counts
+        return counts
+
+    def suspend(self):
+        """ Do not count queries until resumed (i.e. while test database is created) """
+        self.suspended += 1
+
+    def resume(self):
+        self.suspended -= 1
+
+    def record(self, alias, seconds):
+        if self.counts is None or self.suspended:
+            return
+        self.lock.acquire()
+        try:
+            count = self.counts.setdefault(alias, [0, 0.0])
+            count[0] += 1
+            count[1] += seconds
+        finally:
+            self.lock.release()
+
+    def get_exceeded_budget(self, budget):
+        """
+        Return message describing how query budget has been exceeded by
+        queries counted so far, or None if it has not.
+        """
+        counts = self.counts or {}
+        if isinstance(budget, dict):
+            limits = budget.items()
+        else:
+            limits = [(TOTAL, budget)]
+
+        exceeded = []
+        for alias, limit in sorted(limits):
+            if alias == TOTAL:
+                queries = get_total(counts)[0]
+            else:
+                queries = counts.get(alias, [0, 0.0])[0]
+            if queries > limit:
+                exceeded.append("%s: %d queries, budget %d" % (alias, queries, limit))
+
+        if exceeded:
+            return "Query budget exceeded (%s)" % "; ".join(exceeded)
+        return None
+
+    def get_report_lines(self, count):
+        """ Return lines of report, totals and count of tests issuing most queries """
+        if not self.tests:
+            return []
+
+        totals = {}
+        for counts in self.tests.values():
+            for alias, (queries, seconds) in counts.items():
+                total = totals.setdefault(alias, [0, 0.0])
+                total[0] += queries
+                total[1] += seconds
+
+        queries, seconds = get_total(totals)
+        lines = ["SQL queries: %d in %.3fs (%s); most queries issued by:" % (queries, seconds, format_counts(totals))]
+        for queries, seconds, test_id, counts in get_worst(self.tests, count):
+            lines.append("  %6d queries %8.3fs  %s (%s)" % (queries, seconds, test_id, format_counts(counts)))
+        return lines
+
+
+def get_total(counts):
+    """ Return [queries, seconds] of all aliases """
+    return [sum([count[0] for count in counts.values()]), sum([count[1] for count in counts.values()])]
+
+def get_worst(tests, count):
+    """ Return list of (queries, seconds, test id, counts) of count tests issuing most queries """
+    worst = [tuple(get_total(counts)) + (test_id, counts) for test_id, counts in tests.items()]
+    worst.sort(key=lambda item: (-item[0], -item[1], item[2]))
+    return worst[:count]
+
+def format_counts(counts):
+    return ", ".join(["%s %d/%.3fs" % (alias, queries, seconds) for alias, (queries, seconds) in sorted(counts.items())])
+
+
+class QueryBudgetResult(object):
+    """
+    Result proxy reporting successful test as failed when queries counted
+    while it was run exceed it's query budget.
+    """
+    def __init__(self, result, counter, budget=None):
+        self.result = result
+        self.counter = counter
+        self.budget = budget
+
+    def addSuccess(self, test):
+        message = None
+        if self.budget is not None:
+            message = self.counter.get_exceeded_budget(self.budget)
+        if message is None:
+            return self.result.addSuccess(test)
+
+        try:
+            raise AssertionError(message)
+        except AssertionError:
+            self.result.addFailure(test, sys.exc_info())
+
+    def __getattr__(self, attr):
+        return getattr(self.result, attr)
@@ -21,10 +21,126 @@ __docformat__ = "restructuredtext en"
 # testing consistency goodies, like wait_for_element_present support
 # and it's usage before clicking et al
 
+import errno
 import httplib
+import select
+import socket
+import threading
+import time
 import urllib
 import re
 
+# upper bounds (in seconds) of buckets of command latency histogram
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, None)
+
+def is_connection_dropped(connection):
+    """
+    Return whether idle connection has been closed by server (no response
+    is expected on it, thus it's readable only when closed)
+    """
+    if connection.sock is None:
+        return True
+    return bool(select.select([connection.sock], [], [], 0)[0])
+
+class ConnectionPool(object):
+    """
+    Keep-alive connections of one session to Selenium RC server (connection
+    is checked out for every command and returned after response is read,
+    so one connection serves whole session).
+    """
+    def __init__(self):
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def connect(self, host, port):
+        return httplib.HTTPConnection(host, port)
+
+    def get(self, host, port):
+        """ Return tuple (connection, reused) """
+        self.lock.acquire()
+        try:
+            idle = self.idle.get((host, port), [])
+            while idle:
+                connection = idle.pop()
+                if not is_connection_dropped(connection):
+                    return connection, True
+                connection.close()
+        finally:
+            self.lock.release()
+        return self.connect(host, port), False
+
+    def put(self, host, port, connection):
+        self.lock.acquire()
+        try:
+            self.idle.setdefault((host, port), []).append(connection)
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            idle, self.idle = self.idle, {}
+        finally:
+            self.lock.release()
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+def get_latency_histogram(latencies):
+    """ Return list of (upper bound in seconds or None for unbounded, count) for given latencies """
+    counts = [0] * len(LATENCY_BUCKETS)
+    for latency in latencies:
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if bound is None or latency <= bound:
+                counts[i] += 1
+                break
+    return zip(LATENCY_BUCKETS, counts)
+
+class CommandBatch(object):
+    """
+    Queue commands not returning value, issued by selenium while batch is
+    started, and send them pipelined over one connection when batch is
+    finished or when command whose return value is needed is issued.
+
+    Results of queued commands are checked when they are sent, thus
+    commands following failed one in the same batch are still executed.
+    Commands queued when exception is raised in with block are not sent.
+    """
+    def __init__(self, selenium):
+        self.selenium = selenium
+        self.owner = False
+
+    def start(self):
+        # nested batch is part of the outer one
+        if self.selenium.batched is None:
+            self.selenium.batched = []
+            self.owner = True
+
+    def finish(self):
+        if not self.owner:
+            return
+        try:
+            self.selenium.flush_commands()
+        finally:
+            self.selenium.batched = None
+            self.owner = False
+
+    def discard(self):
+        if self.owner:
+            self.selenium.batched = None
+            self.owner = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.discard()
+        return False
+
 class selenium:
     """
     Defines an object that runs Selenium commands.
@@ -184,6 +300,11 @@ class selenium:
         self.browserURL = browserURL
         self.sessionId = None
         self.extensionJs = ""
+        self.pool = ConnectionPool()
+        # command: list of latencies (in seconds)
+        self.latencies = {}
+        # commands queued by CommandBatch, None when not batching
+        self.batched = None
 
     def setExtensionJs(self, extensionJs):
         self.extensionJs = extensionJs
@@ -198,28 +319,124 @@ class selenium:
     def stop(self):
         self.do_command("testComplete", [])
         self.sessionId = None
+        self.pool.close()
+
+    def batch(self):
+        """
+        Return CommandBatch queueing commands not returning value, to be used
+        as context manager::
+
+            with self.selenium.batch():
+                self.selenium.type("id_username", "user")
+                self.selenium.click("id_submit")
+        """
+        return CommandBatch(self)
+
+    def flush_commands(self):
+        """ Send commands queued by batch """
+        if self.batched:
+            commands, self.batched[:] = self.batched[:], []
+            self.run_commands(commands)
 
     def do_command(self, verb, args):
-        conn = httplib.HTTPConnection(self.host, self.port)
+        if self.batched is not None:
+            self.batched.append((verb, args))
+            return u"OK"
+        return self.run_commands([(verb, args)])[0]
+
+    def get_command_body(self, verb, args):
         body = u'cmd=' + urllib.quote_plus(unicode(verb).encode('utf-8'))
         for i in range(len(args)):
             body += '&' + unicode(i+1) + '=' + urllib.quote_plus(unicode(args[i]).encode('utf-8'))
         if (None != self.sessionId):
             body += "&sessionId=" + unicode(self.sessionId)
-        headers = {"Content-Type": "application/x-www-form-urlencoded; charset=utf-8"}
-        conn.request("POST", "/selenium-server/driver/", body, headers)
-    
-        response = conn.getresponse()
-        #print response.status, response.reason
-        data = unicode(response.read(), "UTF-8")
-        result = response.reason
-        #print "Selenium Result: " + repr(data) + "\n\n"
-        if (not data.startswith('OK')):
-            raise Exception, data
-        return data
+        return body.encode('utf-8')
+
+    def run_commands(self, commands):
+        """
+        Send commands (list of (verb, args)) pipelined over one connection
+        and return their results; raise Exception with result of first
+        command that failed.
+        """
+        bodies = [self.get_command_body(verb, args) for verb, args in commands]
+        results = []
+        conn, reused = self.pool.get(self.host, self.port)
+        while len(results) < len(bodies):
+            pending = bodies[len(results):]
+            started = time.time()
+            try:
+                # Commands are not idempotent, thus they are sent again only when
+                # kept-alive connection has been closed by server before it got
+                # them: when sending fails or when it's closed without response.
+                try:
+                    self.send_commands(conn, pending)
+                except socket.error, e:
+                    if not reused or e.args[0] not in (errno.ECONNRESET, errno.EPIPE):
+                        raise
+                    conn.close()
+                    conn, reused = self.pool.connect(self.host, self.port), False
+                    continue
+                if reused and conn.sock.recv(1, socket.MSG_PEEK) == '':
+                    conn.close()
+                    conn, reused = self.pool.connect(self.host, self.port), False
+                    continue
+
+                for body in pending:
+                    response = httplib.HTTPResponse(conn.sock, method="POST")
+                    response.begin()
+                    results.append(unicode(response.read(), "UTF-8"))
+                    self.latencies.setdefault(commands[len(results) - 1][0], []).append(time.time() - started)
+                    started = time.time()
+                    # server does not read following commands, they must be sent again
+                    if response.will_close:
+                        break
+            except:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+                conn, reused = self.pool.connect(self.host, self.port), False
+
+        # connection closed by server is not connected again unless needed
+        if conn.sock is not None:
+            self.pool.put(self.host, self.port, conn)
+
+        for data in results:
+            #print "Selenium Result: " + repr(data) + "\n\n"
+            if (not data.startswith('OK')):
+                raise Exception, data
+        return results
+
+    def send_commands(self, conn, bodies):
+        if conn.sock is None:
+            conn.connect()
+        requests = []
+        for body in bodies:
+            requests.append("POST /selenium-server/driver/ HTTP/1.1\r\n"
+                "Host: %s:%s\r\n"
+                "Content-Type: application/x-www-form-urlencoded; charset=utf-8\r\n"
+                "Content-Length: %d\r\n\r\n%s" % (self.host, self.port, len(body), body))
+        conn.sock.sendall("".join(requests))
+
+    def get_latency_histogram(self, verb=None):
+        """
+        Return histogram of latencies of commands issued in this session (or
+        of given command only) as list of (upper bound in seconds, count)
+        """
+        if verb is not None:
+            return get_latency_histogram(self.latencies.get(verb, []))
+        latencies = []
+        for command_latencies in self.latencies.values():
+            latencies.extend(command_latencies)
+        return get_latency_histogram(latencies)
     
     def get_string(self, verb, args):
-        result = self.do_command(verb, args)
+        # return value is needed, so commands queued by batch are sent with it
+        commands = [(verb, args)]
+        if self.batched:
+            commands, self.batched[:] = self.batched[:] + commands, []
+        result = self.run_commands(commands)[-1]
         return result[3:]
     
     def get_string_array(self, verb, args):
@@ -0,0 +1,117 @@
+"""
+Splitting test suite into shards, run on separate machines (i.e. CI nodes).
+
+Every shard loads the whole suite and runs only it's part of it. Partitioning
+is deterministic, thus shards need no coordination. Test units (see
+parallel.is_test_unit) are never split and units of test cases sharing
+the same fixtures are kept together; such groups are then distributed to shards,
+largest first, each to the least loaded shard. Size of group is it's duration
+according to timing history (see timing), or number of it's tests when there
+is no history.
+"""
+import unittest
+from inspect import isclass
+
+from djangosanetesting.classification import test_index
+from djangosanetesting.parallel import filter_suite
+
+SHARD_ENV = 'DST_SHARD'
+SHARD_DURATIONS_ENV = 'DST_SHARD_DURATIONS'
+
+
+def parse_shard(value):
+    """ Parse "index/count" shard specification, indexes are one-based """
+    try:
+        index, count = [int(i) for i in value.split("/")]
+    except ValueError:
+        raise ValueError("Shard must be specified as index/count, got %r" % value)
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError("Shard index must be between 1 and %d, got %d" % (count, index))
+    return index, count
+
+def get_unit_id(unit):
+    """ Return id of test unit, being prefix of ids of all tests in it """
+    context = getattr(unit, 'context', None)
+    if isclass(context):
+        return "%s.%s" % (context.__module__, context.__name__)
+    return unit.id()
+
+def get_unit_group(unit):
+    """ Units of test cases with the same fixtures must run in the same shard """
+    context = getattr(unit, 'context', None)
+    if isclass(context):
+        fixtures = test_index.classify(context).fixtures
+        if fixtures:
+            return "fixtures:%s" % ",".join(fixtures)
+    return "unit:%s" % get_unit_id(unit)
+
+def count_tests(suite):
+    if not isinstance(suite, unittest.TestSuite):
+        return 1
+    # lazy suites can be iterated only once
+    tests = list(suite._tests)
+    suite._tests = tests
+    return sum([count_tests(test) for test in tests])
+
+def get_prefix_durations(durations):
+    """ Return dict with total duration of tests for every prefix of their ids """
+    totals = {}
+    for test_id, duration in durations.items():
+        parts = test_id.split(".")
+        for i in range(1, len(parts) + 1):
+            prefix = ".".join(parts[:i])
+            totals[prefix] = totals.get(prefix, 0.0) + duration
+    return totals
+
+
+class Partition(object):
+    """
+    Assignment of test units of suite to shards.
+    """
+    def __init__(self, suite, count, durations=None):
+        self.count = count
+        self.loads = [0.0] * count
+        self.assignment = {}
+
+        units = []
+        def collect(unit):
+            units.append(unit)
+            return True
+        filter_suite(suite, collect)
+        self.units = len(units)
+
+        totals = get_prefix_durations(durations or {})
+        if durations:
+            test_duration = sum(durations.values()) / len(durations)
+        else:
+            test_duration = 1.0
+
+        groups = {}
+        for unit in units:
+            unit_id = get_unit_id(unit)
+            if unit_id in totals:
+                weight = totals[unit_id]
+            else:
+                weight = count_tests(unit) * test_duration
+            group = groups.setdefault(get_unit_group(unit), [0.0, []])
+            group[0] += weight
+            group[1].append(unit)
+
+        # largest groups first; group key makes order of equal groups deterministic
+        for key, (weight, group_units) in sorted(groups.items(), key=lambda item: (-item[1][0], item[0])):
+            shard = min(range(count), key=lambda i: (self.loads[i], i))
+            self.loads[shard] += weight
+            for unit in group_units:
+                self.assignment[id(unit)] = shard
+
+    def count_units(self, shard):
+        """ Return number of units assigned to given (zero-based) shard """
+        return len([unit_shard for unit_shard in self.assignment.values() if unit_shard == shard])
+
+    def get_shard(self, unit):
+        """ Return zero-based index of shard unit is assigned to """
+        return self.assignment[id(unit)]
+
+    def filter(self, suite, shard):
+        """ Leave only units of given (zero-based) shard in suite, return their number """
+        return filter_suite(suite, lambda unit: self.get_shard(unit) == shard)
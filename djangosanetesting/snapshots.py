@@ -0,0 +1,210 @@
+"""
+Database snapshots, used to reset test database after destructive test
+faster than flush does.
+
+Snapshot is taken once, right after test database is created, and it's
+restored instead of flushing database. See TEST_DATABASE_RESET_STRATEGY
+setting. The same copying is used to clone master test database for
+parallel workers.
+"""
+import os
+import shutil
+import sys
+
+from djangosanetesting.utils import get_databases
+
+SNAPSHOT_SUFFIX = '_dst_snapshot'
+
+
+class DatabaseInUseError(Exception):
+    """ Test database can't be replaced, as it's used by other sessions """
+    def __init__(self, database_name, users):
+        Exception.__init__(self, "Test database %s is used by %s; close their connections "
+            "(e.g. of live server thread) before it's snapshot is restored" % (database_name, users))
+
+
+class DatabaseSnapshot(object):
+    """
+    Snapshot of one test database. Backends override take, restore and drop.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.database_name = connection.settings_dict['NAME']
+        self.snapshot_name = self.database_name + SNAPSHOT_SUFFIX
+
+    def is_supported(self):
+        return True
+
+    def close_connections(self):
+        """ Close connections to database of all aliases (of current thread) """
+        self.connection.close()
+        connections = get_databases()
+        for alias in connections:
+            connection = connections[alias]
+            if connection.settings_dict.get('NAME') == self.database_name:
+                connection.close()
+
+    def copy_to(self, name):
+        """ Copy database (schema and data) to database of given name """
+        raise NotImplementedError()
+
+    def drop_copy(self, name):
+        raise NotImplementedError()
+
+    def take(self):
+        self.copy_to(self.snapshot_name)
+
+    def restore(self):
+        raise NotImplementedError()
+
+    def drop(self):
+        self.drop_copy(self.snapshot_name)
+
+
+class SqliteSnapshot(DatabaseSnapshot):
+    """
+    Snapshot is a plain copy of database file. Not available for in-memory databases.
+    """
+    def is_supported(self):
+        return bool(self.database_name) and self.database_name != ':memory:'
+
+    def check_unused(self):
+        """ Raise DatabaseInUseError if other connection holds lock on database file """
+        from django.db.backends.sqlite3.base import Database
+
+        connection = Database.connect(self.database_name, timeout=0, isolation_level=None)
+        try:
+            try:
+                connection.execute("BEGIN EXCLUSIVE")
+            except Database.OperationalError:
+                raise DatabaseInUseError(self.database_name, "other connection")
+            connection.execute("ROLLBACK")
+        finally:
+            connection.close()
+
+    def copy_to(self, name):
+        self.connection.close()
+        shutil.copyfile(self.database_name, name)
+
+    def drop_copy(self, name):
+        if os.path.exists(name):
+            os.remove(name)
+
+    def restore(self):
+        # file must not be overwritten under connection in the middle of transaction
+        self.close_connections()
+        self.check_unused()
+        shutil.copyfile(self.snapshot_name, self.database_name)
+
+
+class PostgresqlSnapshot(DatabaseSnapshot):
+    """
+    Snapshot is a database created with test database as template.
+    Template must not have other connections open, thus all DDL is executed
+    from maintenance database.
+    """
+    maintenance_database = 'postgres'
+
+    def execute(self, statements, unused_database=None):
+        """
+        Execute statements from maintenance database. If unused_database is
+        given, statements need it not to be used by other sessions (as template
+        or when dropped); DatabaseInUseError is raised when they fail because
+        of them.
+        """
+        self.close_connections()
+        self.connection.settings_dict['NAME'] = self.maintenance_database
+        try:
+            cursor = self.connection.cursor()
+            self.connection.creation._prepare_for_test_db_ddl()
+            for statement in statements:
+                try:
+                    cursor.execute(statement)
+                except Exception:
+                    error = sys.exc_info()
+                    if unused_database:
+                        cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = %s", [unused_database])
+                        sessions = cursor.fetchone()[0]
+                        if sessions:
+                            raise DatabaseInUseError(unused_database, "%d other sessions" % sessions)
+                    raise error[0], error[1], error[2]
+        finally:
+            self.connection.close()
+            self.connection.settings_dict['NAME'] = self.database_name
+
+    def copy_to(self, name):
+        qn = self.connection.ops.quote_name
+        self.execute([
+            "DROP DATABASE IF EXISTS %s" % qn(name),
+            "CREATE DATABASE %s TEMPLATE %s" % (qn(name), qn(self.database_name)),
+        ], self.database_name)
+
+    def drop_copy(self, name):
+        self.execute(["DROP DATABASE IF EXISTS %s" % self.connection.ops.quote_name(name)])
+
+    def restore(self):
+        qn = self.connection.ops.quote_name
+        self.execute([
+            "DROP DATABASE %s" % qn(self.database_name),
+            "CREATE DATABASE %s TEMPLATE %s" % (qn(self.database_name), qn(self.snapshot_name)),
+        ], self.database_name)
+
+
+class MysqlSnapshot(DatabaseSnapshot):
+    """
+    Snapshot is a copy of all tables (schema and data) in another database.
+    """
+    def get_tables(self):
+        return self.connection.introspection.get_table_list(self.connection.cursor())
+
+    def copy_to(self, name):
+        qn = self.connection.ops.quote_name
+        cursor = self.connection.cursor()
+        cursor.execute("DROP DATABASE IF EXISTS %s" % qn(name))
+        cursor.execute("CREATE DATABASE %s" % qn(name))
+        for table in self.get_tables():
+            cursor.execute("CREATE TABLE %s.%s LIKE %s.%s" % (
+                qn(name), qn(table), qn(self.database_name), qn(table)))
+            cursor.execute("INSERT INTO %s.%s SELECT * FROM %s.%s" % (
+                qn(name), qn(table), qn(self.database_name), qn(table)))
+        self.connection._commit()
+
+    def drop_copy(self, name):
+        self.connection.cursor().execute("DROP DATABASE IF EXISTS %s" % self.connection.ops.quote_name(name))
+
+    def restore(self):
+        qn = self.connection.ops.quote_name
+        cursor = self.connection.cursor()
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            for table in self.get_tables():
+                cursor.execute("TRUNCATE TABLE %s.%s" % (qn(self.database_name), qn(table)))
+                cursor.execute("INSERT INTO %s.%s SELECT * FROM %s.%s" % (
+                    qn(self.database_name), qn(table), qn(self.snapshot_name), qn(table)))
+        finally:
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        self.connection._commit()
+
+
+BACKEND_SNAPSHOT_MAP = {
+    'sqlite3' : SqliteSnapshot,
+    'postgresql' : PostgresqlSnapshot,
+    'postgresql_psycopg2' : PostgresqlSnapshot,
+    'mysql' : MysqlSnapshot,
+}
+
+def get_snapshot(connection):
+    """
+    Return snapshot for given connection, or None if it's backend
+    does not support snapshots.
+    """
+    backend_name = connection.settings_dict['ENGINE'].split(".")[-1]
+
+    if backend_name not in BACKEND_SNAPSHOT_MAP:
+        return None
+
+    snapshot = BACKEND_SNAPSHOT_MAP[backend_name](connection)
+    if not snapshot.is_supported():
+        return None
+
+    return snapshot
@@ -14,7 +14,8 @@ except ImportError:
 from djangosanetesting.noseplugins import (
     DjangoPlugin,
     DjangoLiveServerPlugin, SeleniumPlugin, CherryPyLiveServerPlugin,
-    DjangoTranslationPlugin,
+    DjangoTranslationPlugin, SaneParallelPlugin, SaneShardingPlugin, SaneTimingPlugin,
+    SaneProfilingPlugin,
     ResultPlugin,
 )
 
@@ -68,7 +69,7 @@ class DstNoseTestSuiteRunner(DjangoTestSuiteRunner):
         utils.setup_test_environment()
     
         result_plugin = ResultPlugin()
-        plugins = [DjangoPlugin(), SeleniumPlugin(), DjangoTranslationPlugin(), result_plugin]
+        plugins = [DjangoPlugin(), SeleniumPlugin(), DjangoTranslationPlugin(), SaneParallelPlugin(), SaneShardingPlugin(), SaneTimingPlugin(), SaneProfilingPlugin(), result_plugin]
         
         if getattr(settings, 'CHERRYPY_TEST_SERVER', False):
             plugins.append(CherryPyLiveServerPlugin())
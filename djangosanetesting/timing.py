@@ -0,0 +1,143 @@
+"""
+Timing of tests, split into phases, and history of those timings.
+
+Phases are:
+
+* plugins: overhead of plugins before and after test, not measured otherwise
+* databases: lazy creation of test databases
+* fixtures: fixture loading
+* server: live server and Selenium startup
+* body: test itself, including it's setUp and tearDown
+* reset: transaction rollback or database flush after test
+
+Plugins mark phases they are responsible for on shared phase_timer; body
+and plugin overhead are measured by SaneTimingPlugin. History (JSON file)
+keeps last phases and last HISTORY_LENGTH durations of every test and feeds
+test ordering and sharding.
+"""
+import os
+from glob import glob
+from time import time
+
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+PHASES = ("plugins", "databases", "fixtures", "server", "body", "reset")
+
+HISTORY_LENGTH = 10
+
+
+class PhaseTimer(object):
+    """
+    Accumulates explicitly marked phases of test being timed. When no test
+    is timed, marking phases is no-op. Phase started while another one is
+    running (i.e. databases created by live server while it's started) is
+    accounted to the outer one, so that no time is counted twice.
+    """
+    def __init__(self):
+        self.phases = None
+        self.running = None
+        self.depth = 0
+
+    def begin(self):
+        self.phases = {}
+        self.running = None
+        self.depth = 0
+
+    def end(self):
+        phases = self.phases
+        self.phases = None
+        self.running = None
+        self.depth = 0
+        return phases
+
+    def start(self, phase):
+        if self.phases is None:
+            return
+        if not self.depth:
+            self.running = (phase, time())
+        self.depth += 1
+
+    def stop(self, phase):
+        if self.phases is None or not self.depth:
+            return
+        self.depth -= 1
+        if not self.depth:
+            phase, started = self.running
+            self.running = None
+            self.phases[phase] = self.phases.get(phase, 0.0) + time() - started
+
+    def get_total(self):
+        """ Return total time of phases marked so far """
+        return sum((self.phases or {}).values())
+
+phase_timer = PhaseTimer()
+
+
+def get_duration(entry):
+    """ Return expected duration of test from it's history entry """
+    durations = entry.get("durations") or [0.0]
+    return sum(durations) / len(durations)
+
+def get_durations(history):
+    """ Return dict of test id: expected duration """
+    durations = {}
+    for test_id, entry in history.items():
+        durations[test_id] = get_duration(entry)
+    return durations
+
+def load_json(path):
+    if not path or not os.path.exists(path):
+        return {}
+    f = open(path, 'rb')
+    try:
+        return json.load(f)
+    finally:
+        f.close()
+
+def dump_json(path, data):
+    f = open(path, 'wb')
+    try:
+        json.dump(data, f, indent=0, sort_keys=True)
+    finally:
+        f.close()
+
+def load_history(path):
+    """ Return history stored in file, as dict of test id: entry """
+    return load_json(path)
+
+def load_durations(path):
+    """ Return expected durations of tests according to history stored in file """
+    return get_durations(load_history(path))
+
+def save_history(path, timings):
+    """
+    Add timings of tests run (dict of test id: phases) to history stored
+    in file. Tests not run keep their history.
+    """
+    history = load_history(path)
+    for test_id, phases in timings.items():
+        entry = history.setdefault(test_id, {})
+        entry["phases"] = phases
+        entry["durations"] = (entry.get("durations", []) + [sum(phases.values())])[-HISTORY_LENGTH:]
+    dump_json(path, history)
+
+def pop_worker_timings(path):
+    """ Return timings stored by parallel workers, removing their files """
+    base, extension = os.path.splitext(path)
+    timings = {}
+    for worker_path in sorted(glob("%s_w[0-9]*%s" % (base, extension))):
+        timings.update(load_json(worker_path))
+        os.remove(worker_path)
+    return timings
+
+def get_slowest(timings, count):
+    """ Return list of (total, test id, phases) of count slowest tests """
+    slowest = [(sum(phases.values()), test_id, phases) for test_id, phases in timings.items()]
+    slowest.sort(key=lambda item: (-item[0], item[1]))
+    return slowest[:count]
+
+def format_phases(phases):
+    return ", ".join(["%s %.3fs" % (phase, phases[phase]) for phase in PHASES if phases.get(phase)])
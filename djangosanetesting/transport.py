@@ -0,0 +1,180 @@
+"""
+In-process transport for urllib2: requests for live server are dispatched
+straight into Django's WSGI handler in the calling thread, without sockets
+and without live server thread.
+
+Responses are passed through urllib2's usual processing, thus non-2xx
+responses are raised as HTTPError and redirects are followed, as if
+they were received from live server.
+"""
+import httplib
+import sys
+import threading
+import urllib
+import urllib2
+import urlparse
+from StringIO import StringIO
+
+from djangosanetesting.utils import get_live_server_path, get_server_handler
+
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '0.0.0.0')
+
+# connection closing is suppressed only for threads dispatching in-process requests
+_dispatching = threading.local()
+_dispatching_lock = threading.Lock()
+_dispatching_threads = 0
+
+
+def split_host(host, default=80):
+    if ':' in host:
+        return host.rsplit(':', 1)
+    return host, str(default)
+
+def is_live_server_host(host):
+    """ Return whether host (with port) is where live server is (to be) running """
+    live_server = urlparse.urlsplit(get_live_server_path())[1]
+    if host.lower() == live_server.lower():
+        return True
+
+    name, port = split_host(host.lower())
+    live_server_name, live_server_port = split_host(live_server.lower())
+    return port == live_server_port and name in LOCAL_HOSTS and live_server_name in LOCAL_HOSTS
+
+def close_connection_unless_dispatching(**kwargs):
+    """ request_finished receiver standing for close_connection while requests are dispatched in-process """
+    from django.db import close_connection
+    if not getattr(_dispatching, 'depth', 0):
+        close_connection(**kwargs)
+
+def start_dispatching():
+    """
+    Keep database connection of current thread (and transaction of test) open
+    after in-process requests, like test client does; other threads
+    (e.g. live server) still close theirs.
+    """
+    global _dispatching_threads
+    from django.core import signals
+    from django.db import close_connection
+
+    _dispatching.depth = getattr(_dispatching, 'depth', 0) + 1
+    if _dispatching.depth > 1:
+        return
+    _dispatching_lock.acquire()
+    try:
+        if not _dispatching_threads:
+            signals.request_finished.disconnect(close_connection)
+            signals.request_finished.connect(close_connection_unless_dispatching, dispatch_uid=__name__)
+        _dispatching_threads += 1
+    finally:
+        _dispatching_lock.release()
+
+def stop_dispatching():
+    global _dispatching_threads
+    from django.core import signals
+    from django.db import close_connection
+
+    _dispatching.depth -= 1
+    if _dispatching.depth:
+        return
+    _dispatching_lock.acquire()
+    try:
+        _dispatching_threads -= 1
+        if not _dispatching_threads:
+            signals.request_finished.disconnect(dispatch_uid=__name__)
+            signals.request_finished.connect(close_connection)
+    finally:
+        _dispatching_lock.release()
+
+def get_environ(request):
+    host = request.get_host()
+    server_name, server_port = split_host(host)
+    path, query = urllib.splitquery(request.get_selector())
+    data = request.get_data() or ''
+
+    environ = {
+        'REQUEST_METHOD' : request.get_method(),
+        'SCRIPT_NAME' : '',
+        'PATH_INFO' : urllib.unquote(path),
+        'QUERY_STRING' : query or '',
+        'SERVER_NAME' : server_name,
+        'SERVER_PORT' : server_port,
+        'SERVER_PROTOCOL' : 'HTTP/1.1',
+        'REMOTE_ADDR' : '127.0.0.1',
+        'CONTENT_LENGTH' : str(len(data)),
+        'wsgi.version' : (1, 0),
+        'wsgi.url_scheme' : 'http',
+        'wsgi.input' : StringIO(data),
+        'wsgi.errors' : sys.stderr,
+        'wsgi.multithread' : False,
+        'wsgi.multiprocess' : False,
+        'wsgi.run_once' : False,
+    }
+    for name, value in request.header_items():
+        name = name.upper().replace('-', '_')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            environ['HTTP_' + name] = value
+    environ.setdefault('HTTP_HOST', host)
+    return environ
+
+
+class InProcessHTTPHandler(urllib2.BaseHandler):
+    """
+    Open requests for live server by calling WSGI application, leave
+    other requests to HTTPHandler.
+    """
+    # must be asked before HTTPHandler
+    handler_order = urllib2.HTTPHandler.handler_order - 100
+
+    def __init__(self, application=None):
+        self.application = application
+
+    def get_application(self):
+        if self.application is None:
+            self.application = get_server_handler()
+        return self.application
+
+    def http_open(self, request):
+        if not is_live_server_host(request.get_host()):
+            return None
+
+        started = []
+        body = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            started[:] = [status, headers]
+            return body.append
+
+        start_dispatching()
+        try:
+            result = self.get_application()(get_environ(request), start_response)
+            try:
+                for chunk in result:
+                    body.append(chunk)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            stop_dispatching()
+
+        status, headers = started
+        code, msg = status.split(' ', 1)
+        headers = httplib.HTTPMessage(StringIO("".join(["%s: %s\r\n" % header for header in headers])))
+
+        response = urllib.addinfourl(StringIO("".join(body)), headers, request.get_full_url())
+        response.code = int(code)
+        response.msg = msg
+        return response
+
+
+_opener = None
+
+def get_in_process_opener():
+    """ Return urllib2 opener dispatching requests for live server in-process """
+    global _opener
+    if _opener is None:
+        _opener = urllib2.build_opener(InProcessHTTPHandler())
+    return _opener
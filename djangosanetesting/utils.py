@@ -9,6 +9,9 @@ DEFAULT_LIVE_SERVER_PROTOCOL = "http"
 DEFAULT_LIVE_SERVER_PORT = 8000
 DEFAULT_LIVE_SERVER_ADDRESS = '0.0.0.0'
 DEFAULT_URL_ROOT_SERVER_ADDRESS = 'localhost'
+DEFAULT_LIVE_SERVER_THREADS = 8
+DEFAULT_LIVE_SERVER_QUEUE_SIZE = 64
+DEFAULT_LIVE_SERVER_STARTUP_TIMEOUT = 10
 
 
 def extract_django_traceback(twill=None, http_error=None, lines=None):
@@ -76,6 +79,27 @@ def get_databases():
     return connections
 
 
+def get_test_database_name(connection):
+    """
+    Return name of test database for connection, even for Django versions
+    not providing DatabaseCreation._get_test_db_name
+    """
+    if hasattr(connection.creation, '_get_test_db_name'):
+        return connection.creation._get_test_db_name()
+
+    test_database_name = connection.settings_dict.get('TEST_NAME')
+    if connection.settings_dict['ENGINE'].split(".")[-1] == 'sqlite3':
+        if test_database_name and test_database_name != ':memory:':
+            return test_database_name
+        return ':memory:'
+
+    if test_database_name:
+        return test_database_name
+
+    from django.db.backends.creation import TEST_DATABASE_PREFIX
+    return TEST_DATABASE_PREFIX + connection.settings_dict['NAME']
+
+
 def test_databases_exist():
     from django.db import DatabaseError
 
@@ -100,18 +124,37 @@ def get_live_server_path():
         getattr(settings, "LIVE_SERVER_PORT", DEFAULT_LIVE_SERVER_PORT)
     ))
 
+def get_live_server_url(uri):
+    """ Prepend get_live_server_path to uri not beginning with http """
+    if uri.startswith("http"):
+        return uri
+    base = get_live_server_path()
+    if uri.startswith("/"):
+        base = base.rstrip("/")
+    return "%s%s" % (base, uri)
+
+def set_live_server_port(port):
+    """
+    Point LIVE_SERVER_PORT, and URL_ROOT and SELENIUM_URL_ROOT pointing
+    to live server, to given port
+    """
+    from django.conf import settings
+    from djangosanetesting.parallel import shift_url_port
+
+    old_port = int(getattr(settings, "LIVE_SERVER_PORT", DEFAULT_LIVE_SERVER_PORT))
+    settings.LIVE_SERVER_PORT = port
+
+    for url_setting in ("URL_ROOT", "SELENIUM_URL_ROOT"):
+        if hasattr(settings, url_setting):
+            setattr(settings, url_setting, shift_url_port(getattr(settings, url_setting), old_port, port))
+
 def twill_patched_go(browser, original_go):
     """
     If call is not beginning with http, prepent it with get_live_server_path
     to allow relative calls
     """
     def twill_go_with_relative_paths(uri, *args, **kwargs):
-        if not uri.startswith("http"):
-            base = get_live_server_path()
-            if uri.startswith("/"):
-                base = base.rstrip("/")
-            uri = "%s%s" % (base, uri)
-        response = original_go(uri, *args, **kwargs)
+        response = original_go(get_live_server_url(uri), *args, **kwargs)
         if browser.result.get_http_code() == 500:
             raise extract_django_traceback(twill=browser)
         else:
@@ -194,3 +237,9 @@ def get_server_handler():
     return handler
 
 
+
+def get_percentile(values, percent):
+    """ Return value below which given percent of values fall (nearest rank) """
+    values = sorted(values)
+    index = int(round(percent / 100.0 * len(values) + 0.5)) - 1
+    return values[min(max(index, 0), len(values) - 1)]
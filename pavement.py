@@ -45,6 +45,11 @@ Package is documented - see docs/ or http://readthedocs.org/projects/Almad/djang
             'django = %s.noseplugins:DjangoPlugin' % name,
             'selenium = %s.noseplugins:SeleniumPlugin' % name,
             'sanetestselection = %s.noseplugins:SaneTestSelectionPlugin' % name,
+            'sanetestordering = %s.noseplugins:SaneTestOrderingPlugin' % name,
+            'saneparallel = %s.noseplugins:SaneParallelPlugin' % name,
+            'saneshard = %s.noseplugins:SaneShardingPlugin' % name,
+            'sanetiming = %s.noseplugins:SaneTimingPlugin' % name,
+            'saneprofiling = %s.noseplugins:SaneProfilingPlugin' % name,
             'djangotranslations = %s.noseplugins:DjangoTranslationPlugin' % name,
 	    'djangoresultplugin = %s.noseplugins:ResultPlugin' % name,
         ]
@@ -80,6 +85,8 @@ def unit(args, nose_run_kwargs=None):
     os.environ['DJANGO_SETTINGS_MODULE'] = "%s.settings" % test_project_module
     
     import nose
+    # parallel workers must be started from current directory
+    import djangosanetesting.parallel
 
     os.chdir(test_project_module)
 
@@ -98,3 +105,21 @@ def unit(args, nose_run_kwargs=None):
 @needs('unit')
 def test(args):
     pass
+
+@task
+@consume_args
+def bench(args):
+    """ Run benchmarks of django-sane-testing's own overhead """
+    import os, sys
+    from os.path import join, dirname, abspath
+
+    test_project_module = "testproject"
+
+    sys.path.insert(0, abspath(join(dirname(__file__), test_project_module)))
+    sys.path.insert(0, abspath(dirname(__file__)))
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = "%s.settings" % test_project_module
+
+    from benchmarks import results
+
+    results.main(args)
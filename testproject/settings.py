@@ -60,6 +60,9 @@ LANGUAGE_CODE = 'cs'
 CACHE_BACKEND = 'locmem://'
 
 DST_FLUSH_DJANGO_CACHE = True
+DST_CACHE_FIXTURES = True
+DST_FIXTURE_SAVEPOINTS = True
+DST_COUNT_QUERIES = True
 NONSENSICAL_SETTING_ATTRIBUTE_FOR_MOCK_TESTING = "owned"
 
 DEBUG = True
@@ -0,0 +1,131 @@
+import new
+import sys
+
+from nose.config import Config
+from nose.loader import TestLoader
+from nose.plugins.manager import PluginManager
+
+from djangosanetesting.cases import UnitTestCase, DatabaseTestCase, HttpTestCase
+from djangosanetesting import classification
+from djangosanetesting.noseplugins import SaneTestSelectionPlugin
+
+instantiated = []
+
+def make_cases():
+    """ Return fresh module with test cases, collected only by tests below """
+    class TestUnit(UnitTestCase):
+        def __init__(self, *args, **kwargs):
+            instantiated.append(self.__class__)
+            super(TestUnit, self).__init__(*args, **kwargs)
+
+        def test_unit(self):
+            pass
+
+    class TestDatabase(DatabaseTestCase):
+        fixtures = ['random_model_for_testing']
+
+        def __init__(self, *args, **kwargs):
+            instantiated.append(self.__class__)
+            super(TestDatabase, self).__init__(*args, **kwargs)
+
+        def test_database(self):
+            pass
+
+        def test_http(self):
+            pass
+        test_http.test_type = "http"
+
+    class TestHttp(HttpTestCase):
+        multi_db = True
+
+        def test_http(self):
+            pass
+
+    module = new.module('dst_classified_cases')
+    for case in (TestUnit, TestDatabase, TestHttp):
+        case.__module__ = module.__name__
+        setattr(module, case.__name__, case)
+    return module
+
+
+class TestClassification(UnitTestCase):
+    def setUp(self):
+        super(TestClassification, self).setUp()
+        self.module = make_cases()
+        self.index = classification.TestIndex()
+
+    def test_test_case_classified(self):
+        classified = self.index.classify(self.module.TestDatabase)
+        self.assert_equals("database", classified.test_type)
+        self.assert_equals(("django",), classified.required_plugins)
+        self.assert_equals(("default",), classified.databases)
+        self.assert_equals(("random_model_for_testing",), classified.fixtures)
+
+    def test_unittest_needs_no_database(self):
+        self.assert_equals((), self.index.classify(self.module.TestUnit).databases)
+
+    def test_multi_db_needs_all_databases(self):
+        databases = self.index.classify(self.module.TestHttp).databases
+        self.assert_equals(classification.get_database_aliases(), databases)
+        self.assert_equals("default", databases[0])
+
+    def test_method_attribute_preferred(self):
+        self.assert_equals("http", self.index.classify(self.module.TestDatabase, "test_http").test_type)
+        self.assert_equals("database", self.index.classify(self.module.TestDatabase, "test_database").test_type)
+
+    def test_method_test_types_included(self):
+        self.assert_equals(frozenset(["database", "http"]), self.index.get_test_types(self.module.TestDatabase))
+
+    def test_classified_once(self):
+        self.assert_true(self.index.classify(self.module.TestDatabase) is self.index.classify(self.module.TestDatabase))
+        self.assert_equals(1, len(self.index))
+
+
+class TestCollectionTimeSelection(UnitTestCase):
+    def setUp(self):
+        super(TestCollectionTimeSelection, self).setUp()
+        self.module = make_cases()
+        # nose imports module of collected test cases
+        sys.modules[self.module.__name__] = self.module
+        del instantiated[:]
+
+    def tearDown(self):
+        del sys.modules[self.module.__name__]
+        super(TestCollectionTimeSelection, self).tearDown()
+
+    def load(self, *enabled_tests):
+        plugin = SaneTestSelectionPlugin()
+        config = Config(plugins=PluginManager(plugins=[plugin]))
+        plugin.enabled = True
+        plugin.conf = config
+        plugin.enabled_tests = list(enabled_tests)
+        plugin.deselected = 0
+        self.plugin = plugin
+
+        suite = TestLoader(config=config).loadTestsFromModule(self.module)
+        return self.flatten(suite)
+
+    def flatten(self, suite):
+        if not hasattr(suite, '_tests'):
+            return [suite.test]
+        cases = []
+        for child in suite:
+            cases.extend(self.flatten(child))
+        return cases
+
+    def test_deselected_cases_not_instantiated(self):
+        tests = self.load("unit")
+        self.assert_equals([self.module.TestUnit], [test.cls for test in tests])
+        self.assert_equals([self.module.TestUnit], instantiated)
+
+    def test_deselected_methods_not_collected(self):
+        tests = self.load("http")
+        self.assert_equals(
+            [(self.module.TestDatabase, "test_http"), (self.module.TestHttp, "test_http")],
+            sorted([(test.cls, test.method.__name__) for test in tests], key=lambda t: t[0].__name__)
+        )
+
+    def test_deselected_counted(self):
+        self.load("database")
+        # TestUnit and TestHttp classes, TestDatabase.test_http method
+        self.assert_equals(3, self.plugin.deselected)
@@ -10,7 +10,13 @@ This is kinda antipattern, mail me for better solution ;)
 
 Covers #6
 """
-from djangosanetesting.cases import DatabaseTestCase
+from nose.case import Test, MethodTestCase
+
+from django.db import transaction, DatabaseError
+
+from djangosanetesting import noseplugins
+from djangosanetesting.cases import UnitTestCase, DatabaseTestCase
+from djangosanetesting.utils import get_databases, mock_settings
 from testapp.models import ExampleModel
 
 class TestAAAFirstfixture(DatabaseTestCase):
@@ -29,3 +35,120 @@ class TestBBBSecondFixture(DatabaseTestCase):
         self.assert_raises(ExampleModel.DoesNotExist, lambda:ExampleModel.objects.get(pk=1))
         self.assert_raises(ExampleModel.DoesNotExist, lambda:ExampleModel.objects.get(pk=2))    
 
+
+class TestCCCSharedFixtureModified(DatabaseTestCase):
+    fixtures = ['random_model_for_testing']
+    def test_fixture_deleted(self):
+        ExampleModel.objects.all().delete()
+        self.assert_equals(0, ExampleModel.objects.count())
+
+class TestDDDSharedFixtureIntact(DatabaseTestCase):
+    fixtures = ['random_model_for_testing']
+    def test_fixture_loaded_again(self):
+        self.assert_equals(ExampleModel, ExampleModel.objects.get(pk=1).__class__)
+        self.assert_equals(ExampleModel, ExampleModel.objects.get(pk=2).__class__)
+
+
+class SharedFixtureTestCase(DatabaseTestCase):
+    # only passed to plugin, not run
+    __test__ = False
+    fixtures = ['random_model_for_testing']
+
+    def test_a(self):
+        pass
+
+    def test_b(self):
+        pass
+
+    def test_c(self):
+        pass
+
+class OtherFixtureTestCase(SharedFixtureTestCase):
+    __test__ = False
+    fixtures = ['duplicate_model_for_testing']
+
+
+class TestFixtureSavepoints(UnitTestCase):
+    """
+    SQLite savepoints do not survive pysqlite's implicit commits, thus
+    savepoint support is forced and transaction calls are only recorded.
+    """
+    TRANSACTION_FUNCTIONS = ["enter_transaction_management", "managed", "leave_transaction_management",
+        "rollback", "savepoint", "savepoint_rollback"]
+
+    def setUp(self):
+        super(TestFixtureSavepoints, self).setUp()
+        self.calls = []
+        self.lost_savepoint = False
+        self.original_functions = dict([(name, getattr(transaction, name)) for name in self.TRANSACTION_FUNCTIONS])
+        for name in self.TRANSACTION_FUNCTIONS:
+            setattr(transaction, name, self.get_recorder(name))
+
+        self.features = get_databases()['default'].features
+        self.original_uses_savepoints = self.features.uses_savepoints
+        self.features.uses_savepoints = True
+
+        self.loaded = []
+        self.plugin = noseplugins.DjangoPlugin()
+        self.plugin._prepare_tests_fixtures = lambda test: self.loaded.append(noseplugins.getattr_test(test, 'fixtures'))
+
+    def tearDown(self):
+        for name, function in self.original_functions.items():
+            setattr(transaction, name, function)
+        self.features.uses_savepoints = self.original_uses_savepoints
+        super(TestFixtureSavepoints, self).tearDown()
+
+    def get_recorder(self, name):
+        def record(*args, **kwargs):
+            self.calls.append(name)
+            if name == "savepoint":
+                return "s%d" % len(self.calls)
+            if name == "savepoint_rollback" and self.lost_savepoint:
+                raise DatabaseError("no such savepoint")
+        return record
+
+    def run_tests(self, *methods):
+        """ Pass tests through plugin's database handling, as startTest and stopTest do """
+        for method in methods:
+            test = Test(MethodTestCase(method))
+            fixture_set = self.plugin._get_fixture_set(test)
+            self.assert_not_equals(None, fixture_set)
+            self.plugin._enter_fixture_savepoint(test, fixture_set)
+            self.plugin._rollback_fixture_savepoints()
+
+    @mock_settings("DST_FIXTURE_SAVEPOINTS", False)
+    def test_savepoints_not_used_when_disabled(self):
+        test = Test(MethodTestCase(SharedFixtureTestCase.test_a))
+        self.assert_equals(None, self.plugin._get_fixture_set(test))
+
+    @mock_settings("DST_FIXTURE_SAVEPOINTS", True)
+    def test_savepoints_not_used_without_backend_support(self):
+        self.features.uses_savepoints = False
+        test = Test(MethodTestCase(SharedFixtureTestCase.test_a))
+        self.assert_equals(None, self.plugin._get_fixture_set(test))
+
+    @mock_settings("DST_FIXTURE_SAVEPOINTS", True)
+    def test_fixtures_loaded_once_per_group(self):
+        self.run_tests(SharedFixtureTestCase.test_a, SharedFixtureTestCase.test_b, SharedFixtureTestCase.test_c)
+        self.assert_equals([['random_model_for_testing']], self.loaded)
+        self.assert_equals(1, self.calls.count("savepoint"))
+
+    @mock_settings("DST_FIXTURE_SAVEPOINTS", True)
+    def test_fixtures_restored_after_every_test(self):
+        self.run_tests(SharedFixtureTestCase.test_a, SharedFixtureTestCase.test_b)
+        self.assert_equals(2, self.calls.count("savepoint_rollback"))
+        self.assert_equals("s3", self.plugin.fixture_savepoints['default'])
+
+    @mock_settings("DST_FIXTURE_SAVEPOINTS", True)
+    def test_fixtures_loaded_again_when_changed(self):
+        self.run_tests(SharedFixtureTestCase.test_a, OtherFixtureTestCase.test_a, OtherFixtureTestCase.test_b)
+        self.assert_equals([['random_model_for_testing'], ['duplicate_model_for_testing']], self.loaded)
+        # transaction of first group is rolled back before second is loaded
+        self.assert_equals(1, self.calls.count("leave_transaction_management"))
+
+    @mock_settings("DST_FIXTURE_SAVEPOINTS", True)
+    def test_fixtures_loaded_again_when_savepoint_lost(self):
+        self.lost_savepoint = True
+        self.run_tests(SharedFixtureTestCase.test_a, SharedFixtureTestCase.test_b)
+        self.assert_equals(2, len(self.loaded))
+        self.assert_equals(None, self.plugin.fixture_set)
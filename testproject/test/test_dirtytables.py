@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+
+from djangosanetesting.cases import UnitTestCase, DestructiveDatabaseTestCase
+from djangosanetesting.dirtytables import get_written_table, DirtyTablesTracker
+from djangosanetesting.noseplugins import DjangoPlugin
+from djangosanetesting.utils import mock_settings
+
+from testapp.models import ExampleModel
+
+class TestWrittenTableRecognition(UnitTestCase):
+    def test_insert(self):
+        self.assert_equals("testapp_examplemodel", get_written_table('INSERT INTO "testapp_examplemodel" ("name") VALUES (%s)'))
+
+    def test_update(self):
+        self.assert_equals("testapp_examplemodel", get_written_table('UPDATE `testapp_examplemodel` SET `name` = %s'))
+
+    def test_delete(self):
+        self.assert_equals("testapp_examplemodel", get_written_table('  delete from testapp_examplemodel WHERE id = 1'))
+
+    def test_schema_qualified_quoted(self):
+        self.assert_equals("testapp_examplemodel", get_written_table('INSERT INTO "public"."testapp_examplemodel" ("name") VALUES (%s)'))
+
+    def test_schema_qualified_unquoted(self):
+        self.assert_equals("testapp_examplemodel", get_written_table('UPDATE public.testapp_examplemodel SET name = %s'))
+
+    def test_database_qualified_backquoted(self):
+        self.assert_equals("testapp_examplemodel", get_written_table('DELETE FROM `test_db`.`testapp_examplemodel` WHERE `id` = 1'))
+
+    def test_schema_qualified_bracketed(self):
+        self.assert_equals("testapp_examplemodel", get_written_table('INSERT INTO [dbo].[testapp_examplemodel] ([name]) VALUES (%s)'))
+
+    def test_select_ignored(self):
+        self.assert_equals(None, get_written_table('SELECT * FROM "testapp_examplemodel"'))
+
+
+class TestDirtyTablesTracker(UnitTestCase):
+    def test_written_tables_recorded_per_alias(self):
+        tracker = DirtyTablesTracker()
+        tracker.active = True
+        tracker.record('default', 'INSERT INTO "a" VALUES (1)')
+        tracker.record('default', 'SELECT * FROM "b"')
+        tracker.record('other', 'DELETE FROM "c"')
+        self.assert_equals(set(['a']), tracker.pop('default'))
+        self.assert_equals(set(), tracker.pop('default'))
+        self.assert_equals(set(['c']), tracker.pop('other'))
+
+    def test_nothing_recorded_when_inactive(self):
+        tracker = DirtyTablesTracker()
+        tracker.record('default', 'INSERT INTO "a" VALUES (1)')
+        self.assert_equals(set(), tracker.pop('default'))
+
+
+class TestDirtyTablesFlush(DestructiveDatabaseTestCase):
+    def setUp(self):
+        super(TestDirtyTablesFlush, self).setUp()
+        from django.contrib.auth.models import Group
+
+        self.fixture_dir = tempfile.mkdtemp()
+        f = open(os.path.join(self.fixture_dir, 'initial_data.json'), 'w')
+        try:
+            f.write('[{"pk" : 100, "model" : "testapp.examplemodel", "fields" : {"name" : "initial"}}, '
+                '{"pk" : 100, "model" : "auth.group", "fields" : {"name" : "initial"}}]')
+        finally:
+            f.close()
+
+        ExampleModel.objects.create(name="untouched")
+        Group.objects.create(name="untouched")
+
+        self.plugin = DjangoPlugin()
+        mock_settings("TEST_DATABASE_RESET_STRATEGY", "dirty_tables")(self.plugin._prepare_database_reset)('default')
+
+    def tearDown(self):
+        self.plugin.dirty_tables_tracker.uninstall()
+        shutil.rmtree(self.fixture_dir)
+        super(TestDirtyTablesFlush, self).tearDown()
+
+    def reset_database(self):
+        mock_settings("FIXTURE_DIRS", (self.fixture_dir,))(self.plugin._reset_database)('default')
+
+    def get_names(self):
+        from django.contrib.auth.models import Group
+        return (sorted([model.name for model in ExampleModel.objects.all()]),
+            sorted([group.name for group in Group.objects.all()]))
+
+    def test_only_written_table_flushed(self):
+        ExampleModel.objects.create(name="written")
+        self.reset_database()
+        self.assert_equals((["initial"], ["untouched"]), self.get_names())
+
+    def test_initial_data_loaded_only_into_flushed_tables(self):
+        from django.contrib.auth.models import Group
+        Group.objects.create(name="written")
+        self.reset_database()
+        self.assert_equals((["untouched"], ["initial"]), self.get_names())
+
+    def test_loading_initial_data_not_recorded(self):
+        ExampleModel.objects.create(name="written")
+        self.reset_database()
+        self.assert_equals(set(), self.plugin.dirty_tables_tracker.pop('default'))
+
+    def test_nothing_flushed_when_nothing_written(self):
+        self.reset_database()
+        self.assert_equals((["untouched"], ["untouched"]), self.get_names())
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+
+from djangosanetesting.cases import UnitTestCase
+from djangosanetesting.fingerprint import get_schema_fingerprint, write_fingerprint, read_fingerprint, read_database_fingerprint
+from djangosanetesting.utils import mock_settings
+
+class TestFingerprint(UnitTestCase):
+    def setUp(self):
+        super(TestFingerprint, self).setUp()
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        fd, self.database_name = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        self.connection = DatabaseWrapper({
+            'ENGINE' : 'django.db.backends.sqlite3',
+            'NAME' : self.database_name,
+            'OPTIONS' : {},
+            'TEST_NAME' : None,
+        }, 'fingerprint')
+
+    def test_fingerprint_stable(self):
+        self.assert_equals(get_schema_fingerprint(self.connection), get_schema_fingerprint(self.connection))
+
+    def get_changed_fingerprint(self, **attributes):
+        """ Return fingerprint with attributes of ExampleModel.name field changed """
+        from testapp.models import ExampleModel
+        field = ExampleModel._meta.get_field('name')
+        original = dict([(name, getattr(field, name)) for name in attributes])
+        field.__dict__.update(attributes)
+        try:
+            return get_schema_fingerprint(self.connection)
+        finally:
+            field.__dict__.update(original)
+
+    def test_unique_changes_fingerprint(self):
+        self.assert_not_equals(get_schema_fingerprint(self.connection), self.get_changed_fingerprint(_unique=True))
+
+    def test_null_changes_fingerprint(self):
+        self.assert_not_equals(get_schema_fingerprint(self.connection), self.get_changed_fingerprint(null=True))
+
+    def test_index_changes_fingerprint(self):
+        self.assert_not_equals(get_schema_fingerprint(self.connection), self.get_changed_fingerprint(db_index=True))
+
+    def test_custom_sql_changes_fingerprint(self):
+        from testapp import models
+        sql_dir = os.path.join(os.path.dirname(models.__file__), 'sql')
+        os.mkdir(sql_dir)
+        try:
+            fingerprint = get_schema_fingerprint(self.connection)
+            f = open(os.path.join(sql_dir, 'examplemodel.sql'), 'w')
+            try:
+                f.write("INSERT INTO testapp_examplemodel (name) VALUES ('custom');\n")
+            finally:
+                f.close()
+            self.assert_not_equals(fingerprint, get_schema_fingerprint(self.connection))
+        finally:
+            shutil.rmtree(sql_dir)
+
+    def test_initial_data_changes_fingerprint(self):
+        fixture_dir = tempfile.mkdtemp()
+        try:
+            f = open(os.path.join(fixture_dir, 'initial_data.json'), 'w')
+            try:
+                f.write('[]')
+            finally:
+                f.close()
+            fingerprint = mock_settings("FIXTURE_DIRS", (fixture_dir,))(get_schema_fingerprint)(self.connection)
+            self.assert_not_equals(get_schema_fingerprint(self.connection), fingerprint)
+        finally:
+            shutil.rmtree(fixture_dir)
+
+    def test_missing_fingerprint(self):
+        self.assert_equals(None, read_fingerprint(self.connection))
+
+    def test_fingerprint_stored(self):
+        write_fingerprint(self.connection, 'a' * 32)
+        write_fingerprint(self.connection, 'b' * 32)
+        self.assert_equals('b' * 32, read_fingerprint(self.connection))
+
+    def test_fingerprint_read_from_other_database(self):
+        write_fingerprint(self.connection, 'a' * 32)
+        self.connection.settings_dict['NAME'] = ':memory:'
+        self.assert_equals('a' * 32, read_database_fingerprint(self.connection, self.database_name))
+        self.assert_equals(':memory:', self.connection.settings_dict['NAME'])
+
+    def test_nonexistent_database_not_created(self):
+        name = self.database_name + '_missing'
+        self.assert_equals(None, read_database_fingerprint(self.connection, name))
+        self.assert_false(os.path.exists(name))
+
+    def tearDown(self):
+        self.connection.close()
+        os.remove(self.database_name)
+        super(TestFingerprint, self).tearDown()
@@ -0,0 +1,26 @@
+from djangosanetesting.cases import DatabaseTestCase
+from djangosanetesting.fixtures import FixtureCache
+
+from testapp.models import ExampleModel
+
+class TestFixtureCache(DatabaseTestCase):
+    def test_fixture_file_found(self):
+        files = FixtureCache().find_fixture_files('random_model_for_testing', 'default')
+        self.assert_equals(1, len(files))
+        self.assert_true(files[0][0].endswith('random_model_for_testing.json'))
+        self.assert_equals('json', files[0][1])
+
+    def test_compressed_fixture_left_for_loaddata(self):
+        self.assert_equals(None, FixtureCache().find_fixture_files('random_model_for_testing.json.gz', 'default'))
+
+    def test_fixture_parsed_only_once(self):
+        cache = FixtureCache()
+        cache.load(['random_model_for_testing'], database='default', commit=False)
+        self.assert_equals(2, ExampleModel.objects.count())
+
+        ExampleModel.objects.all().delete()
+        cache.load(['random_model_for_testing'], database='default', commit=False)
+        self.assert_equals(2, ExampleModel.objects.count())
+
+        self.assert_equals(1, cache.misses)
+        self.assert_equals(1, cache.hits)
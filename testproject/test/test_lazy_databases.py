@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+import threading
+from time import sleep
+
+from djangosanetesting.cases import UnitTestCase
+from djangosanetesting.noseplugins import DjangoPlugin
+from djangosanetesting.utils import mock_settings
+
+class TestContextNotNeedingDatabase(UnitTestCase):
+    database_single_transaction_after_all_tests = True
+
+class TestLazyDatabaseCreation(UnitTestCase):
+    def setUp(self):
+        super(TestLazyDatabaseCreation, self).setUp()
+        self.plugin = DjangoPlugin()
+
+    def test_context_setup_deferred(self):
+        self.plugin.startContext(TestContextNotNeedingDatabase)
+        self.assert_equals([TestContextNotNeedingDatabase], self.plugin.pending_contexts)
+
+    def test_unused_context_not_torn_down(self):
+        self.plugin.startContext(TestContextNotNeedingDatabase)
+        self.plugin.stopContext(TestContextNotNeedingDatabase)
+        self.assert_equals([], self.plugin.pending_contexts)
+
+    def test_report_without_databases(self):
+        self.assert_true(self.plugin.get_database_report().startswith("Test databases: not needed: "))
+
+    def test_report_estimates_time_saved(self):
+        aliases = self.plugin._get_aliases()
+        self.plugin.created_databases = {aliases[0] : 0.5}
+        report = self.plugin.get_database_report()
+        self.assert_true(report.startswith("Test databases: %s (0.50s)" % aliases[0]))
+        if len(aliases) > 1:
+            self.assert_true(report.endswith("(about %.2fs saved)" % (0.5 * (len(aliases) - 1))))
+
+    def test_default_database_without_dependencies(self):
+        self.assert_equals([], self.plugin._get_test_dependencies('default'))
+
+    def test_other_databases_depend_on_default(self):
+        for alias in self.plugin._get_aliases():
+            if alias != 'default' and 'TEST_DEPENDENCIES' not in self.plugin._get_databases()[alias].settings_dict:
+                self.assert_equals(['default'], self.plugin._get_test_dependencies(alias))
+
+
+class TestConcurrentDatabaseCreation(UnitTestCase):
+    """
+    Creation of file-backed test databases (in-memory ones are always created
+    one by one), with creation of every single database only recorded
+    """
+    def setUp(self):
+        super(TestConcurrentDatabaseCreation, self).setUp()
+        from django.db.utils import ConnectionHandler
+
+        self.directory = tempfile.mkdtemp()
+        def database(name, **kwargs):
+            kwargs.update({
+                'ENGINE' : 'django.db.backends.sqlite3',
+                'NAME' : os.path.join(self.directory, name),
+                'TEST_NAME' : os.path.join(self.directory, 'test_' + name),
+            })
+            return kwargs
+
+        self.connections = ConnectionHandler({
+            'default' : database('main'),
+            'users' : database('users'),
+            'duplicate' : database('main'),
+            'independent' : database('independent', TEST_DEPENDENCIES=[]),
+            'dependent' : database('dependent', TEST_DEPENDENCIES=['independent']),
+        })
+
+        self.plugin = DjangoPlugin()
+        self.plugin._get_databases = lambda: self.connections
+        self.plugin._create_test_database = self.record_creation
+        # databases are not really created, thus there is nothing to snapshot or track
+        self.plugin._prepare_database_reset = lambda alias: None
+
+        self.lock = threading.Lock()
+        self.created = []
+        self.running = []
+        self.concurrent = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestConcurrentDatabaseCreation, self).tearDown()
+
+    def record_creation(self, alias):
+        self.lock.acquire()
+        try:
+            for dependency in self.plugin._get_test_dependencies(alias):
+                self.assert_true(dependency in self.created, "%s created before %s" % (alias, dependency))
+            self.running.append(alias)
+            self.concurrent = max(self.concurrent, len(self.running))
+        finally:
+            self.lock.release()
+
+        sleep(0.1)
+
+        self.lock.acquire()
+        try:
+            self.running.remove(alias)
+            self.created.append(alias)
+            self.plugin.created_databases[alias] = 0.1
+        finally:
+            self.lock.release()
+
+    @mock_settings("DST_DATABASE_CREATION_THREADS", 4)
+    def test_independent_databases_created_concurrently(self):
+        self.plugin._create_test_databases(['default', 'independent'])
+        self.assert_equals(['default', 'independent'], sorted(self.created))
+        self.assert_equals(2, self.concurrent)
+
+    @mock_settings("DST_DATABASE_CREATION_THREADS", 1)
+    def test_databases_created_one_by_one_with_single_thread(self):
+        self.plugin._create_test_databases(['default', 'independent'])
+        self.assert_equals(['default', 'independent'], sorted(self.created))
+        self.assert_equals(1, self.concurrent)
+
+    @mock_settings("DST_DATABASE_CREATION_THREADS", 4)
+    def test_dependencies_created_first(self):
+        self.plugin._create_test_databases(['default', 'users', 'independent', 'dependent'])
+        self.assert_equals(4, len(self.created))
+        self.assert_true(self.created.index('default') < self.created.index('users'))
+        self.assert_true(self.created.index('independent') < self.created.index('dependent'))
+
+    @mock_settings("DST_DATABASE_CREATION_THREADS", 4)
+    def test_explicit_dependencies_created_as_well(self):
+        self.plugin._create_test_databases(['dependent'])
+        self.assert_equals(['independent', 'dependent'], self.created)
+
+    @mock_settings("DST_DATABASE_CREATION_THREADS", 4)
+    def test_database_with_same_signature_shared(self):
+        self.plugin._create_test_databases(['default', 'duplicate'])
+        self.assert_equals(['default'], self.created)
+        self.assert_true('duplicate' in self.plugin.created_databases)
+        self.assert_equals(self.connections['default'].settings_dict['NAME'], self.connections['duplicate'].settings_dict['NAME'])
+
+    @mock_settings("DST_DATABASE_CREATION_THREADS", 4)
+    def test_database_with_same_signature_shared_when_created_later(self):
+        self.plugin._create_test_databases(['default'])
+        self.plugin._create_test_databases(['duplicate'])
+        self.assert_equals(['default'], self.created)
+        self.assert_true('duplicate' in self.plugin.created_databases)
+
+    def test_database_needed_by_more_creation_threads_created_once(self):
+        def create():
+            # stands for lazy creation from within creation thread
+            self.plugin.database_creation_state.creating = True
+            self.plugin._create_test_databases(['independent'])
+
+        threads = [threading.Thread(target=create) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assert_equals(['independent'], self.created)
+        self.assert_equals({}, self.plugin.creating_databases)
+
+    def test_unsatisfiable_dependencies_raised(self):
+        from django.core.exceptions import ImproperlyConfigured
+        try:
+            self.plugin._create_test_database_groups_concurrently([['dependent']], {'dependent' : ['independent']}, 4)
+        except ImproperlyConfigured, e:
+            self.assert_equals("Test databases can't be created, TEST_DEPENDENCIES not satisfied: dependent needs independent", str(e))
+        else:
+            assert False, "ImproperlyConfigured expected"
+        self.assert_equals([], self.created)
+
+    @mock_settings("DST_DATABASE_CREATION_THREADS", 4)
+    def test_failed_creation_raised(self):
+        def fail(alias):
+            raise ValueError(alias)
+        self.plugin._create_test_database = fail
+        self.assert_raises(ValueError, self.plugin._create_test_databases, ['default', 'independent'])
+        self.assert_equals({}, self.plugin.created_databases)
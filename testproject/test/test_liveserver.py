@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
 from StringIO import StringIO
+from time import time, sleep
+import httplib
+import socket
+import struct
+import threading
 import urllib2
 
-from djangosanetesting.cases import HttpTestCase, SeleniumTestCase
-from djangosanetesting.utils import get_live_server_path
+from django.core.servers.basehttp import WSGIServerException
+
+from djangosanetesting.cases import UnitTestCase, HttpTestCase, SeleniumTestCase
+from djangosanetesting import noseplugins, transport
+from djangosanetesting.utils import get_live_server_path, get_live_server_url, set_live_server_port, mock_settings
 
 from testapp.models import ExampleModel
 
@@ -17,6 +25,9 @@ class TestLiveServerRunning(HttpTestCase):
     
     def test_http_retrievable_repeatedly(self):
         return self.get_ok()
+
+    def test_http_retrievable_by_relative_url(self):
+        self.assertEquals(u'OKidoki', self.urlopen('/testtwohundred/').read())
     
     def test_client_available(self):
         res = self.client.get('/testtwohundred/')
@@ -52,6 +63,313 @@ class TestLiveServerRunning(HttpTestCase):
         else:
             assert False, "500 expected"
 
+class TestInProcessHttp(HttpTestCase):
+    in_process_http = True
+    start_live_server = False
+
+    def test_http_retrievable(self):
+        self.assert_equals('OKidoki', self.urlopen('%stesttwohundred/' % get_live_server_path()).read())
+
+    def test_http_retrievable_by_relative_url(self):
+        response = self.urlopen('/testtwohundred/')
+        self.assert_equals(200, response.code)
+        self.assert_equals('OKidoki', response.read())
+
+    def test_test_database_used(self):
+        ExampleModel.objects.create(name="test1")
+        ExampleModel.objects.create(name="test2")
+        self.assert_equals('OKidoki', self.urlopen('/assert_two_example_models/').read())
+
+    def test_not_authorized(self):
+        try:
+            self.urlopen('/return_not_authorized/', data='data')
+        except urllib2.HTTPError, err:
+            self.assert_equals(401, err.code)
+            self.assert_equals('401 Not Authorized', err.read())
+        else:
+            assert False, "401 expected"
+
+    def test_server_error(self):
+        try:
+            self.urlopen('/return_server_error/')
+        except urllib2.HTTPError, err:
+            self.assert_equals(500, err.code)
+            self.assert_equals("500 Server error, traceback not found", err.msg)
+        else:
+            assert False, "500 expected"
+
+    def test_django_error_traceback(self):
+        try:
+            self.urlopen('/return_django_error/')
+        except urllib2.HTTPError, err:
+            self.assert_equals(500, err.code)
+            self.assert_true("500 Django error" in err.msg)
+        else:
+            assert False, "500 expected"
+
+class ClosedConnections(object):
+    """ Stands for django.db.connections, recording threads closing them """
+    def __init__(self):
+        self.threads = []
+
+    def all(self):
+        return [self]
+
+    def close(self):
+        self.threads.append(threading.currentThread())
+
+class TestInProcessDispatching(UnitTestCase):
+    def setUp(self):
+        super(TestInProcessDispatching, self).setUp()
+        import django.db
+        self.connections = django.db.connections
+        django.db.connections = ClosedConnections()
+
+    def tearDown(self):
+        import django.db
+        django.db.connections = self.connections
+        super(TestInProcessDispatching, self).tearDown()
+
+    def get_receivers(self):
+        from django.core import signals
+        from django.dispatch.dispatcher import _make_id
+        return signals.request_finished._live_receivers(_make_id(None))
+
+    def finish_request(self):
+        """ Return whether connections of current thread are closed when request is finished """
+        import django.db
+        from django.core import signals
+        signals.request_finished.send(sender=self.__class__)
+        return threading.currentThread() in django.db.connections.threads
+
+    def finish_request_in_thread(self):
+        closed = []
+        thread = threading.Thread(target=lambda: closed.append(self.finish_request()))
+        thread.start()
+        thread.join()
+        return closed[0]
+
+    def test_connection_kept_by_dispatching_thread(self):
+        transport.start_dispatching()
+        try:
+            self.assert_false(self.finish_request())
+        finally:
+            transport.stop_dispatching()
+
+    def test_connection_closed_by_other_threads(self):
+        transport.start_dispatching()
+        try:
+            self.assert_true(self.finish_request_in_thread())
+        finally:
+            transport.stop_dispatching()
+
+    def test_nested_dispatching(self):
+        transport.start_dispatching()
+        try:
+            transport.start_dispatching()
+            transport.stop_dispatching()
+            self.assert_false(self.finish_request())
+        finally:
+            transport.stop_dispatching()
+
+    def test_receiver_restored(self):
+        from django.db import close_connection
+        transport.start_dispatching()
+        transport.stop_dispatching()
+        self.assert_true(close_connection in self.get_receivers())
+        self.assert_false(transport.close_connection_unless_dispatching in self.get_receivers())
+        self.assert_true(self.finish_request_in_thread())
+
+class TestServerKeepAlive(UnitTestCase):
+    def setUp(self):
+        super(TestServerKeepAlive, self).setUp()
+        self.thread = noseplugins.TestServerThread('127.0.0.1', 0)
+        self.thread.start()
+        self.thread.started.wait()
+
+    def tearDown(self):
+        self.thread.join(5)
+        super(TestServerKeepAlive, self).tearDown()
+
+    def test_connection_kept_alive(self):
+        connection = httplib.HTTPConnection('127.0.0.1', self.thread.httpd.server_port)
+        try:
+            sockets = []
+            for i in range(2):
+                connection.request('GET', '/testtwohundred/')
+                response = connection.getresponse()
+                self.assert_equals('OKidoki', response.read())
+                # httplib drops socket of connection closed by server
+                sockets.append(connection.sock)
+            self.assert_not_equals(None, sockets[0])
+            self.assert_true(sockets[0] is sockets[1])
+        finally:
+            connection.close()
+
+class TestServerWorkerPool(UnitTestCase):
+    def setUp(self):
+        super(TestServerWorkerPool, self).setUp()
+        self.thread = noseplugins.TestServerThread('127.0.0.1', 0, threads=1)
+        self.thread.start()
+        self.thread.started.wait()
+        self.connections = []
+        self.errors = []
+        self.thread.httpd.handle_error = lambda request, client_address: self.errors.append(client_address)
+
+    def tearDown(self):
+        for connection in self.connections:
+            connection.close()
+        self.thread.join(5)
+        super(TestServerWorkerPool, self).tearDown()
+
+    def get_ok(self, connection):
+        connection.request('GET', '/testtwohundred/')
+        self.assert_equals('OKidoki', connection.getresponse().read())
+
+    def connect(self):
+        connection = httplib.HTTPConnection('127.0.0.1', self.thread.httpd.server_port, timeout=5)
+        self.connections.append(connection)
+        return connection
+
+    def test_stopped_immediately(self):
+        started = time()
+        self.thread.join(5)
+        self.assert_false(self.thread.isAlive())
+        self.assert_true(time() - started < 0.5)
+
+    def connect_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(5)
+        sock.connect(('127.0.0.1', self.thread.httpd.server_port))
+        return sock
+
+    def test_rejected_connection_closed(self):
+        self.thread.httpd.verify_request = lambda request, client_address: False
+        sock = self.connect_socket()
+        try:
+            self.assert_equals('', sock.recv(1))
+        finally:
+            sock.close()
+
+    def test_connection_reset_while_idle_closed(self):
+        connection = self.connect()
+        self.get_ok(connection)
+        # close with RST instead of FIN
+        connection.sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        connection.close()
+        # single worker handles reset connection before next one
+        for i in range(100):
+            if not self.thread.httpd.idle:
+                break
+            sleep(.01)
+        self.get_ok(self.connect())
+        self.assert_equals([], self.errors)
+
+    def test_unfinished_request_timed_out(self):
+        original_timeout = noseplugins.KeepAliveWSGIRequestHandler.timeout
+        noseplugins.KeepAliveWSGIRequestHandler.timeout = 0.1
+        try:
+            sock = self.connect_socket()
+            try:
+                sock.sendall('GET /testtwohundred/')
+                self.assert_equals('', sock.recv(1))
+            finally:
+                sock.close()
+        finally:
+            noseplugins.KeepAliveWSGIRequestHandler.timeout = original_timeout
+        self.get_ok(self.connect())
+        self.assert_equals([], self.errors)
+
+    def test_idle_connections_do_not_occupy_workers(self):
+        connections = [self.connect() for i in range(3)]
+        for connection in connections + connections:
+            self.get_ok(connection)
+
+    def test_requests_measured(self):
+        connection = self.connect()
+        self.get_ok(connection)
+        self.get_ok(connection)
+        metrics = self.thread.httpd.metrics
+        # latency is recorded after response is sent
+        for i in range(100):
+            if len(metrics.latencies) == 2:
+                break
+            sleep(.01)
+        self.assert_equals(2, len(metrics.latencies))
+        self.assert_equals(2, len(metrics.waits))
+        self.assert_true(metrics.get_report().startswith("Live server: 2 requests, 1 threads"))
+
+class ServerThread(object):
+    """ Stands for thread running live server """
+    def __init__(self, error=None):
+        self.error = error
+
+    def isAlive(self):
+        return self.error is None
+
+class TestServerReadiness(UnitTestCase):
+    def setUp(self):
+        super(TestServerReadiness, self).setUp()
+        self.plugin = noseplugins.CherryPyLiveServerPlugin()
+
+    def get_error(self, is_ready, thread, port=8000):
+        try:
+            self.plugin.wait_for_server('0.0.0.0', port, is_ready, thread)
+        except WSGIServerException, e:
+            return str(e)
+        return None
+
+    def test_ready_server(self):
+        self.assert_equals(None, self.get_error(lambda: True, ServerThread()))
+
+    def test_failed_server_reported(self):
+        error = self.get_error(lambda: False, ServerThread(socket.error("Address already in use")))
+        self.assert_equals("Live server could not be started on 0.0.0.0:8000: Address already in use", error)
+
+    @mock_settings("LIVE_SERVER_STARTUP_TIMEOUT", 0.05)
+    def test_server_not_ready_in_time(self):
+        self.assert_equals("Live server on 0.0.0.0:8000 not ready in 0.05 seconds", self.get_error(lambda: False, ServerThread()))
+
+    @mock_settings("LIVE_SERVER_HEALTH_URL", "/testtwohundred/")
+    def test_health_url_answered(self):
+        thread = noseplugins.TestServerThread('127.0.0.1', 0)
+        thread.start()
+        thread.started.wait()
+        try:
+            self.assert_equals(None, self.get_error(lambda: True, thread, thread.httpd.server_port))
+        finally:
+            thread.join(5)
+
+    @mock_settings("LIVE_SERVER_STARTUP_TIMEOUT", 0.2)
+    @mock_settings("LIVE_SERVER_HEALTH_URL", "/return_server_error/")
+    def test_server_error_not_healthy(self):
+        thread = noseplugins.TestServerThread('127.0.0.1', 0)
+        thread.start()
+        thread.started.wait()
+        try:
+            error = self.get_error(lambda: True, thread, thread.httpd.server_port)
+        finally:
+            thread.join(5)
+        self.assert_true(error.endswith("did not answer /return_server_error/: HTTP status 500"), error)
+
+class TestEphemeralPort(UnitTestCase):
+    @mock_settings("LIVE_SERVER_PORT", 0)
+    @mock_settings("URL_ROOT", "http://localhost:0/")
+    def test_port_propagated_to_urls(self):
+        set_live_server_port(8123)
+        self.assert_equals("http://localhost:8123/", get_live_server_path())
+        self.assert_equals("http://localhost:8123/testtwohundred/", get_live_server_url("/testtwohundred/"))
+
+    def test_server_bound_to_free_port(self):
+        plugin = noseplugins.DjangoLiveServerPlugin()
+        plugin.start_server('127.0.0.1', 0)
+        try:
+            port = plugin.get_server_port()
+            self.assert_not_equals(0, port)
+            self.assert_equals('OKidoki', urllib2.urlopen('http://127.0.0.1:%d/testtwohundred/' % port).read())
+        finally:
+            plugin.stop_test_server()
+
 class TestSelenium(SeleniumTestCase):
     translation_language_code = 'cs'
 
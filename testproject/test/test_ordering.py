@@ -0,0 +1,66 @@
+import os
+import tempfile
+
+from nose.suite import ContextSuite
+
+from djangosanetesting.cases import UnitTestCase, DatabaseTestCase, DestructiveDatabaseTestCase
+from djangosanetesting.noseplugins import SaneTestOrderingPlugin
+from djangosanetesting.timing import save_history
+
+class FirstFixtureDatabase(DatabaseTestCase):
+    fixtures = ['random_model_for_testing']
+
+class Destructive(DestructiveDatabaseTestCase):
+    pass
+
+class SecondFixtureDatabase(DatabaseTestCase):
+    fixtures = ['duplicate_model_for_testing']
+
+class Unit(UnitTestCase):
+    pass
+
+class AnotherFirstFixtureDatabase(DatabaseTestCase):
+    fixtures = ['random_model_for_testing']
+
+# those are helpers for tests below, not tests
+for case in (FirstFixtureDatabase, Destructive, SecondFixtureDatabase, Unit, AnotherFirstFixtureDatabase):
+    case.__test__ = False
+
+class TestOrdering(UnitTestCase):
+    def setUp(self):
+        super(TestOrdering, self).setUp()
+        self.plugin = SaneTestOrderingPlugin()
+        self.suite = ContextSuite(tests=[
+            ContextSuite(tests=[], context=case)
+            for case in (FirstFixtureDatabase, Destructive, SecondFixtureDatabase, Unit, AnotherFirstFixtureDatabase)
+        ])
+
+    def test_cases_with_same_state_grouped(self):
+        self.plugin.prepareTest(self.suite)
+        self.assert_equals(
+            [Unit, FirstFixtureDatabase, AnotherFirstFixtureDatabase, SecondFixtureDatabase, Destructive],
+            [suite.context for suite in self.suite._tests]
+        )
+
+    def test_avoided_transitions_counted(self):
+        self.plugin.prepareTest(self.suite)
+        self.assert_equals(4, self.plugin.original_transitions)
+        self.assert_equals(3, self.plugin.transitions)
+
+    def test_faster_groups_first(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.remove(path)
+        try:
+            save_history(path, {
+                "%s.FirstFixtureDatabase.test_a" % __name__ : {"body" : 2.0},
+                "%s.SecondFixtureDatabase.test_a" % __name__ : {"body" : 1.0},
+            })
+            self.plugin.durations_path = path
+            self.plugin.prepareTest(self.suite)
+        finally:
+            os.remove(path)
+        self.assert_equals(
+            [Unit, SecondFixtureDatabase, FirstFixtureDatabase, AnotherFirstFixtureDatabase, Destructive],
+            [suite.context for suite in self.suite._tests]
+        )
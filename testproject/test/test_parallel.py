@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from nose.suite import ContextSuite
+
+import djangosanetesting
+from djangosanetesting.cases import UnitTestCase
+from djangosanetesting.parallel import parse_worker, get_worker_database_name, shift_url_port, filter_suite, ParallelRun
+
+class TestWorkerConfiguration(UnitTestCase):
+    def test_worker_parsed(self):
+        self.assert_equals((3, 16), parse_worker("3/16"))
+
+    def test_worker_out_of_range_rejected(self):
+        self.assert_raises(ValueError, parse_worker, "16/16")
+
+    def test_malformed_worker_rejected(self):
+        self.assert_raises(ValueError, parse_worker, "3")
+
+    def test_database_name_suffixed(self):
+        self.assert_equals("test_app_w3", get_worker_database_name("test_app", 3))
+
+    def test_sqlite_extension_kept(self):
+        self.assert_equals("/tmp/test_w1.db", get_worker_database_name("/tmp/test.db", 1))
+
+    def test_memory_database_kept(self):
+        self.assert_equals(":memory:", get_worker_database_name(":memory:", 1))
+
+    def test_live_server_url_shifted(self):
+        self.assert_equals("http://localhost:8003/", shift_url_port("http://localhost:8000/", 8000, 8003))
+
+    def test_foreign_url_kept(self):
+        self.assert_equals("http://example.com/", shift_url_port("http://example.com/", 8000, 8003))
+
+
+class First(object): pass
+class Second(object): pass
+class Third(object): pass
+
+class TestSuiteFiltering(UnitTestCase):
+    def test_units_filtered(self):
+        suite = ContextSuite(tests=[
+            ContextSuite(tests=[ContextSuite(tests=[], context=First), ContextSuite(tests=[], context=Second)]),
+            ContextSuite(tests=[ContextSuite(tests=[], context=Third)]),
+        ])
+        self.assert_equals(2, filter_suite(suite, lambda unit: unit.context is not Second))
+        self.assert_equals([[First], [Third]], [[unit.context for unit in module._tests] for module in suite._tests])
+
+
+# run by worker processes: report one passed, one failed and one skipped test
+WORKER_SCRIPT = """
+import os, sys, unittest
+sys.path.insert(0, %(path)r)
+from djangosanetesting.parallel import dump_result
+
+index = os.environ['DST_WORKER'].split('/')[0]
+assert os.getcwd() == %(cwd)r, os.getcwd()
+
+class Worker(unittest.TestCase):
+    def test_passed(self):
+        pass
+
+    def test_failed(self):
+        self.fail("failed in worker %%s" %% index)
+
+result = unittest.TestResult()
+unittest.TestLoader().loadTestsFromTestCase(Worker)(result)
+result.errorClasses = {'skip' : ([('skipped_%%s' %% index, 'reason')], 'SKIP', False)}
+dump_result(result, os.environ['DST_WORKER_RESULT'])
+"""
+
+class TestParallelRun(UnitTestCase):
+    def setUp(self):
+        super(TestParallelRun, self).setUp()
+        self.directory = os.path.realpath(tempfile.mkdtemp())
+        package_path = os.path.dirname(os.path.dirname(os.path.abspath(djangosanetesting.__file__)))
+        self.write_script("worker.py", WORKER_SCRIPT % {'path' : package_path, 'cwd' : self.directory})
+        self.write_script("crash.py", "import sys\nsys.exit(3)\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestParallelRun, self).tearDown()
+
+    def write_script(self, name, content):
+        f = open(os.path.join(self.directory, name), 'w')
+        try:
+            f.write(content)
+        finally:
+            f.close()
+
+    def get_result(self):
+        result = unittest.TestResult()
+        result.errorClasses = {'skip' : ([], 'SKIP', False)}
+        return result
+
+    def test_results_of_workers_merged(self):
+        # script is given relative to directory workers are started in
+        result = ParallelRun(2, argv=["worker.py"], cwd=self.directory)(self.get_result())
+        self.assert_equals(4, result.testsRun)
+        self.assert_equals(0, len(result.errors), result.errors)
+        self.assert_equals(["failed in worker 0", "failed in worker 1"],
+            sorted([text.strip().splitlines()[-1].split(": ", 1)[1] for test, text in result.failures]))
+        self.assert_equals(["skipped_0", "skipped_1"], sorted([str(test) for test, text in result.errorClasses['skip'][0]]))
+
+    def test_crashed_worker_reported(self):
+        result = ParallelRun(1, argv=["crash.py"], cwd=self.directory)(self.get_result())
+        self.assert_equals(1, len(result.errors))
+        self.assert_equals("worker 0/1", str(result.errors[0][0]))
+        self.assert_true("exited with status 3" in result.errors[0][1])
@@ -0,0 +1,56 @@
+from nose.case import Test, MethodTestCase
+
+from djangosanetesting.cases import UnitTestCase, DatabaseTestCase
+from djangosanetesting import noseplugins
+
+class ProfiledTestCase(DatabaseTestCase):
+    # only profiled, not run
+    __test__ = False
+
+    fixtures = ["random_model_for_testing"]
+
+    def test_plain(self):
+        pass
+
+    def test_multi_db(self):
+        pass
+    test_multi_db.multi_db = True
+
+    def test_none(self):
+        pass
+    test_none.database_flush = None
+
+
+class TestTestProfile(UnitTestCase):
+    def wrap(self, method):
+        return Test(MethodTestCase(method))
+
+    def test_case_resolved(self):
+        profile = noseplugins.get_test_profile(self.wrap(ProfiledTestCase.test_plain))
+        self.assert_equals(ProfiledTestCase, profile.test_case)
+        self.assert_true(isinstance(profile.test_case_instance, ProfiledTestCase))
+
+    def test_attribute_from_test_case(self):
+        self.assert_equals(["random_model_for_testing"], noseplugins.get_test_profile(self.wrap(ProfiledTestCase.test_plain)).get("fixtures"))
+
+    def test_method_attribute_preferred(self):
+        test = self.wrap(ProfiledTestCase.test_multi_db)
+        self.assert_equals(True, noseplugins.get_test_profile(test).get("multi_db"))
+        self.assert_equals(True, noseplugins.getattr_test(test, "multi_db"))
+
+    def test_none_method_attribute_ignored(self):
+        self.assert_equals(False, noseplugins.get_test_profile(self.wrap(ProfiledTestCase.test_none)).get("database_flush", True))
+
+    def test_default_for_missing_attribute(self):
+        test = self.wrap(ProfiledTestCase.test_plain)
+        self.assert_equals("default", noseplugins.get_test_profile(test).get("make_translations_missing", "default"))
+        self.assert_false(noseplugins.hasattr_test(test, "flush_django_cache"))
+        self.assert_true(noseplugins.hasattr_test(test, "fixtures"))
+
+    def test_profile_resolved_once(self):
+        test = self.wrap(ProfiledTestCase.test_plain)
+        self.assert_true(noseplugins.get_test_profile(test) is noseplugins.get_test_profile(test))
+
+    def test_profile_read_only(self):
+        profile = noseplugins.get_test_profile(self.wrap(ProfiledTestCase.test_plain))
+        self.assert_raises(AttributeError, setattr, profile, "test_case", None)
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import threading
+
+from djangosanetesting.cases import UnitTestCase
+from djangosanetesting.profiling import HookProfiler
+
+class Plugin(object):
+    """ Stands for profiled plugin """
+    def startTest(self, test):
+        return test
+
+    def stopTest(self, test):
+        self.reset()
+
+    def reset(self):
+        pass
+
+
+class TestHookProfiler(UnitTestCase):
+    def setUp(self):
+        super(TestHookProfiler, self).setUp()
+        self.profiler = HookProfiler()
+        self.plugin = Plugin()
+
+    def test_calls_counted(self):
+        self.profiler.patch(self.plugin, 'startTest', 'Plugin.startTest')
+        self.assert_equals("test", self.plugin.startTest("test"))
+        self.plugin.startTest("test")
+        self.assert_equals(2, self.profiler.hooks['Plugin.startTest'][0])
+
+    def test_time_accounted_to_test_type(self):
+        self.profiler.patch(self.plugin, 'startTest', 'Plugin.startTest', lambda test: test)
+        self.plugin.startTest("unit")
+        self.assert_equals([('Plugin.startTest', 'unit')], self.profiler.test_types.keys())
+
+    def test_nested_calls_stacked(self):
+        self.profiler.patch(self.plugin, 'stopTest', 'Plugin.stopTest')
+        self.profiler.patch(self.plugin, 'reset', 'Plugin.reset')
+        self.plugin.stopTest("test")
+        self.assert_equals(['Plugin.stopTest', 'Plugin.stopTest;Plugin.reset'], sorted(self.profiler.stacks.keys()))
+
+    def test_other_threads_not_measured(self):
+        self.profiler.patch(self.plugin, 'startTest', 'Plugin.startTest')
+        thread = threading.Thread(target=self.plugin.startTest, args=("test",))
+        thread.start()
+        thread.join()
+        self.assert_equals({}, self.profiler.hooks)
+
+    def test_unpatched(self):
+        self.profiler.patch(self.plugin, 'startTest', 'Plugin.startTest')
+        self.profiler.unpatch_all()
+        self.assert_false('startTest' in self.plugin.__dict__)
+
+    def test_stacks_dumped_in_microseconds(self):
+        self.profiler.stacks = {'Plugin.stopTest;Plugin.reset' : 0.25}
+        fd, path = tempfile.mkstemp(suffix='.folded')
+        os.close(fd)
+        try:
+            self.profiler.dump_stacks(path)
+            f = open(path)
+            try:
+                self.assert_equals("Plugin.stopTest;Plugin.reset 250000\n", f.read())
+            finally:
+                f.close()
+        finally:
+            os.remove(path)
@@ -0,0 +1,126 @@
+from nose.case import Test, MethodTestCase
+
+from djangosanetesting.cases import UnitTestCase, DatabaseTestCase
+from djangosanetesting.noseplugins import DjangoPlugin
+from djangosanetesting.queries import QueryCounter, QueryBudgetResult
+
+from testapp.models import ExampleModel
+
+class Result(object):
+    """ Stands for result test is reported to """
+    def __init__(self):
+        self.reported = []
+
+    def startTest(self, test):
+        self.reported.append("start")
+
+    def stopTest(self, test):
+        self.reported.append("stop")
+
+    def addSuccess(self, test):
+        self.reported.append("success")
+
+    def addFailure(self, test, err):
+        self.reported.append(str(err[1]))
+
+
+class TestQueryCounter(UnitTestCase):
+    def setUp(self):
+        super(TestQueryCounter, self).setUp()
+        self.counter = QueryCounter()
+
+    def test_nothing_counted_outside_test(self):
+        self.counter.record('default', 0.1)
+        self.counter.start()
+        self.assert_equals({}, self.counter.stop("app.test_a"))
+        self.assert_equals({}, self.counter.tests)
+
+    def test_counted_per_alias(self):
+        self.counter.start()
+        self.counter.record('default', 0.25)
+        self.counter.record('default', 0.25)
+        self.counter.record('other', 0.5)
+        self.assert_equals({'default' : [2, 0.5], 'other' : [1, 0.5]}, self.counter.stop("app.test_a"))
+        self.assert_equals(["app.test_a"], self.counter.tests.keys())
+
+    def test_nothing_counted_when_suspended(self):
+        self.counter.start()
+        self.counter.suspend()
+        self.counter.record('default', 0.1)
+        self.counter.resume()
+        self.assert_equals({}, self.counter.stop())
+
+    def test_total_budget(self):
+        self.counter.start()
+        self.counter.record('default', 0.1)
+        self.counter.record('other', 0.1)
+        self.assert_equals(None, self.counter.get_exceeded_budget(2))
+        self.assert_equals("Query budget exceeded (total: 2 queries, budget 1)", self.counter.get_exceeded_budget(1))
+
+    def test_budget_per_alias(self):
+        self.counter.start()
+        self.counter.record('default', 0.1)
+        self.counter.record('other', 0.1)
+        self.assert_equals("Query budget exceeded (other: 1 queries, budget 0)", self.counter.get_exceeded_budget({'default' : 1, 'other' : 0}))
+
+    def test_report_lists_most_queries_first(self):
+        self.counter.tests = {"app.test_a" : {'default' : [1, 0.5]}, "app.test_b" : {'default' : [3, 0.1]}}
+        lines = self.counter.get_report_lines(1)
+        self.assert_equals(2, len(lines))
+        self.assert_true(lines[0].startswith("SQL queries: 4 in 0.600s"))
+        self.assert_true("app.test_b" in lines[1])
+
+
+class TestQueryBudgetResult(UnitTestCase):
+    def run_counted(self, budget, queries):
+        result = Result()
+        counter = QueryCounter()
+        budget_result = QueryBudgetResult(result, counter, budget)
+        budget_result.startTest(None)
+        # stands for DjangoPlugin.startTest
+        counter.start()
+        for i in range(queries):
+            counter.record('default', 0.0)
+        budget_result.addSuccess(None)
+        budget_result.stopTest(None)
+        return result.reported
+
+    def test_success_within_budget(self):
+        self.assert_equals(["start", "success", "stop"], self.run_counted(1, 1))
+
+    def test_failure_when_budget_exceeded(self):
+        self.assert_equals(["start", "Query budget exceeded (total: 2 queries, budget 1)", "stop"], self.run_counted(1, 2))
+
+
+class BudgetedTestCase(UnitTestCase):
+    __test__ = False
+
+    def test_unlimited(self):
+        pass
+
+    def test_limited(self):
+        pass
+    test_limited.query_budget = 1
+
+class TestQueryBudgetRunner(UnitTestCase):
+    def setUp(self):
+        super(TestQueryBudgetRunner, self).setUp()
+        self.plugin = DjangoPlugin()
+
+    def tearDown(self):
+        self.plugin.query_counter.uninstall()
+        super(TestQueryBudgetRunner, self).tearDown()
+
+    def test_test_without_budget_left_to_others(self):
+        self.assert_equals(None, self.plugin.prepareTestCase(Test(MethodTestCase(BudgetedTestCase.test_unlimited))))
+
+    def test_test_with_budget_run_by_plugin(self):
+        self.assert_not_equals(None, self.plugin.prepareTestCase(Test(MethodTestCase(BudgetedTestCase.test_limited))))
+
+
+class TestQueryBudget(DatabaseTestCase):
+    query_budget = 2
+
+    def test_within_budget(self):
+        ExampleModel.objects.create(name="test1")
+        self.assert_equals(1, len(ExampleModel.objects.all()))
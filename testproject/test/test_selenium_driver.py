@@ -0,0 +1,196 @@
+from __future__ import with_statement
+
+import httplib
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from djangosanetesting.cases import UnitTestCase
+from djangosanetesting.selenium.driver import selenium, get_latency_histogram
+
+
+class SeleniumRequestHandler(BaseHTTPRequestHandler):
+    """ Stands for Selenium RC server, answering OK to every command """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers['content-length']))
+        self.requests = getattr(self, 'requests', 0) + 1
+        if self.server.ignore_commands and self.requests > 1:
+            # stands for server closing idle connection just when command arrives
+            self.close_connection = True
+            return
+        self.server.commands += 1
+        if request.startswith("cmd=fail"):
+            body = "ERROR: command failed"
+        else:
+            body = "OK,session"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.close_connections:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        if self.server.break_responses:
+            self.wfile.write(body[:2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+        # stands for server dropping idle connection
+        self.close_connection = self.server.drop_connections or self.server.close_connections
+
+    def log_message(self, *args):
+        pass
+
+
+class SeleniumServer(HTTPServer):
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), SeleniumRequestHandler)
+        self.connections = 0
+        self.commands = 0
+        self.drop_connections = False
+        self.close_connections = False
+        self.ignore_commands = False
+        self.break_responses = False
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        thread = threading.Thread(target=HTTPServer.process_request, args=(self, request, client_address))
+        thread.setDaemon(True)
+        thread.start()
+
+
+class SeleniumServerCase(UnitTestCase):
+    def setUp(self):
+        super(SeleniumServerCase, self).setUp()
+        self.server = SeleniumServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval" : 0.01})
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.selenium = selenium('127.0.0.1', self.server.server_port, '*mock', 'http://localhost:8000/')
+
+    def tearDown(self):
+        self.selenium.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+        super(SeleniumServerCase, self).tearDown()
+
+
+class TestSeleniumDriverConnections(SeleniumServerCase):
+    def test_connection_reused(self):
+        self.selenium.start()
+        for i in range(3):
+            self.selenium.open("/")
+        self.selenium.stop()
+        self.assert_equals(5, self.server.commands)
+        self.assert_equals(1, self.server.connections)
+
+    def test_reconnected_when_connection_dropped(self):
+        self.server.drop_connections = True
+        self.selenium.start()
+        self.selenium.open("/")
+        self.assert_equals(2, self.server.commands)
+        self.assert_equals(2, self.server.connections)
+
+    def test_command_sent_again_when_connection_closed_without_response(self):
+        self.server.ignore_commands = True
+        self.selenium.start()
+        self.selenium.open("/")
+        self.assert_equals(2, self.server.commands)
+        self.assert_equals(2, self.server.connections)
+
+    def test_command_not_sent_again_when_response_broken(self):
+        self.selenium.start()
+        self.server.break_responses = True
+        self.assert_raises(httplib.IncompleteRead, self.selenium.open, "/")
+        self.assert_equals(2, self.server.commands)
+        self.assert_equals(1, self.server.connections)
+
+    def test_command_not_sent_again_over_new_connection(self):
+        self.server.break_responses = True
+        self.assert_raises(httplib.IncompleteRead, self.selenium.start)
+        self.assert_equals(1, self.server.commands)
+
+    def test_connections_not_shared_by_sessions(self):
+        other = selenium('127.0.0.1', self.server.server_port, '*mock', 'http://localhost:8000/')
+        self.selenium.start()
+        other.start()
+        self.assert_equals(2, self.server.connections)
+        other.stop()
+        self.assert_equals({}, other.pool.idle)
+
+    def test_latencies_measured(self):
+        self.selenium.start()
+        self.selenium.open("/")
+        self.selenium.open("/")
+        self.assert_equals(2, len(self.selenium.latencies["open"]))
+        self.assert_equals(3, sum([count for bound, count in self.selenium.get_latency_histogram()]))
+        self.assert_equals(2, sum([count for bound, count in self.selenium.get_latency_histogram("open")]))
+
+
+class TestLatencyHistogram(UnitTestCase):
+    def test_latencies_counted_in_buckets(self):
+        histogram = dict(get_latency_histogram([0.0005, 0.001, 0.003, 10.0]))
+        self.assert_equals(2, histogram[0.001])
+        self.assert_equals(1, histogram[0.005])
+        self.assert_equals(1, histogram[None])
+        self.assert_equals(4, sum(histogram.values()))
+
+
+class TestSeleniumCommandBatch(SeleniumServerCase):
+    def test_commands_sent_on_finish(self):
+        self.selenium.start()
+        with self.selenium.batch():
+            self.selenium.type("id_username", "user")
+            self.selenium.click("id_submit")
+            self.assert_equals(1, self.server.commands)
+        # wait for element present is sent before every action
+        self.assert_equals(5, self.server.commands)
+        self.assert_equals(1, self.server.connections)
+        self.assert_equals(None, self.selenium.batched)
+
+    def test_commands_sent_when_value_needed(self):
+        self.selenium.start()
+        with self.selenium.batch():
+            self.selenium.type("id_username", "user")
+            self.assert_equals("session", self.selenium.get_value("id_username"))
+            self.assert_equals(5, self.server.commands)
+            self.selenium.click("id_submit")
+        self.assert_equals(7, self.server.commands)
+
+    def test_nested_batch_sent_by_outer_one(self):
+        with self.selenium.batch():
+            with self.selenium.batch():
+                self.selenium.open("/")
+            self.assert_equals(0, self.server.commands)
+        self.assert_equals(1, self.server.commands)
+
+    def test_failed_command_raised(self):
+        batch = self.selenium.batch()
+        batch.start()
+        self.selenium.open("/")
+        self.selenium.do_command("fail", [])
+        self.selenium.open("/")
+        try:
+            batch.finish()
+        except Exception, e:
+            self.assert_equals("ERROR: command failed", str(e))
+        else:
+            assert False, "Exception expected"
+        self.assert_equals(3, self.server.commands)
+
+    def test_commands_not_read_by_closing_server_sent_again(self):
+        self.server.close_connections = True
+        with self.selenium.batch():
+            for i in range(3):
+                self.selenium.open("/")
+        self.assert_equals(3, self.server.commands)
+        self.assert_equals(3, self.server.connections)
+
+    def test_commands_discarded_on_exception(self):
+        try:
+            with self.selenium.batch():
+                self.selenium.open("/")
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assert_equals(0, self.server.commands)
+        self.assert_equals(None, self.selenium.batched)
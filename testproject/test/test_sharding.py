@@ -0,0 +1,101 @@
+from nose.suite import ContextSuite
+
+from djangosanetesting.cases import UnitTestCase, DatabaseTestCase
+from djangosanetesting import sharding
+
+class Unit(UnitTestCase):
+    pass
+
+class FirstFixtureDatabase(DatabaseTestCase):
+    fixtures = ['random_model_for_testing']
+
+class AnotherFirstFixtureDatabase(DatabaseTestCase):
+    fixtures = ['random_model_for_testing']
+
+class SecondFixtureDatabase(DatabaseTestCase):
+    fixtures = ['duplicate_model_for_testing']
+
+# those are helpers for tests below, not tests
+for case in (Unit, FirstFixtureDatabase, AnotherFirstFixtureDatabase, SecondFixtureDatabase):
+    case.__test__ = False
+
+class Case(object):
+    """ Stands for test in suite """
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, result):
+        pass
+
+    def id(self):
+        return self.name
+
+def make_suite(*cases):
+    return ContextSuite(tests=[
+        ContextSuite(tests=[Case("%s.%s.test_%d" % (case.__module__, case.__name__, i)) for i in range(tests)], context=case)
+        for case, tests in cases
+    ])
+
+def get_contexts(suite):
+    return [unit.context for unit in suite._tests]
+
+
+class TestShardSpecification(UnitTestCase):
+    def test_shard_parsed(self):
+        self.assert_equals((3, 12), sharding.parse_shard("3/12"))
+
+    def test_shard_indexes_one_based(self):
+        self.assert_raises(ValueError, sharding.parse_shard, "0/12")
+        self.assert_equals((12, 12), sharding.parse_shard("12/12"))
+
+    def test_malformed_shard_rejected(self):
+        self.assert_raises(ValueError, sharding.parse_shard, "3")
+
+
+class TestPartition(UnitTestCase):
+    def test_balanced_by_test_count(self):
+        suite = make_suite((Unit, 4), (SecondFixtureDatabase, 2), (FirstFixtureDatabase, 2))
+        partition = sharding.Partition(suite, 2)
+        self.assert_equals([4.0, 4.0], partition.loads)
+        partition.filter(suite, 1)
+        self.assert_equals([SecondFixtureDatabase, FirstFixtureDatabase], get_contexts(suite))
+
+    def test_balanced_by_durations(self):
+        suite = make_suite((Unit, 4), (SecondFixtureDatabase, 2), (FirstFixtureDatabase, 2))
+        durations = {
+            "%s.Unit.test_0" % __name__ : 0.5,
+            "%s.SecondFixtureDatabase.test_0" % __name__ : 5.0,
+            "%s.FirstFixtureDatabase.test_0" % __name__ : 1.0,
+        }
+        partition = sharding.Partition(suite, 2, durations)
+        partition.filter(suite, 0)
+        self.assert_equals([SecondFixtureDatabase], get_contexts(suite))
+
+    def test_unknown_tests_estimated_by_average_duration(self):
+        suite = make_suite((Unit, 4), (SecondFixtureDatabase, 2))
+        partition = sharding.Partition(suite, 2, {"%s.SecondFixtureDatabase.test_0" % __name__ : 0.5})
+        self.assert_equals([2.0, 0.5], partition.loads)
+
+    def test_cases_sharing_fixtures_kept_together(self):
+        suite = make_suite((FirstFixtureDatabase, 1), (Unit, 1), (AnotherFirstFixtureDatabase, 1), (SecondFixtureDatabase, 1))
+        partition = sharding.Partition(suite, 3)
+        units = list(suite._tests)
+        self.assert_equals(partition.get_shard(units[0]), partition.get_shard(units[2]))
+        self.assert_not_equals(partition.get_shard(units[0]), partition.get_shard(units[1]))
+
+    def test_shards_cover_suite_once(self):
+        contexts = []
+        for shard in range(3):
+            suite = make_suite((Unit, 3), (FirstFixtureDatabase, 1), (SecondFixtureDatabase, 2), (AnotherFirstFixtureDatabase, 1))
+            sharding.Partition(suite, 3).filter(suite, shard)
+            contexts.extend(get_contexts(suite))
+        self.assert_equals(
+            set([Unit, FirstFixtureDatabase, SecondFixtureDatabase, AnotherFirstFixtureDatabase]), set(contexts))
+        self.assert_equals(4, len(contexts))
+
+
+class TestDurations(UnitTestCase):
+    def test_prefix_durations_summed(self):
+        totals = sharding.get_prefix_durations({"app.Case.test_a" : 1.0, "app.Case.test_b" : 2.0, "app.func" : 4.0})
+        self.assert_equals(3.0, totals["app.Case"])
+        self.assert_equals(7.0, totals["app"])
@@ -0,0 +1,104 @@
+import os
+import tempfile
+
+from djangosanetesting.cases import UnitTestCase
+from djangosanetesting.snapshots import get_snapshot, SqliteSnapshot, DatabaseInUseError
+
+class TestSqliteSnapshot(UnitTestCase):
+    def setUp(self):
+        super(TestSqliteSnapshot, self).setUp()
+        fd, self.database_name = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        self.connection = self.get_connection('snapshot')
+        cursor = self.connection.cursor()
+        cursor.execute("CREATE TABLE example (name varchar(50))")
+        cursor.execute("INSERT INTO example VALUES ('snapshotted')")
+        self.connection._commit()
+
+    def get_connection(self, alias):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+        return DatabaseWrapper({
+            'ENGINE' : 'django.db.backends.sqlite3',
+            'NAME' : self.database_name,
+            'OPTIONS' : {},
+            'TEST_NAME' : None,
+        }, alias)
+
+    def write(self, connection):
+        """ Leave transaction writing to database open """
+        connection.cursor().execute("INSERT INTO example VALUES ('written')")
+
+    def get_names(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT name FROM example ORDER BY name")
+        return [row[0] for row in cursor.fetchall()]
+
+    def test_snapshot_available_for_file(self):
+        self.assert_true(isinstance(get_snapshot(self.connection), SqliteSnapshot))
+
+    def test_snapshot_not_available_in_memory(self):
+        self.connection.settings_dict['NAME'] = ':memory:'
+        self.assert_equals(None, get_snapshot(self.connection))
+
+    def test_restore_returns_snapshotted_data(self):
+        snapshot = get_snapshot(self.connection)
+        snapshot.take()
+
+        cursor = self.connection.cursor()
+        cursor.execute("INSERT INTO example VALUES ('written')")
+        self.connection._commit()
+        self.assert_equals(['snapshotted', 'written'], self.get_names())
+
+        snapshot.restore()
+        self.assert_equals(['snapshotted'], self.get_names())
+
+    def test_restore_closes_connections_of_other_aliases(self):
+        from django.db import connections
+        snapshot = get_snapshot(self.connection)
+        snapshot.take()
+
+        duplicate = self.get_connection('snapshot_duplicate')
+        connections.databases['snapshot_duplicate'] = duplicate.settings_dict
+        connections._connections['snapshot_duplicate'] = duplicate
+        try:
+            self.write(duplicate)
+            snapshot.restore()
+            self.assert_equals(None, duplicate.connection)
+        finally:
+            del connections._connections['snapshot_duplicate']
+            del connections.databases['snapshot_duplicate']
+        self.assert_equals(['snapshotted'], self.get_names())
+
+    def test_restore_refused_when_database_used(self):
+        snapshot = get_snapshot(self.connection)
+        snapshot.take()
+
+        other = self.get_connection('other')
+        self.write(other)
+        try:
+            self.assert_raises(DatabaseInUseError, snapshot.restore)
+        finally:
+            other._rollback()
+            other.close()
+        snapshot.restore()
+        self.assert_equals(['snapshotted'], self.get_names())
+
+    def test_copy_has_same_data(self):
+        snapshot = get_snapshot(self.connection)
+        name = self.database_name + '_copy'
+        snapshot.copy_to(name)
+        try:
+            self.connection.settings_dict['NAME'] = name
+            self.assert_equals(['snapshotted'], self.get_names())
+        finally:
+            self.connection.close()
+            snapshot.drop_copy(name)
+        self.assert_false(os.path.exists(name))
+
+    def tearDown(self):
+        self.connection.close()
+        self.connection.settings_dict['NAME'] = self.database_name
+        SqliteSnapshot(self.connection).drop()
+        os.remove(self.database_name)
+        super(TestSqliteSnapshot, self).tearDown()
@@ -0,0 +1,167 @@
+import os
+import tempfile
+
+from djangosanetesting.cases import UnitTestCase
+from djangosanetesting import timing
+from djangosanetesting.parallel import get_worker_file_name
+from djangosanetesting.noseplugins import SaneTimingPlugin
+
+class Case(object):
+    """ Stands for timed test """
+    def id(self):
+        return "app.Case.test_timed"
+
+
+class Clock(object):
+    """ Stands for time, advanced explicitly """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Options(object):
+    dst_timing = None
+    dst_slowest = 10
+
+
+class TestPhaseTimer(UnitTestCase):
+    def setUp(self):
+        super(TestPhaseTimer, self).setUp()
+        self.timer = timing.PhaseTimer()
+
+    def test_nothing_recorded_outside_test(self):
+        self.timer.start("fixtures")
+        self.timer.stop("fixtures")
+        self.assert_equals(None, self.timer.end())
+
+    def test_phases_accumulated(self):
+        self.timer.begin()
+        for i in range(2):
+            self.timer.start("reset")
+            self.timer.stop("reset")
+        total = self.timer.get_total()
+        self.assert_equals({"reset" : total}, self.timer.end())
+
+    def test_nested_phase_accounted_to_outer(self):
+        self.timer.begin()
+        self.timer.start("server")
+        self.timer.start("databases")
+        self.timer.stop("databases")
+        self.timer.stop("server")
+        self.assert_equals(["server"], self.timer.end().keys())
+
+    def test_nested_phase_not_counted_twice(self):
+        original_time = timing.time
+        timing.time = clock = Clock()
+        try:
+            self.timer.begin()
+            self.timer.start("server")
+            clock.now += 1.0
+            self.timer.start("databases")
+            clock.now += 2.0
+            self.timer.stop("databases")
+            self.timer.stop("server")
+            self.assert_equals({"server" : 3.0}, self.timer.end())
+        finally:
+            timing.time = original_time
+
+    def test_same_phase_nested_timed_from_outer_start(self):
+        original_time = timing.time
+        timing.time = clock = Clock()
+        try:
+            self.timer.begin()
+            self.timer.start("databases")
+            clock.now += 1.0
+            self.timer.start("databases")
+            clock.now += 2.0
+            self.timer.stop("databases")
+            clock.now += 4.0
+            self.timer.stop("databases")
+            self.assert_equals({"databases" : 7.0}, self.timer.end())
+        finally:
+            timing.time = original_time
+
+    def test_stop_without_start_ignored(self):
+        self.timer.begin()
+        self.timer.stop("fixtures")
+        self.assert_equals({}, self.timer.end())
+
+
+class TestHistory(UnitTestCase):
+    def setUp(self):
+        super(TestHistory, self).setUp()
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.remove(self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        super(TestHistory, self).tearDown()
+
+    def test_durations_averaged(self):
+        timing.save_history(self.path, {"app.test_a" : {"body" : 1.0}})
+        timing.save_history(self.path, {"app.test_a" : {"body" : 2.0, "fixtures" : 1.0}})
+        self.assert_equals({"app.test_a" : 2.0}, timing.load_durations(self.path))
+
+    def test_last_phases_kept(self):
+        timing.save_history(self.path, {"app.test_a" : {"body" : 1.0}})
+        timing.save_history(self.path, {"app.test_b" : {"body" : 2.0}})
+        history = timing.load_history(self.path)
+        self.assert_equals({"body" : 1.0}, history["app.test_a"]["phases"])
+        self.assert_equals([2.0], history["app.test_b"]["durations"])
+
+    def test_history_length_limited(self):
+        for i in range(timing.HISTORY_LENGTH + 2):
+            timing.save_history(self.path, {"app.test_a" : {"body" : float(i)}})
+        durations = timing.load_history(self.path)["app.test_a"]["durations"]
+        self.assert_equals(timing.HISTORY_LENGTH, len(durations))
+        self.assert_equals(float(timing.HISTORY_LENGTH + 1), durations[-1])
+
+    def test_worker_timings_collected(self):
+        worker_path = get_worker_file_name(self.path, 1)
+        timing.dump_json(worker_path, {"app.test_a" : {"body" : 1.0}})
+        self.assert_equals({"app.test_a" : {"body" : 1.0}}, timing.pop_worker_timings(self.path))
+        self.assert_false(os.path.exists(worker_path))
+
+    def test_slowest_first(self):
+        timings = {"app.test_a" : {"body" : 1.0}, "app.test_b" : {"body" : 1.0, "reset" : 2.0}, "app.test_c" : {"body" : 0.5}}
+        self.assert_equals(["app.test_b", "app.test_a"], [test_id for total, test_id, phases in timing.get_slowest(timings, 2)])
+
+
+class TestTimingPlugin(UnitTestCase):
+    def setUp(self):
+        super(TestTimingPlugin, self).setUp()
+        self.plugin = SaneTimingPlugin()
+        self.plugin.configure(Options(), None)
+
+    def run_timed(self, *phases):
+        test = Case()
+        self.plugin.beforeTest(test)
+        for phase in phases:
+            timing.phase_timer.start(phase)
+            timing.phase_timer.stop(phase)
+        self.plugin.startTest(test)
+        self.plugin.addSuccess(test)
+        timing.phase_timer.start("reset")
+        timing.phase_timer.stop("reset")
+        self.plugin.afterTest(test)
+        return self.plugin.timings[test.id()]
+
+    def test_phases_measured(self):
+        phases = self.run_timed("databases", "fixtures")
+        self.assert_equals(["body", "databases", "fixtures", "plugins", "reset"], sorted(phases.keys()))
+
+    def test_explicit_phases_not_counted_twice(self):
+        for phase, seconds in self.run_timed("fixtures").items():
+            self.assert_true(seconds >= 0, "%s took %f" % (phase, seconds))
+
+    def test_timer_released_after_test(self):
+        self.run_timed()
+        self.assert_equals(None, timing.phase_timer.phases)
+
+    def test_context_error_outside_test_ignored(self):
+        self.plugin.addError(Case(), (RuntimeError, RuntimeError(), None))
+        self.assert_equals({}, self.plugin.timings)
@@ -72,6 +72,10 @@ class TestUnitAliases(UnitTestCase):
             #yield lambda x, y: self.assert_equals, getattr(self, i), getattr(self, self.get_camel(i))
             self.assert_equals(getattr(self, i), getattr(self, self.get_camel(i)))
     
+    def test_aliases_installed_on_class(self):
+        self.assert_true('assert_equals' in self.__class__.__dict__)
+        self.assert_equals(self.assert_equals, self.__class__().assert_equals)
+
     def test_get_camel(self):
         self.assert_equals("assertTrue", self.get_camel("assert_true"))
     